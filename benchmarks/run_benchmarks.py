@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for BigLinux Themes GUI.
+Measures startup, catalog rendering and apply latency, and stores the
+results as JSON so they can be compared between releases.
+
+Everything runs against a throw-away HOME, with stub big-theme-apps and
+big-theme-plasma executables on PATH, a private D-Bus session bus and a
+headless GDK backend (broadway, unless GDK_BACKEND is already set), so
+the user's desktop is never touched.
+
+    python3 benchmarks/run_benchmarks.py --output results.json
+    python3 benchmarks/run_benchmarks.py --compare old.json --output new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.normpath(
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        os.pardir,
+        "usr",
+        "share",
+        "biglinux",
+        "biglinux-themes-gui",
+    )
+)
+
+# Stub apply tools, writing the state files like the real ones
+STUB_THEME_TOOL = """#!/bin/sh
+sleep {delay}
+echo "$2" > "$HOME/.big_desktop_theme"
+"""
+STUB_DESKTOP_TOOL = """#!/bin/sh
+sleep {delay}
+mkdir -p "$HOME/.kdebiglinux"
+echo "$2" > "$HOME/.kdebiglinux/lastused"
+"""
+
+BROADWAY_DISPLAY = ":17"
+
+
+def summarize(samples):
+    """Reduce timing samples in ms to summary statistics."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def prepare_environment(workdir, stub_delay=0.0):
+    """Point HOME, XDG dirs and PATH into workdir; must run before app imports.
+
+    Returns the helper processes to stop at exit.
+    """
+    home = os.path.join(workdir, "home")
+    os.makedirs(home, exist_ok=True)
+    os.environ["HOME"] = home
+    os.environ["XDG_CONFIG_HOME"] = os.path.join(home, ".config")
+    os.environ["XDG_CACHE_HOME"] = os.path.join(home, ".cache")
+    os.environ["XDG_DATA_HOME"] = os.path.join(home, ".local", "share")
+    os.environ["XDG_CURRENT_DESKTOP"] = "KDE"
+    os.environ.pop("BIG_THEMES_GUI_TRACE_FILE", None)
+
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    for name, script in (
+        ("big-theme-apps", STUB_THEME_TOOL),
+        ("big-theme-plasma", STUB_DESKTOP_TOOL),
+    ):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(script.format(delay=stub_delay))
+        os.chmod(path, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+
+    processes = []
+    bus = start_private_bus()
+    if bus is not None:
+        processes.append(bus)
+    if "GDK_BACKEND" not in os.environ:
+        broadway = start_broadway()
+        if broadway is not None:
+            processes.append(broadway)
+    sys.path.insert(0, APP_DIR)
+    return processes
+
+
+def start_private_bus():
+    """Start a dbus-daemon for the session reload, or disable the bus."""
+    if shutil.which("dbus-daemon") is None:
+        os.environ["DBUS_SESSION_BUS_ADDRESS"] = "unix:path=/nonexistent"
+        return None
+    process = subprocess.Popen(
+        ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    os.environ["DBUS_SESSION_BUS_ADDRESS"] = process.stdout.readline().strip()
+    return process
+
+
+def start_broadway():
+    """Start gtk4-broadwayd as the headless display."""
+    if shutil.which("gtk4-broadwayd") is None:
+        print("gtk4-broadwayd not found, set GDK_BACKEND", file=sys.stderr)
+        return None
+    process = subprocess.Popen(
+        ["gtk4-broadwayd", BROADWAY_DISPLAY],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    os.environ["GDK_BACKEND"] = "broadway"
+    os.environ["BROADWAY_DISPLAY"] = BROADWAY_DISPLAY
+    time.sleep(0.5)
+    return process
+
+
+def init_gtk():
+    """Import and initialize GTK and the application modules."""
+    import gi
+
+    gi.require_version("Gtk", "4.0")
+    gi.require_version("Adw", "1")
+    from gi.repository import Adw, Gio
+
+    Adw.init()
+    app = Adw.Application(
+        application_id="br.com.biglinux.big-themes-gui.benchmark",
+        flags=Gio.ApplicationFlags.NON_UNIQUE,
+    )
+    app.register(None)
+    return app
+
+
+def wait_until(condition, timeout=30.0):
+    """Iterate the main loop until condition() is true."""
+    from gi.repository import GLib
+
+    context = GLib.MainContext.default()
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step timed out")
+        context.iteration(True)
+
+
+def build_window(app, present=True):
+    """Construct a window; return (window, construct ms, first frame ms)."""
+    from window import ThemesWindow
+
+    start = time.perf_counter()
+    window = ThemesWindow(application=app)
+    constructed = time.perf_counter()
+    first_frame = None
+    if present:
+        painted = []
+        window.present()
+        clock = window.get_frame_clock()
+        if clock is not None:
+            handler = clock.connect("after-paint", lambda c: painted.append(True))
+            wait_until(lambda: painted)
+            clock.disconnect(handler)
+        first_frame = (time.perf_counter() - start) * 1000
+    return window, (constructed - start) * 1000, first_frame
+
+
+def close_window(window):
+    """Close a benchmark window and let GTK dispose it."""
+    from gi.repository import GLib
+
+    window.close()
+    window.destroy()
+    context = GLib.MainContext.default()
+    while context.pending():
+        context.iteration(False)
+
+
+def bench_window_cold(runs):
+    """Time the first window of fresh processes with empty caches."""
+    construct, first_frame = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child-cold-window"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        construct.append(sample["construct_ms"])
+        first_frame.append(sample["first_frame_ms"])
+    return {"construct": summarize(construct), "first_frame": summarize(first_frame)}
+
+
+def bench_window_warm(app, runs):
+    """Time windows built after the first one, with warm caches."""
+    window, _, _ = build_window(app)
+    close_window(window)
+    construct, first_frame = [], []
+    for _ in range(runs):
+        window, built, painted = build_window(app)
+        construct.append(built)
+        first_frame.append(painted)
+        close_window(window)
+    return {"construct": summarize(construct), "first_frame": summarize(first_frame)}
+
+
+def bench_catalog(runs):
+    """Time catalog model creation and cell bind/unbind throughput."""
+    from theme_manager import ThemeManager
+    from desktop_manager import DesktopManager
+    from catalog_view import ThemeCell, DesktopCell
+
+    results = {}
+    for label, manager, create_model, cell_class in (
+        ("theme", ThemeManager(), "create_theme_model", ThemeCell),
+        ("desktop", DesktopManager(), "create_desktop_model", DesktopCell),
+    ):
+        model_samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model = getattr(manager, create_model)()
+            model_samples.append((time.perf_counter() - start) * 1000)
+
+        items = [model.get_item(i) for i in range(model.get_n_items())]
+        for item in items:
+            item.texture = item.load_texture()
+        cell = cell_class()
+        bind_samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            for item in items:
+                cell.bind(item)
+                cell.unbind()
+            bind_samples.append((time.perf_counter() - start) * 1000 / len(items))
+        results[f"{label}_model"] = summarize(model_samples)
+        results[f"{label}_cell_bind"] = summarize(bind_samples)
+        results[f"{label}_cells_per_second"] = round(
+            1000 / statistics.median(bind_samples)
+        )
+    return results
+
+
+def bench_shell(runs):
+    """Time the fixed cost of spawning helpers through run_shell_script."""
+    from utils import run_shell_command, run_shell_script
+
+    command, script = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_shell_command("true")
+        command.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        run_shell_script("actual-theme.sh")
+        script.append((time.perf_counter() - start) * 1000)
+    return {"run_shell_command": summarize(command), "run_shell_script": summarize(script)}
+
+
+def bench_apply(app, runs):
+    """Time _apply_theme / _apply_desktop from call to the finished callback."""
+    window, _, _ = build_window(app)
+    results = {}
+    for label, apply, callback, names in (
+        ("theme", window._apply_theme, "_on_theme_applied", ["breeze", "breeze-dark"]),
+        ("desktop", window._apply_desktop, "_on_desktop_applied", ["classic", "modern"]),
+    ):
+        original = getattr(window, callback)
+        done = []
+
+        def finished(*args, original=original, done=done):
+            original(*args)
+            done.append(time.perf_counter())
+
+        setattr(window, callback, finished)
+        samples = []
+        for i in range(runs):
+            done.clear()
+            start = time.perf_counter()
+            apply(names[i % len(names)])
+            wait_until(lambda: done)
+            samples.append((done[0] - start) * 1000)
+        setattr(window, callback, original)
+        results[label] = summarize(samples)
+    close_window(window)
+    return results
+
+
+def child_cold_window():
+    """Build one window in this fresh process and print its timings."""
+    workdir = tempfile.mkdtemp(prefix="big-themes-bench-")
+    processes = prepare_environment(workdir)
+    try:
+        app = init_gtk()
+        window, built, painted = build_window(app)
+        print(json.dumps({"construct_ms": built, "first_frame_ms": painted}))
+        close_window(window)
+    finally:
+        stop(processes, workdir)
+
+
+def stop(processes, workdir):
+    """Stop helper processes and remove the temporary HOME."""
+    for process in processes:
+        process.terminate()
+        process.wait()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(old, new):
+    """Print the median change of each result against an older run."""
+
+    def medians(results, prefix=""):
+        for key, value in results.items():
+            if isinstance(value, dict) and "median_ms" in value:
+                yield prefix + key, value["median_ms"]
+            elif isinstance(value, dict):
+                yield from medians(value, f"{prefix}{key}.")
+
+    old_medians = dict(medians(old["results"]))
+    for name, median in medians(new["results"]):
+        before = old_medians.get(name)
+        if before:
+            change = (median - before) / before * 100
+            print(f"{name:40} {before:10.2f} -> {median:10.2f} ms  {change:+6.1f}%")
+
+
+def get_version():
+    """Describe the benchmarked tree with git, if available."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20, help="samples per benchmark")
+    parser.add_argument("--cold-runs", type=int, default=5, help="fresh processes")
+    parser.add_argument(
+        "--stub-delay", type=float, default=0.0, help="seconds the stub tools sleep"
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--child-cold-window", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_cold_window:
+        child_cold_window()
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="big-themes-bench-")
+    processes = prepare_environment(workdir, args.stub_delay)
+    try:
+        app = init_gtk()
+        results = {
+            "window_cold": bench_window_cold(args.cold_runs),
+            "window_warm": bench_window_warm(app, args.runs),
+            "catalog": bench_catalog(args.runs),
+            "shell": bench_shell(args.runs),
+            "apply": bench_apply(app, args.runs),
+        }
+    finally:
+        stop(processes, workdir)
+
+    from gi.repository import Gtk
+
+    report = {
+        "version": get_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "gtk": f"{Gtk.MAJOR_VERSION}.{Gtk.MINOR_VERSION}.{Gtk.MICRO_VERSION}",
+        "gdk_backend": os.environ.get("GDK_BACKEND"),
+        "runs": args.runs,
+        "stub_delay": args.stub_delay,
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
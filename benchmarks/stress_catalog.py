@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Large-catalog stress run for BigLinux Themes GUI.
+Synthesizes N themes and desktops and measures how the window scales.
+
+For each N the catalog is generated as manifests in the user catalog
+directory of a temporary HOME, with a generated PNG preview per theme and
+SVG icon per desktop. A fresh process then records the window build
+time, the _load_themes_and_desktops phase, the resident memory, and the
+frame times while scrolling both grids from top to bottom.
+
+    python3 benchmarks/stress_catalog.py --sizes 10 100 1000 --output stress.json
+"""
+
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import run_benchmarks as bench
+
+# Size of the generated previews, like the shipped ones
+THEME_PREVIEW_SIZE = (530, 359)
+
+# Per-item build time growth between two sizes that counts as superlinear
+SUPERLINEAR_FACTOR = 2.0
+
+DESKTOP_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="400" height="280">
+<rect width="400" height="280" rx="16" fill="#{color}"/>
+<rect y="244" width="400" height="36" fill="#202020"/>
+<rect x="{x}" y="40" width="160" height="120" rx="6" fill="#f0f0f0"/>
+</svg>
+"""
+
+
+def write_png(path, width, height, rgb):
+    """Write a solid color RGB PNG without any imaging library."""
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    row = b"\x00" + bytes(rgb) * width
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(row * height)))
+        f.write(chunk(b"IEND", b""))
+
+
+def generate_catalog(catalog_dir, count):
+    """Write count theme and count desktop manifests with their previews."""
+    previews = os.path.join(catalog_dir, "previews")
+    os.makedirs(previews, exist_ok=True)
+    for i in range(count):
+        color = ((i * 53) % 256, (i * 97) % 256, (i * 151) % 256)
+        name = f"stress-theme-{i:04d}"
+        write_png(os.path.join(previews, f"{name}.png"), *THEME_PREVIEW_SIZE, color)
+        with open(os.path.join(catalog_dir, f"{name}.catalog"), "w") as f:
+            f.write(
+                "[Catalog Entry]\nType=theme\n"
+                f"Name={name}\nLabel=stress theme {i}\n"
+                f"Preview=previews/{name}.png\nOrder={1000 + i}\n"
+            )
+
+        name = f"stress-desktop-{i:04d}"
+        with open(os.path.join(previews, f"{name}.svg"), "w") as f:
+            f.write(DESKTOP_SVG.format(color="%02x%02x%02x" % color, x=20 + i % 200))
+        with open(os.path.join(catalog_dir, f"{name}.catalog"), "w") as f:
+            f.write(
+                "[Catalog Entry]\nType=desktop\n"
+                f"Name={name}\nLabel=stress desktop {i}\n"
+                f"Preview=previews/{name}.svg\nDesktops=KDE;\nOrder={1000 + i}\n"
+            )
+
+
+def get_rss_kib():
+    """Resident memory of this process in KiB."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def settle(seconds):
+    """Run the main loop for a while, e.g. to let images load."""
+    deadline = time.perf_counter() + seconds
+    bench.wait_until(lambda: time.perf_counter() > deadline, timeout=seconds + 5)
+
+
+def scroll_frame_times(window, grid, step):
+    """Scroll a grid to the bottom, returning the interval of each frame in ms."""
+    adjustment = grid.get_vadjustment()
+    clock = window.get_frame_clock()
+    painted = []
+    handler = clock.connect("after-paint", lambda c: painted.append(time.perf_counter()))
+    frames = []
+    value = adjustment.get_lower()
+    end = adjustment.get_upper() - adjustment.get_page_size()
+    while value < end:
+        value = min(end, value + step)
+        painted.clear()
+        start = time.perf_counter()
+        adjustment.set_value(value)
+        window.queue_draw()
+        bench.wait_until(lambda: painted)
+        frames.append((painted[0] - start) * 1000)
+    clock.disconnect(handler)
+    return frames
+
+
+def child_run(count, scroll_step):
+    """Measure one catalog size in this fresh process and print JSON."""
+    workdir = tempfile.mkdtemp(prefix="big-themes-stress-")
+    processes = bench.prepare_environment(workdir)
+    try:
+        generate_start = time.perf_counter()
+        generate_catalog(
+            os.path.join(
+                os.environ["XDG_DATA_HOME"], "biglinux-themes-gui", "catalog"
+            ),
+            count,
+        )
+        generate_ms = (time.perf_counter() - generate_start) * 1000
+
+        app = bench.init_gtk()
+        from startup_profiler import profiler
+
+        profiler.enable()
+        rss_before = get_rss_kib()
+        window, construct_ms, first_frame_ms = bench.build_window(app)
+        rss_window = get_rss_kib()
+        settle(1.0)
+        rss_loaded = get_rss_kib()
+        phases = {phase["name"]: phase["duration_ms"] for phase in profiler.phases}
+
+        frames = scroll_frame_times(window, window.desktop_grid, scroll_step)
+        frames += scroll_frame_times(window, window.theme_grid, scroll_step)
+        rss_scrolled = get_rss_kib()
+        bench.close_window(window)
+
+        print(
+            json.dumps(
+                {
+                    "themes": window.theme_model.get_n_items(),
+                    "desktops": window.desktop_model.get_n_items(),
+                    "generate_ms": round(generate_ms, 3),
+                    "construct_ms": round(construct_ms, 3),
+                    "first_frame_ms": round(first_frame_ms, 3),
+                    "load_themes_and_desktops_ms": phases.get("load_themes_and_desktops"),
+                    "rss_kib": {
+                        "before_window": rss_before,
+                        "window": rss_window,
+                        "images_loaded": rss_loaded,
+                        "after_scroll": rss_scrolled,
+                    },
+                    "scroll_frames": bench.summarize(frames) if frames else None,
+                }
+            )
+        )
+    finally:
+        bench.stop(processes, workdir)
+
+
+def find_superlinear(runs):
+    """Name the measures whose per-item cost grows between consecutive sizes."""
+    flagged = []
+    for smaller, larger in zip(runs, runs[1:]):
+        for key in ("construct_ms", "load_themes_and_desktops_ms"):
+            if not smaller.get(key) or not larger.get(key):
+                continue
+            per_item_small = smaller[key] / smaller["size"]
+            per_item_large = larger[key] / larger["size"]
+            if per_item_large > per_item_small * SUPERLINEAR_FACTOR:
+                flagged.append(f"{key} {smaller['size']} -> {larger['size']}")
+    return flagged
+
+
+def main():
+    """Run the stress measurements for every requested size."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument(
+        "--scroll-step", type=float, default=120.0, help="pixels per scrolled frame"
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child_run(args.child, args.scroll_step)
+        return 0
+
+    runs = []
+    for size in sorted(args.sizes):
+        output = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--child",
+                str(size),
+                "--scroll-step",
+                str(args.scroll_step),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["size"] = size
+        runs.append(result)
+        print(
+            f"N={size}: build {result['construct_ms']:.1f} ms, "
+            f"RSS {result['rss_kib']['after_scroll'] // 1024} MiB",
+            file=sys.stderr,
+        )
+
+    report = {
+        "version": bench.get_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "runs": runs,
+        "superlinear": find_superlinear(runs),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Session reload tests for BigLinux Themes GUI.
+Checks the D-Bus traffic of SessionReloader against mock KWin, plasmashell,
+KGlobalSettings and dconf services.
+
+The mocks claim the real service names, so the tests run on a private bus
+and skip themselves when those names are taken, e.g. in a desktop session:
+
+    dbus-run-session -- python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+try:
+    from gi.repository import Gio, GLib
+except ImportError:
+    raise unittest.SkipTest("PyGObject is not installed")
+
+APP_DIR = os.path.normpath(
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        os.pardir,
+        "usr",
+        "share",
+        "biglinux",
+        "biglinux-themes-gui",
+    )
+)
+
+# Names owned by the mock services
+MOCK_NAMES = ("org.kde.KWin", "org.kde.plasmashell", "ca.desrt.dconf")
+
+KWIN_XML = """
+<node>
+  <interface name="org.kde.KWin">
+    <method name="reconfigure"/>
+  </interface>
+</node>
+"""
+
+PLASMASHELL_XML = """
+<node>
+  <interface name="org.kde.PlasmaShell">
+    <method name="refreshCurrentShell"/>
+  </interface>
+</node>
+"""
+
+DCONF_WRITER_XML = """
+<node>
+  <interface name="ca.desrt.dconf.Writer">
+    <method name="Change">
+      <arg type="ay" name="blob" direction="in"/>
+      <arg type="s" name="tag" direction="out"/>
+    </method>
+  </interface>
+</node>
+"""
+
+# Signals the reloader emits for a theme change on KDE
+KDE_SIGNALS = (
+    ("org.kde.KGlobalSettings", "notifyChange"),
+    ("org.kde.KIconLoader", "iconChanged"),
+    ("org.kde.kconfig.notify", "ConfigChanged"),
+)
+
+# How long to wait for the D-Bus traffic of a reload (s)
+WAIT_TIMEOUT = 5
+
+# How long to wait for signals that must not come (s)
+QUIET_TIMEOUT = 0.5
+
+_workdir = None
+
+
+def setUpModule():
+    """Point HOME into a temporary directory and import the reloader."""
+    global _workdir, session_reload, KIND_THEME, KIND_DESKTOP, KIND_PROFILE
+    _workdir = tempfile.TemporaryDirectory(prefix="big-themes-test-")
+    os.environ["HOME"] = _workdir.name
+    os.environ["XDG_CONFIG_HOME"] = os.path.join(_workdir.name, ".config")
+    os.environ["XDG_CACHE_HOME"] = os.path.join(_workdir.name, ".cache")
+    sys.path.insert(0, APP_DIR)
+    import session_reload
+    from catalog import KIND_THEME, KIND_DESKTOP
+    from core import KIND_PROFILE
+
+
+def tearDownModule():
+    """Remove the temporary HOME."""
+    _workdir.cleanup()
+
+
+def _connect(address):
+    """Open a new connection to the bus at address."""
+    return Gio.DBusConnection.new_for_address_sync(
+        address,
+        Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT
+        | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION,
+        None,
+        None,
+    )
+
+
+def _bus_call(connection, method, parameters, reply_type):
+    """Call a method of the bus daemon and return its reply."""
+    return connection.call_sync(
+        "org.freedesktop.DBus",
+        "/org/freedesktop/DBus",
+        "org.freedesktop.DBus",
+        method,
+        parameters,
+        GLib.VariantType(reply_type),
+        Gio.DBusCallFlags.NONE,
+        -1,
+        None,
+    ).unpack()
+
+
+class MockService:
+    """Owns a bus name and records the calls to one object."""
+
+    def __init__(self, connection, name, path, xml):
+        """Register the object and claim the name."""
+        self.connection = connection
+        self.name = name
+        self.calls = []
+        interface = Gio.DBusNodeInfo.new_for_xml(xml).interfaces[0]
+        self._registration = connection.register_object(
+            path, interface, self._on_call, None, None
+        )
+        # DBUS_NAME_FLAG_DO_NOT_QUEUE
+        _bus_call(connection, "RequestName", GLib.Variant("(su)", (name, 4)), "(u)")
+
+    def _on_call(self, connection, sender, path, interface, method, parameters, invocation):
+        """Record a method call and reply to it."""
+        self.calls.append((interface, method))
+        if method == "Change":
+            invocation.return_value(GLib.Variant("(s)", ("tag",)))
+        else:
+            invocation.return_value(None)
+
+    def stop(self):
+        """Release the name and unregister the object."""
+        _bus_call(self.connection, "ReleaseName", GLib.Variant("(s)", (self.name,)), "(u)")
+        self.connection.unregister_object(self._registration)
+
+
+class SessionReloadTest(unittest.TestCase):
+    """Runs the reloader against mock session services."""
+
+    def setUp(self):
+        """Start the mock services on the session bus."""
+        address = os.environ.get("DBUS_SESSION_BUS_ADDRESS")
+        if not address:
+            self.skipTest("No session bus, run under dbus-run-session")
+        try:
+            self.bus = _connect(address)
+        except GLib.Error as e:
+            self.skipTest(f"Session bus not reachable: {e.message}")
+        for name in MOCK_NAMES:
+            (owned,) = _bus_call(
+                self.bus, "NameHasOwner", GLib.Variant("(s)", (name,)), "(b)"
+            )
+            if owned:
+                self.skipTest(f"{name} is running, run under dbus-run-session")
+
+        self.kwin = MockService(self.bus, "org.kde.KWin", "/KWin", KWIN_XML)
+        self.plasmashell = MockService(
+            self.bus, "org.kde.plasmashell", "/PlasmaShell", PLASMASHELL_XML
+        )
+        self.dconf = MockService(
+            self.bus, "ca.desrt.dconf", "/ca/desrt/dconf/Writer/user", DCONF_WRITER_XML
+        )
+        self.services = [self.kwin, self.plasmashell, self.dconf]
+
+        # KGlobalSettings and friends are broadcast signals
+        self.signals = []
+        self.subscriptions = [
+            self.bus.signal_subscribe(
+                None,
+                interface,
+                member,
+                None,
+                None,
+                Gio.DBusSignalFlags.NONE,
+                self._on_signal,
+            )
+            for interface, member in KDE_SIGNALS
+        ]
+        # The match rules are in place once the daemon answers
+        _bus_call(self.bus, "GetId", None, "(s)")
+
+        self.reloader = session_reload.SessionReloader(_connect(address))
+
+    def tearDown(self):
+        """Stop the mock services."""
+        for subscription in self.subscriptions:
+            self.bus.signal_unsubscribe(subscription)
+        for service in self.services:
+            service.stop()
+        self.bus.close_sync(None)
+
+    def _on_signal(self, connection, sender, path, interface, member, parameters):
+        """Record a broadcast signal."""
+        self.signals.append((interface, member, parameters.unpack()))
+
+    def _iterate(self, done, timeout=WAIT_TIMEOUT):
+        """Run the main loop, which serves the mocks, until done() or a timeout."""
+        context = GLib.MainContext.default()
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            if not context.iteration(False):
+                time.sleep(0.01)
+
+    def _reload(self, kind, desktop="KDE"):
+        """Reload on a worker thread, as after an apply, and return the result."""
+        results = []
+        with mock.patch.dict(os.environ, {"XDG_CURRENT_DESKTOP": desktop}):
+            thread = threading.Thread(
+                target=lambda: results.append(self.reloader.reload(kind))
+            )
+            thread.start()
+            self._iterate(lambda: not thread.is_alive())
+            thread.join(WAIT_TIMEOUT)
+        self.assertTrue(results, "the reload did not finish")
+        return results[0]
+
+    def _signals_named(self, member):
+        """Arguments of the recorded signals with the given name."""
+        return [args for _interface, name, args in self.signals if name == member]
+
+    def test_theme_notifies_kde_settings_and_kwin(self):
+        """A theme change is broadcast and KWin reconfigured, plasmashell left alone."""
+        result = self._reload(KIND_THEME)
+
+        self.assertEqual(
+            result.reloaded,
+            [session_reload.COMPONENT_KDE_SETTINGS, session_reload.COMPONENT_KWIN],
+        )
+        self.assertEqual(result.failed, [])
+        self.assertFalse(result.needs_logout)
+        self.assertEqual(self.kwin.calls, [("org.kde.KWin", "reconfigure")])
+        self.assertEqual(self.plasmashell.calls, [])
+
+        self._iterate(lambda: len(self.signals) >= 7)
+        self.assertEqual(
+            sorted(self._signals_named("notifyChange")),
+            [
+                (session_reload.KDE_PALETTE_CHANGED, 0),
+                (session_reload.KDE_STYLE_CHANGED, 0),
+                (session_reload.KDE_SETTINGS_CHANGED, 0),
+                (session_reload.KDE_ICON_CHANGED, 0),
+                (session_reload.KDE_CURSOR_CHANGED, 0),
+            ],
+        )
+        self.assertEqual(self._signals_named("iconChanged"), [(0,)])
+        (changed,) = self._signals_named("ConfigChanged")
+        groups = changed[0]
+        self.assertEqual(set(groups), set(session_reload.KDEGLOBALS_CHANGED_KEYS))
+        self.assertIn(b"ColorScheme", [bytes(key) for key in groups["General"]])
+
+    def test_desktop_refreshes_kwin_and_plasmashell(self):
+        """A desktop change reloads KWin and plasmashell without theme signals."""
+        result = self._reload(KIND_DESKTOP)
+
+        self.assertEqual(
+            result.reloaded,
+            [session_reload.COMPONENT_KWIN, session_reload.COMPONENT_PLASMASHELL],
+        )
+        self.assertEqual(self.kwin.calls, [("org.kde.KWin", "reconfigure")])
+        self.assertEqual(
+            self.plasmashell.calls, [("org.kde.PlasmaShell", "refreshCurrentShell")]
+        )
+        self._iterate(lambda: bool(self.signals), QUIET_TIMEOUT)
+        self.assertEqual(self.signals, [])
+
+    def test_missing_component_needs_logout(self):
+        """A component that is not running is reported instead of started."""
+        self.plasmashell.stop()
+        self.services.remove(self.plasmashell)
+
+        result = self._reload(KIND_PROFILE)
+
+        self.assertEqual(result.failed, [session_reload.COMPONENT_PLASMASHELL])
+        self.assertIn(session_reload.COMPONENT_KWIN, result.reloaded)
+        self.assertTrue(result.needs_logout)
+
+    def test_gnome_theme_checks_dconf(self):
+        """On GNOME dconf is only reported reloaded while its writer runs."""
+        result = self._reload(KIND_THEME, desktop="GNOME")
+
+        self.assertEqual(result.reloaded, [session_reload.COMPONENT_DCONF])
+        self.assertEqual(result.failed, [])
+        self.assertEqual(self.kwin.calls, [])
+
+        self.dconf.stop()
+        self.services.remove(self.dconf)
+        result = self._reload(KIND_THEME, desktop="GNOME")
+
+        self.assertEqual(result.reloaded, [])
+        self.assertEqual(result.failed, [session_reload.COMPONENT_DCONF])
+
+    def test_gnome_desktop_needs_logout(self):
+        """A desktop change on GNOME asks for a new login."""
+        result = self._reload(KIND_DESKTOP, desktop="GNOME")
+
+        self.assertEqual(result.reloaded, [])
+        self.assertEqual(result.failed, [session_reload.COMPONENT_GNOME_SHELL])
+        self.assertEqual(self.kwin.calls, [])
+        self.assertEqual(self.plasmashell.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
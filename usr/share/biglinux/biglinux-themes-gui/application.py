@@ -0,0 +1,176 @@
+"""
+Application module for BigLinux Themes GUI.
+Implements the GTK application, including the resident service mode.
+"""
+
+import logging
+import time
+
+import gi
+
+gi.require_version("Gtk", "4.0")
+gi.require_version("Adw", "1")
+from gi.repository import Adw, Gio, GLib
+
+from startup_profiler import profiler
+from theme_manager import ThemeManager
+from desktop_manager import DesktopManager
+from resources import load_resources
+from thumbnail_cache import thumbnail_cache, get_display_scale
+from image_loader import image_loader
+from window import ThemesWindow
+
+logger = logging.getLogger(__name__)
+
+# D-Bus name of the application; GApplication ids need at least one dot
+APPLICATION_ID = "br.com.biglinux.big-themes-gui"
+
+# Exit the resident service after this long without any window (ms)
+SERVICE_INACTIVITY_TIMEOUT = 30 * 60 * 1000
+
+# Release the preloaded catalog this long after the last window closed (s)
+CACHE_RELEASE_DELAY = 5 * 60
+
+
+class BigLinuxThemesApplication(Adw.Application):
+    """Main application class for BigLinux Themes GUI.
+
+    Started with --gapplication-service the application stays resident on
+    the session bus. The catalog models and their textures are preloaded,
+    so each activation only has to build and present a window. The
+    preloaded data is released when no window was open for
+    CACHE_RELEASE_DELAY, and the process exits after
+    SERVICE_INACTIVITY_TIMEOUT.
+    """
+
+    def __init__(self, exit_after_first_frame=False):
+        """Initialize the application."""
+        super().__init__(application_id=APPLICATION_ID)
+        self.exit_after_first_frame = exit_after_first_frame
+        self.theme_manager = None
+        self.desktop_manager = None
+        self._run_start = None
+        self._first_frame_handler = None
+        self._release_source = None
+        self.connect("activate", self.on_activate)
+        self.connect("window-removed", self._on_window_removed)
+
+    def is_service(self) -> bool:
+        """Check if the application runs as a resident service."""
+        return bool(self.get_flags() & Gio.ApplicationFlags.IS_SERVICE)
+
+    def do_startup(self):
+        """Load the resource bundle, and preload the catalog as a service."""
+        Adw.Application.do_startup(self)
+        # Map the resource bundle before any window needs the stylesheet
+        with profiler.phase("resources"):
+            load_resources()
+        if self.is_service():
+            logger.info("Running as resident service, preloading catalog")
+            # Only the service lingers, a normal launch exits with its window
+            self.set_inactivity_timeout(SERVICE_INACTIVITY_TIMEOUT)
+            self._preload()
+
+    def on_activate(self, app):
+        """Create and show the main window when the application is activated."""
+        if self._run_start is not None:
+            profiler.add_phase(
+                "application_activation", self._run_start, time.perf_counter()
+            )
+        self._cancel_release()
+
+        # Set application icon
+        GLib.set_prgname("big-themes-gui")
+
+        # Reuse an open window instead of creating another one
+        window = self.get_active_window()
+        if window is not None:
+            window.present()
+            return
+
+        # Create and show main window
+        with profiler.phase("create_window"):
+            if self.is_service():
+                self._preload()
+                window = ThemesWindow(
+                    application=app,
+                    theme_manager=self.theme_manager,
+                    desktop_manager=self.desktop_manager,
+                )
+            else:
+                window = ThemesWindow(application=app)
+        with profiler.phase("present_window"):
+            window.present()
+
+        if profiler.enabled:
+            self._watch_first_frame(window)
+
+    def _preload(self) -> None:
+        """Create the managers and models and warm their textures."""
+        if self.theme_manager is None:
+            self.theme_manager = ThemeManager()
+        if self.desktop_manager is None:
+            self.desktop_manager = DesktopManager()
+        # Windows open on any monitor, so warm the sharpest images
+        scale = get_display_scale()
+        for model in (
+            self.theme_manager.get_theme_model(),
+            self.desktop_manager.get_desktop_model(),
+        ):
+            for item in model:
+                if item.texture is None:
+                    image_loader.prefetch(
+                        lambda item=item: item.load_texture(scale),
+                        lambda texture, item=item: item.set_texture(texture, scale),
+                    )
+
+    def _on_window_removed(self, app, window):
+        """Schedule releasing the preloaded data once the last window is gone."""
+        if self.is_service() and not self.get_windows():
+            self._cancel_release()
+            self._release_source = GLib.timeout_add_seconds(
+                CACHE_RELEASE_DELAY, self._release_caches
+            )
+
+    def _cancel_release(self) -> None:
+        """Cancel a scheduled cache release."""
+        if self._release_source is not None:
+            GLib.source_remove(self._release_source)
+            self._release_source = None
+
+    def _release_caches(self):
+        """Drop the preloaded catalog and textures while the service is idle."""
+        logger.info("Service idle, releasing cached catalog and textures")
+        self._release_source = None
+        image_loader.cancel_pending()
+        thumbnail_cache.release_memory()
+        if self.theme_manager is not None:
+            self.theme_manager.release_model()
+        if self.desktop_manager is not None:
+            self.desktop_manager.release_model()
+        return GLib.SOURCE_REMOVE
+
+    def _watch_first_frame(self, window):
+        """Record the first frame presented by the window's frame clock."""
+        frame_clock = window.get_frame_clock()
+        if frame_clock is None:
+            # Not realized yet, try again once it is
+            window.connect("realize", lambda w: self._watch_first_frame(w))
+            return
+        self._first_frame_handler = frame_clock.connect(
+            "after-paint", self._on_first_frame
+        )
+
+    def _on_first_frame(self, frame_clock):
+        """Finish the startup report after the first frame."""
+        frame_clock.disconnect(self._first_frame_handler)
+        self._first_frame_handler = None
+        profiler.mark("first_frame")
+        profiler.write_report()
+        if self.exit_after_first_frame:
+            GLib.idle_add(self.quit)
+
+    def run_profiled(self, argv):
+        """Run the application, remembering when the main loop was entered."""
+        self._run_start = time.perf_counter()
+        return self.run(argv)
@@ -1,12 +1,20 @@
 #!/bin/bash
 
+# Progress lines are read by the GUI: "PROGRESS <step>/<total> <message>"
+export TEXTDOMAINDIR="/usr/share/locale"
+export TEXTDOMAIN=biglinux-themes-gui
+
 if [[ "$XDG_CURRENT_DESKTOP" == "GNOME" ]]; then
 
-big-theme-plasma --apply $1 $2
+echo "PROGRESS 0/1" $"Applying the desktop layout"
+big-theme-plasma --apply "$1" ${2:+"$2"} || exit
+echo "PROGRESS 1/1" $"Desktop layout applied"
 
 
 else
 
-big-theme-plasma --apply $1 $2
+echo "PROGRESS 0/1" $"Applying the desktop layout"
+big-theme-plasma --apply "$1" ${2:+"$2"} || exit
+echo "PROGRESS 1/1" $"Desktop layout applied"
 
 fi
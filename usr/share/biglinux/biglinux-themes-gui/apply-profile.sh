@@ -0,0 +1,13 @@
+#!/bin/bash
+
+# Apply a desktop configuration and a theme in one run: $1 theme, $2 desktop, $3 clean
+# The theme goes last so the layout's defaults do not override it
+# Progress lines are read by the GUI: "PROGRESS <step>/<total> <message>"
+export TEXTDOMAINDIR="/usr/share/locale"
+export TEXTDOMAIN=biglinux-themes-gui
+
+echo "PROGRESS 0/2" $"Applying the desktop layout"
+big-theme-plasma --apply "$2" ${3:+"$3"} || exit
+echo "PROGRESS 1/2" $"Applying the theme"
+big-theme-apps --apply "$1" || exit
+echo "PROGRESS 2/2" $"Theme and desktop layout applied"
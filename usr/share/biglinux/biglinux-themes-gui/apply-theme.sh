@@ -1,11 +1,19 @@
 #!/bin/bash
 
+# Progress lines are read by the GUI: "PROGRESS <step>/<total> <message>"
+export TEXTDOMAINDIR="/usr/share/locale"
+export TEXTDOMAIN=biglinux-themes-gui
+
 if [[ "$XDG_CURRENT_DESKTOP" == "GNOME" ]]; then
 
-big-theme-apps --apply $1
+echo "PROGRESS 0/1" $"Applying the theme"
+big-theme-apps --apply "$1" || exit
+echo "PROGRESS 1/1" $"Theme applied"
 
 else
 
-big-theme-apps --apply $1
+echo "PROGRESS 0/1" $"Applying the theme"
+big-theme-apps --apply "$1" || exit
+echo "PROGRESS 1/1" $"Theme applied"
 
 fi
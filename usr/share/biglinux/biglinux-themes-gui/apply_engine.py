@@ -0,0 +1,102 @@
+"""
+Apply engine module for BigLinux Themes GUI.
+Runs blocking theme and desktop apply calls off the GTK main loop.
+"""
+
+import contextvars
+import threading
+from typing import Callable, Optional
+
+from gi.repository import GLib
+
+from utils import Cancellable, CommandCancelled
+
+
+class ApplyJob:
+    """A single apply operation running on a worker thread.
+
+    The blocking function receives a ``cancellable`` keyword argument and
+    runs outside the main loop. Completion callbacks are always dispatched
+    back on the GTK main loop, so they may touch widgets freely; on_failed
+    and on_cancelled receive the exception that ended the job. With
+    on_progress set, the function also receives an ``on_progress`` keyword
+    argument; each report is forwarded to on_progress on the main loop.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        *args,
+        on_finished: Optional[Callable] = None,
+        on_failed: Optional[Callable] = None,
+        on_cancelled: Optional[Callable] = None,
+        on_progress: Optional[Callable] = None,
+    ):
+        """Initialize the job without starting it."""
+        self.func = func
+        self.args = args
+        self.on_finished = on_finished
+        self.on_failed = on_failed
+        self.on_cancelled = on_cancelled
+        self.on_progress = on_progress
+        # Called on the main loop after any outcome callback, e.g. by the scheduler
+        self.done_callbacks = []
+        self.cancellable = Cancellable()
+        self._thread = None
+        self._running = False
+
+    def start(self) -> "ApplyJob":
+        """Start the job on a daemon worker thread."""
+        self._running = True
+        # Run in a copy of the caller's context so spans nest under its trace
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=context.run, args=(self._run,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        """Request cancellation, stopping the running command."""
+        if self._running:
+            self.cancellable.cancel()
+
+    def is_running(self) -> bool:
+        """Check if the job has not finished yet."""
+        return self._running
+
+    def _run(self) -> None:
+        """Worker thread body."""
+        try:
+            kwargs = {"cancellable": self.cancellable}
+            if self.on_progress is not None:
+                kwargs["on_progress"] = self._report_progress
+            result = self.func(*self.args, **kwargs)
+        except CommandCancelled as e:
+            GLib.idle_add(self._dispatch, self.on_cancelled, e)
+        except Exception as e:
+            GLib.idle_add(self._dispatch, self.on_failed, e)
+        else:
+            # A cancel that came too late to stop the change does not undo it
+            GLib.idle_add(self._dispatch, self.on_finished, result)
+
+    def _report_progress(self, *values) -> None:
+        """Forward a progress report from the worker thread to the main loop."""
+        GLib.idle_add(self._dispatch_progress, *values)
+
+    def _dispatch_progress(self, *values):
+        """Deliver a progress report on the main loop, unless the job is over."""
+        if self._running:
+            self.on_progress(*values)
+        return GLib.SOURCE_REMOVE
+
+    def _dispatch(self, callback, *values):
+        """Deliver a result on the main loop."""
+        self._running = False
+        try:
+            if callback is not None:
+                callback(*values)
+        finally:
+            for done in self.done_callbacks:
+                done(self)
+        return GLib.SOURCE_REMOVE
@@ -0,0 +1,193 @@
+"""
+Apply scheduler module for BigLinux Themes GUI.
+Serializes the theme, desktop and profile applies requested from the UI.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Tuple
+
+from apply_engine import ApplyJob
+
+logger = logging.getLogger(__name__)
+
+# Scheduler states
+STATE_IDLE = "idle"
+STATE_RUNNING = "running"
+
+# Undo of the last change, queued like the applies so they never overlap
+KIND_UNDO = "undo"
+
+# Marks a kind without a queued or running request
+_NONE = object()
+
+
+class ApplyRequest(NamedTuple):
+    """An apply waiting for its turn."""
+
+    kind: str
+    target: Hashable
+    # Starts the apply and returns its job, or None if nothing was started
+    start: Callable[[], Optional[ApplyJob]]
+    # Who asked for it, e.g. a window, so it can cancel only its own applies
+    owner: object = None
+
+
+class ApplyScheduler:
+    """Runs one apply at a time, keeping only the latest request of each kind.
+
+    A request replaces the pending request of the same kind, since only
+    the last choice matters, and is dropped when it asks for what is
+    already running, already queued or, unless forced, already active.
+    Pending requests start in the order they were last chosen. A kind
+    can also set parts of others, e.g. a profile sets a theme and a
+    desktop, see add_part(). changed_callbacks are called on the main loop whenever the state or
+    the queue depth changes.
+    """
+
+    def __init__(self):
+        """Initialize an idle scheduler."""
+        self.changed_callbacks = []
+        self._pending: "OrderedDict[str, ApplyRequest]" = OrderedDict()
+        self._running: Optional[ApplyRequest] = None
+        self._job: Optional[ApplyJob] = None
+        self._parts: Dict[Tuple[str, str], Callable[[Hashable], Hashable]] = {}
+
+    @property
+    def state(self) -> str:
+        """STATE_RUNNING while an apply runs, STATE_IDLE otherwise."""
+        return STATE_RUNNING if self._job is not None else STATE_IDLE
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting behind the running apply."""
+        return len(self._pending)
+
+    def is_busy(self) -> bool:
+        """Check if an apply is running or waiting."""
+        return self._job is not None or bool(self._pending)
+
+    def add_part(
+        self, kind: str, part_kind: str, get_part: Callable[[Hashable], Hashable]
+    ) -> None:
+        """Declare that a request of kind also sets the target of part_kind.
+
+        get_part maps a target of kind to the part_kind target it sets.
+        """
+        self._parts[(kind, part_kind)] = get_part
+
+    def get_target(self, kind: str, default=None):
+        """Return the target a kind will have once the queued applies finish.
+
+        This is the latest queued or running request setting the kind,
+        itself or as a part, else default.
+        """
+        return self._find_target(kind, self._pending.values(), default)
+
+    def submit(
+        self,
+        kind: str,
+        target: Hashable,
+        start: Callable[[], Optional[ApplyJob]],
+        current=_NONE,
+        force: bool = False,
+        owner=None,
+    ) -> bool:
+        """Queue an apply, returning False if it was dropped as redundant.
+
+        current is the active target of the kind; a request for it is
+        dropped unless force is set, e.g. for a confirmed reapply. owner
+        is who asked for it, see cancel_all().
+        """
+        if self.get_target(kind, _NONE) == target:
+            logger.debug("%s %s is already queued or running", kind, target)
+            return False
+        # What the kind ends up as if its own pending request is dropped
+        others = [request for request in self._pending.values() if request.kind != kind]
+        if self._find_target(kind, others, _NONE) == target:
+            # The latest choice is the one already running or queued
+            if self._pending.pop(kind, None) is not None:
+                logger.info("Dropped the pending %s apply, %s is already set", kind, target)
+                self._notify()
+            return False
+        if (
+            not force
+            and self.get_target(kind, _NONE) is _NONE
+            and current is not _NONE
+            and target == current
+        ):
+            logger.info("Skipping the %s apply, %s is already active", kind, target)
+            return False
+
+        superseded = self._pending.pop(kind, None)
+        if superseded is not None:
+            logger.info("%s %s superseded by %s", kind, superseded.target, target)
+        self._pending[kind] = ApplyRequest(kind, target, start, owner)
+        self._run_next()
+        self._notify()
+        return True
+
+    def cancel_all(self, owner=None) -> None:
+        """Drop the pending requests and cancel the running apply.
+
+        With an owner, only the requests it submitted are dropped or
+        cancelled, e.g. when one of several windows is closed.
+        """
+        for kind, request in list(self._pending.items()):
+            if owner is None or request.owner is owner:
+                del self._pending[kind]
+        if self._job is not None and (owner is None or self._running.owner is owner):
+            self._job.cancel()
+        self._notify()
+
+    def _find_target(self, kind: str, pending: Iterable[ApplyRequest], default):
+        """Return the target of kind set last by pending or the running request."""
+        for request in reversed(list(pending)):
+            target = self._get_part(request, kind)
+            if target is not _NONE:
+                return target
+        if self._running is not None:
+            target = self._get_part(self._running, kind)
+            if target is not _NONE:
+                return target
+        return default
+
+    def _get_part(self, request: ApplyRequest, kind: str):
+        """Return the target of kind a request sets, or _NONE."""
+        if request.kind == kind:
+            return request.target
+        get_part = self._parts.get((request.kind, kind))
+        return get_part(request.target) if get_part is not None else _NONE
+
+    def _run_next(self) -> None:
+        """Start the oldest pending request if nothing is running."""
+        while self._job is None and self._pending:
+            _kind, request = self._pending.popitem(last=False)
+            try:
+                job = request.start()
+            except Exception:
+                logger.exception("Error starting the %s apply", request.kind)
+                continue
+            if job is None:
+                continue
+            self._running = request
+            self._job = job
+            job.done_callbacks.append(self._on_job_done)
+
+    def _on_job_done(self, job: ApplyJob) -> None:
+        """Start the next request once the running apply has ended."""
+        if job is not self._job:
+            return
+        self._job = None
+        self._running = None
+        self._run_next()
+        self._notify()
+
+    def _notify(self) -> None:
+        """Call the changed callbacks."""
+        for callback in list(self.changed_callbacks):
+            callback()
+
+
+# Shared by the theme, desktop and profile managers
+apply_scheduler = ApplyScheduler()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3.13
+"""
+Catalog module for BigLinux Themes GUI.
+Discovers themes and desktop configurations from manifest files.
+
+Each entry is described by a *.catalog key file, for example:
+
+    [Catalog Entry]
+    Type=theme
+    Name=biglinux-dark
+    Label=BigLinux Dark
+    Label[pt_BR]=BigLinux Escuro
+    Preview=../img/biglinux-dark.png
+    Desktops=KDE;GNOME;
+    VariantOf=biglinux
+    Keywords=dark;night;
+    Order=20
+
+Manifests are read from CATALOG_DIRS, later directories overriding
+entries of the same type and name. The parsed entries are compiled into
+one JSON index in the cache directory, rebuilt only when the mtime of a
+catalog directory changes, so startup reads a single small file.
+Run directly to print the entry names of one type, e.g. `catalog.py themes`.
+"""
+
+import configparser
+import json
+import locale
+import logging
+import os
+import sys
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from i18n import _
+from utils import get_current_dir, get_cache_dir, is_gnome_session
+
+logger = logging.getLogger(__name__)
+
+# Entry types
+KIND_THEME = "theme"
+KIND_DESKTOP = "desktop"
+
+# Session names matched against the Desktops key
+SESSION_KDE = "KDE"
+SESSION_GNOME = "GNOME"
+
+# Directories scanned for manifests, lowest precedence first
+SYSTEM_CATALOG_DIR = os.path.join(get_current_dir(), "catalog")
+USER_CATALOG_DIR = os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"),
+    "biglinux-themes-gui",
+    "catalog",
+)
+CATALOG_DIRS = [SYSTEM_CATALOG_DIR, USER_CATALOG_DIR]
+
+MANIFEST_SUFFIX = ".catalog"
+MANIFEST_SECTION = "Catalog Entry"
+
+# Bump when the index layout changes
+INDEX_VERSION = 2
+
+# Used only when no manifest could be found at all
+BUILTIN_THEMES = ["biglinux", "biglinux-dark", "breeze", "breeze-dark"]
+BUILTIN_DESKTOPS = ["classic", "new", "modern", "kunity", "nextg", "vanilla"]
+BUILTIN_GNOME_DESKTOPS = ["biggnome", "gnome-unity", "gnome-vanilla"]
+
+
+class CatalogEntry(NamedTuple):
+    """A theme or desktop configuration declared by a manifest."""
+
+    kind: str
+    name: str
+    labels: Dict[str, str]
+    preview: str
+    desktops: Tuple[str, ...]
+    variant_of: str
+    order: int
+    keywords: Tuple[str, ...] = ()
+
+    def supports(self, session: str) -> bool:
+        """Check if the entry is offered in a session; no Desktops means all."""
+        return not self.desktops or session in self.desktops
+
+    def get_label(self) -> str:
+        """Get the label in the user's language."""
+        for language in _get_languages():
+            if language in self.labels:
+                return self.labels[language]
+        label = self.labels.get("")
+        if label:
+            return _(label)
+        return self.name.replace("-", " ")
+
+    def get_search_terms(self) -> List[str]:
+        """Get the texts the entry can be found by, in every language."""
+        return [
+            self.name,
+            self.get_label(),
+            *self.labels.values(),
+            *self.keywords,
+        ]
+
+
+def _get_languages() -> List[str]:
+    """Get the user's languages, most specific first, e.g. pt_BR then pt."""
+    languages = []
+    for variable in ("LANGUAGE", "LC_ALL", "LC_MESSAGES", "LANG"):
+        value = os.environ.get(variable)
+        if not value:
+            continue
+        for item in value.split(":"):
+            code = locale.normalize(item).split(".")[0].split("@")[0]
+            if code and code not in ("C", "POSIX"):
+                languages.append(code)
+                languages.append(code.split("_")[0])
+        break
+    return list(dict.fromkeys(languages))
+
+
+def parse_manifest(path: str) -> Optional[CatalogEntry]:
+    """Parse one manifest file, returning None if it is invalid."""
+    parser = configparser.ConfigParser(interpolation=None)
+    # Keep key case, Label[pt_BR] is not Label[pt_br]
+    parser.optionxform = str
+    try:
+        with open(path, encoding="utf-8") as f:
+            parser.read_file(f)
+        section = parser[MANIFEST_SECTION]
+        kind = section["Type"].strip()
+        name = section["Name"].strip()
+        order = int(section.get("Order", "0"))
+    except (OSError, UnicodeDecodeError, configparser.Error, KeyError, ValueError) as e:
+        logger.warning("Invalid catalog manifest %s: %s", path, e)
+        return None
+    if kind not in (KIND_THEME, KIND_DESKTOP) or not name:
+        logger.warning("Invalid catalog manifest %s: bad Type or Name", path)
+        return None
+
+    labels = {}
+    for key, value in section.items():
+        if key == "Label":
+            labels[""] = value
+        elif key.startswith("Label[") and key.endswith("]"):
+            labels[key[6:-1]] = value
+
+    preview = section.get("Preview", "").strip()
+    if preview:
+        preview = os.path.normpath(os.path.join(os.path.dirname(path), preview))
+
+    desktops = tuple(d.strip() for d in section.get("Desktops", "").split(";") if d.strip())
+
+    # Keywords of every language, a search in any of them finds the entry
+    keywords = []
+    for key, value in section.items():
+        if key == "Keywords" or (key.startswith("Keywords[") and key.endswith("]")):
+            keywords.extend(k.strip() for k in value.split(";") if k.strip())
+
+    return CatalogEntry(
+        kind,
+        name,
+        labels,
+        preview,
+        desktops,
+        section.get("VariantOf", "").strip(),
+        order,
+        tuple(dict.fromkeys(keywords)),
+    )
+
+
+class Catalog:
+    """Index of the manifests found in the catalog directories.
+
+    The index is loaded from its cache file when the recorded directory
+    mtimes still match, otherwise every directory is scanned once and the
+    cache file rewritten. Adding or removing a manifest updates the mtime
+    of its directory; an edit in place is picked up after the next
+    addition or removal, or by deleting the index file.
+    """
+
+    def __init__(self, directories: List[str] = None, index_path: str = None):
+        """Initialize the catalog; entries are loaded on first use."""
+        self.directories = list(directories or CATALOG_DIRS)
+        self.index_path = index_path or os.path.join(get_cache_dir(), "catalog-index.json")
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[Tuple[str, str], CatalogEntry]] = None
+        self._stamps = None
+
+    def entries(self, kind: str, session: str = None) -> List[CatalogEntry]:
+        """Get the entries of a type offered in a session, in display order."""
+        if session is None:
+            session = SESSION_GNOME if is_gnome_session() else SESSION_KDE
+        entries = [
+            entry
+            for entry in self._load().values()
+            if entry.kind == kind and entry.supports(session)
+        ]
+        entries.sort(key=lambda entry: (entry.order, entry.name))
+        return entries
+
+    def names(self, kind: str, session: str = None) -> List[str]:
+        """Get the entry names of a type offered in a session."""
+        return [entry.name for entry in self.entries(kind, session)]
+
+    def get(self, kind: str, name: str) -> Optional[CatalogEntry]:
+        """Get the entry of a type with this name, or None."""
+        return self._load().get((kind, name))
+
+    def refresh(self) -> None:
+        """Reload the index if a catalog directory changed."""
+        if self._dir_stamps() != self._stamps:
+            with self._lock:
+                self._entries = None
+
+    def _load(self) -> Dict[Tuple[str, str], CatalogEntry]:
+        """Return the entries, from memory, the index file or a scan."""
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+            stamps = self._dir_stamps()
+            entries = self._read_index(stamps)
+            if entries is None:
+                entries = self._scan()
+                self._write_index(stamps, entries)
+            self._entries = entries
+            self._stamps = stamps
+            return entries
+
+    def _dir_stamps(self) -> Dict[str, Optional[int]]:
+        """Return the mtime of each catalog directory, None if missing."""
+        stamps = {}
+        for directory in self.directories:
+            try:
+                stamps[directory] = os.stat(directory).st_mtime_ns
+            except OSError:
+                stamps[directory] = None
+        return stamps
+
+    def _scan(self) -> Dict[Tuple[str, str], CatalogEntry]:
+        """Parse every manifest of the catalog directories."""
+        entries = {}
+        for directory in self.directories:
+            try:
+                names = sorted(
+                    name for name in os.listdir(directory) if name.endswith(MANIFEST_SUFFIX)
+                )
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning("Error scanning catalog %s: %s", directory, e)
+                continue
+            for name in names:
+                entry = parse_manifest(os.path.join(directory, name))
+                if entry is not None:
+                    entries[(entry.kind, entry.name)] = entry
+        logger.debug("Catalog scanned: %d entries", len(entries))
+        return entries
+
+    def _read_index(self, stamps) -> Optional[Dict[Tuple[str, str], CatalogEntry]]:
+        """Load the index file if it was built from the same directories."""
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or data.get("stamps") != stamps:
+                return None
+            entries = {}
+            for item in data["entries"]:
+                item["desktops"] = tuple(item["desktops"])
+                item["keywords"] = tuple(item["keywords"])
+                entry = CatalogEntry(**item)
+                entries[(entry.kind, entry.name)] = entry
+            return entries
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring catalog index %s: %s", self.index_path, e)
+            return None
+
+    def _write_index(self, stamps, entries) -> None:
+        """Write the index file atomically."""
+        data = {
+            "version": INDEX_VERSION,
+            "stamps": stamps,
+            "entries": [entry._asdict() for entry in entries.values()],
+        }
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logger.warning("Error writing catalog index %s: %s", self.index_path, e)
+
+
+# Shared catalog used by the helpers below
+catalog = Catalog()
+
+
+def _get_list(kind: str, builtin: List[str]) -> List[str]:
+    """Return the names of a type, from the manifests or the built-in list."""
+    return catalog.names(kind) or list(builtin)
+
+
+def get_theme_list() -> List[str]:
+    """Get list of available themes."""
+    return _get_list(KIND_THEME, BUILTIN_THEMES)
+
+
+def get_desktop_list() -> List[str]:
+    """Get list of available desktop configurations."""
+    builtin = BUILTIN_GNOME_DESKTOPS if is_gnome_session() else BUILTIN_DESKTOPS
+    return _get_list(KIND_DESKTOP, builtin)
+
+
+def get_label(kind: str, name: str) -> str:
+    """Get the display label of an entry."""
+    entry = catalog.get(kind, name)
+    if entry is None:
+        return name.replace("-", " ")
+    return entry.get_label()
+
+
+def get_search_terms(kind: str, name: str) -> List[str]:
+    """Get the texts an entry can be found by."""
+    entry = catalog.get(kind, name)
+    if entry is None:
+        return [name, name.replace("-", " ")]
+    return entry.get_search_terms()
+
+
+def get_preview_path(kind: str, name: str) -> str:
+    """Get the preview image of an entry, img/<name>.png|svg if not declared."""
+    entry = catalog.get(kind, name)
+    if entry is not None and entry.preview:
+        return entry.preview
+    extension = "png" if kind == KIND_THEME else "svg"
+    return os.path.join(get_current_dir(), "img", f"{name}.{extension}")
+
+
+if __name__ == "__main__":
+    kinds = {"themes": KIND_THEME, "desktops": KIND_DESKTOP}
+    if len(sys.argv) != 2 or sys.argv[1] not in kinds:
+        sys.exit(f"usage: {sys.argv[0]} themes|desktops")
+    print("\n".join(catalog.names(kinds[sys.argv[1]])))
@@ -0,0 +1,418 @@
+"""
+Catalog view module for BigLinux Themes GUI.
+Model items and recycling grid views for the theme and desktop catalogs.
+"""
+
+from typing import Callable, Iterable, Optional
+
+import gi
+
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gtk, Gdk, Gio, GObject
+
+from image_loader import image_loader, PRIORITY_VISIBLE
+from search_index import SearchIndex
+from thumbnail_cache import THEME_PREVIEW_WIDTH, THEME_PREVIEW_ASPECT
+
+# Desktop layout icon size and padding around it
+DESKTOP_ICON_WIDTH = 40
+DESKTOP_ICON_HEIGHT = 28
+DESKTOP_ICON_PADDING = 5
+
+
+class CatalogItem(GObject.Object):
+    """A theme or desktop entry of a catalog model."""
+
+    __gtype_name__ = "BigThemesCatalogItem"
+
+    name = GObject.Property(type=str, default="")
+    label = GObject.Property(type=str, default="")
+    tooltip = GObject.Property(type=str, default="")
+    active = GObject.Property(type=bool, default=False)
+    busy = GObject.Property(type=bool, default=False)
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        tooltip: str,
+        load_texture: Callable[[int], Gdk.Texture],
+        active: bool = False,
+    ):
+        """Initialize the item; load_texture(scale) runs on a worker thread."""
+        super().__init__(name=name, label=label, tooltip=tooltip, active=active)
+        self.load_texture = load_texture
+        self.texture = None
+        # Scale factor the texture was loaded for
+        self.texture_scale = 0
+
+    def set_texture(self, texture: Optional[Gdk.Texture], scale: int) -> None:
+        """Keep a loaded texture for the cells showing this item."""
+        if texture is not None:
+            self.texture = texture
+            self.texture_scale = scale
+
+
+class _CatalogCell(Gtk.Overlay):
+    """Base class of the recycled widgets shown for catalog items."""
+
+    check_margin = 10
+    # Size of the empty paintable shown until the image is loaded
+    placeholder_width = 0
+    placeholder_height = 0
+
+    def __init__(self):
+        """Create the persistent checkmark and spinner overlays."""
+        super().__init__()
+        self.item = None
+        self._handlers = []
+
+        # Checkmark and spinner live for the whole cell and are only toggled
+        self.check_icon = Gtk.Image.new_from_icon_name("object-select-symbolic")
+        self.check_icon.add_css_class("success")
+        self.check_icon.set_halign(Gtk.Align.END)
+        self.check_icon.set_valign(Gtk.Align.START)
+        self.check_icon.set_margin_top(self.check_margin)
+        self.check_icon.set_margin_end(self.check_margin)
+        self.check_icon.set_visible(False)
+
+        self.spinner = Gtk.Spinner()
+        self.spinner.set_size_request(32, 32)
+        self.spinner.set_halign(Gtk.Align.CENTER)
+        self.spinner.set_valign(Gtk.Align.CENTER)
+        self.spinner.set_visible(False)
+
+        # Moving to a monitor with another scale needs a sharper or smaller image
+        self.connect("notify::scale-factor", self._on_scale_changed)
+
+    def _add_overlays(self):
+        """Add the overlays once the main child is set."""
+        self.add_overlay(self.check_icon)
+        self.add_overlay(self.spinner)
+
+    def bind(self, item: CatalogItem) -> None:
+        """Show the given item in this cell."""
+        self.item = item
+        self.set_tooltip_text(item.tooltip)
+        self._bind_content(item)
+
+        if item.texture is not None:
+            self.picture.set_paintable(item.texture)
+        else:
+            self.picture.set_paintable(self._placeholder())
+        self._load_image()
+
+        self._handlers = [
+            item.connect("notify::active", self._on_state_changed),
+            item.connect("notify::busy", self._on_state_changed),
+        ]
+        self._on_state_changed(item, None)
+
+    def unbind(self) -> None:
+        """Detach the cell from its item before it is recycled."""
+        if self.item is not None:
+            for handler in self._handlers:
+                self.item.disconnect(handler)
+        self._handlers = []
+        self.item = None
+
+    def _load_image(self) -> None:
+        """Load the item's image unless it is already loaded at this scale."""
+        item = self.item
+        scale = self.get_scale_factor()
+        if item.texture is not None and item.texture_scale == scale:
+            return
+        image_loader.load(
+            self.picture,
+            lambda: item.load_texture(scale),
+            PRIORITY_VISIBLE,
+            on_loaded=lambda texture: item.set_texture(texture, scale),
+        )
+
+    def _on_scale_changed(self, cell, pspec):
+        """Reload the bound item's image for the new scale factor."""
+        if self.item is not None:
+            self._load_image()
+
+    def _on_state_changed(self, item, pspec):
+        """Reflect the active and busy state of the item."""
+        if item.active:
+            self.add_css_class("frame")
+            self.add_css_class("accent")
+            self.add_css_class("active-bg")
+        else:
+            self.remove_css_class("frame")
+            self.remove_css_class("accent")
+            self.remove_css_class("active-bg")
+        self.check_icon.set_visible(item.active and not item.busy)
+
+        self.spinner.set_visible(item.busy)
+        self.spinner.set_spinning(item.busy)
+        self.set_sensitive(not item.busy)
+
+    def _bind_content(self, item: CatalogItem) -> None:
+        """Fill the item specific content; implemented by subclasses."""
+
+    def _placeholder(self) -> Gdk.Paintable:
+        """Return the paintable shown until the image is loaded."""
+        return Gdk.Paintable.new_empty(self.placeholder_width, self.placeholder_height)
+
+
+class ThemeCell(_CatalogCell):
+    """Recycled widget showing a theme preview and its name."""
+
+    # The preview's aspect ratio, so the grid does not jump once it loads
+    placeholder_width = THEME_PREVIEW_WIDTH
+    placeholder_height = round(THEME_PREVIEW_WIDTH / THEME_PREVIEW_ASPECT)
+
+    def __init__(self):
+        """Build the widget tree once; bind() only updates its content."""
+        super().__init__()
+        self.set_margin_top(3)
+        self.set_margin_bottom(3)
+
+        # Create main container
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        box.set_margin_start(8)
+        box.set_margin_end(8)
+        box.set_hexpand(True)
+        box.set_vexpand(True)
+
+        # Create an outer box to handle the hover effect without affecting content size
+        outer_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        outer_box.set_hexpand(True)
+        outer_box.set_vexpand(True)
+        outer_box.add_css_class("clickable-item")
+        outer_box.set_cursor(Gdk.Cursor.new_from_name("pointer", None))
+        outer_box.append(box)
+
+        self.picture = Gtk.Picture()
+        self.picture.set_keep_aspect_ratio(True)
+        self.picture.set_hexpand(True)
+        self.picture.set_vexpand(True)
+        self.picture.set_can_shrink(True)
+
+        self.label = Gtk.Label()
+        self.label.set_ellipsize(True)
+        self.label.set_max_width_chars(25)
+
+        box.append(self.picture)
+        box.append(self.label)
+
+        self.set_child(outer_box)
+        self._add_overlays()
+
+    def _bind_content(self, item: CatalogItem) -> None:
+        """Show the theme name."""
+        self.label.set_label(item.label)
+
+
+class DesktopCell(_CatalogCell):
+    """Recycled widget showing a desktop layout icon."""
+
+    check_margin = 20
+    placeholder_width = DESKTOP_ICON_WIDTH
+    placeholder_height = DESKTOP_ICON_HEIGHT
+
+    def __init__(self):
+        """Build the widget tree once; bind() only updates its content."""
+        super().__init__()
+        width = DESKTOP_ICON_WIDTH
+        height = DESKTOP_ICON_HEIGHT
+        padding = DESKTOP_ICON_PADDING
+
+        self.set_halign(Gtk.Align.CENTER)
+        self.set_valign(Gtk.Align.FILL)
+
+        # Create a fixed-size container with the hover effect
+        outer_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        outer_box.add_css_class("clickable-item")
+        outer_box.set_size_request(width + (padding * 2), height + (padding * 2))
+        outer_box.set_hexpand(False)
+        outer_box.set_vexpand(False)
+        outer_box.set_halign(Gtk.Align.CENTER)
+        outer_box.set_valign(Gtk.Align.CENTER)
+        outer_box.set_cursor(Gdk.Cursor.new_from_name("pointer", None))
+
+        # Inner container positions the picture with exact padding
+        inner_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        inner_box.set_size_request(width, height)
+        inner_box.set_halign(Gtk.Align.CENTER)
+        inner_box.set_valign(Gtk.Align.CENTER)
+        inner_box.set_margin_start(padding)
+        inner_box.set_margin_end(padding)
+        inner_box.set_margin_top(padding)
+        inner_box.set_margin_bottom(padding)
+
+        self.picture = Gtk.Picture()
+        self.picture.set_size_request(width, height)
+        self.picture.set_keep_aspect_ratio(True)
+        self.picture.set_halign(Gtk.Align.CENTER)
+        self.picture.set_valign(Gtk.Align.CENTER)
+        self.picture.set_hexpand(False)
+        self.picture.set_vexpand(False)
+
+        inner_box.append(self.picture)
+        outer_box.append(inner_box)
+
+        self.set_child(outer_box)
+        self._add_overlays()
+
+
+class SelectionController:
+    """Tracks the active item of a catalog model.
+
+    Keeps a name to item index, so moving the active state only touches the
+    previously active item and the new one. Bound cells follow the item's
+    active property and toggle their persistent checkmark.
+    """
+
+    def __init__(self, model: Gio.ListModel):
+        """Index the model and follow later changes to it."""
+        self.model = model
+        self._index = {}
+        self._active = None
+        self._rebuild()
+        self._handler = model.connect("items-changed", self._on_items_changed)
+
+    def disconnect(self) -> None:
+        """Stop following the model, e.g. when its window is closed."""
+        if self._handler is not None:
+            self.model.disconnect(self._handler)
+            self._handler = None
+
+    def _rebuild(self) -> None:
+        """Rebuild the name index from the model."""
+        self._index = {}
+        self._active = None
+        for item in self.model:
+            self._index[item.name] = item
+            if item.active and self._active is None:
+                self._active = item
+
+    def _on_items_changed(self, model, position, removed, added):
+        """Keep the index in sync with the model."""
+        self._rebuild()
+
+    def get(self, name: str) -> Optional[CatalogItem]:
+        """Return the item with the given name, or None."""
+        return self._index.get(name)
+
+    def get_active_name(self) -> Optional[str]:
+        """Return the name of the active item, or None."""
+        return self._active.name if self._active is not None else None
+
+    def set_active(self, name: Optional[str]) -> None:
+        """Make the named item the active one."""
+        item = self._index.get(name) if name else None
+        if item is self._active:
+            return
+        if self._active is not None:
+            self._active.active = False
+        self._active = item
+        if item is not None:
+            item.active = True
+
+
+class CatalogFilter:
+    """Filters a catalog model by a search query.
+
+    The filtered model shows the same items, so bound cells and the
+    SelectionController keep working on the base model. Search terms are
+    indexed once per model content; each query is one index lookup and
+    the filter is told whether it got stricter, so a typed letter only
+    re-checks the items still shown.
+    """
+
+    def __init__(self, model: Gio.ListModel, get_terms: Callable[[str], Iterable[str]]):
+        """Wrap model; get_terms returns the search terms of an entry name."""
+        self.base_model = model
+        self._get_terms = get_terms
+        self._index = None
+        self._query = ""
+        self._matches = None
+        self._filter = Gtk.CustomFilter.new(self._match)
+        self.model = Gtk.FilterListModel(model=model, filter=self._filter)
+        self._handler = model.connect("items-changed", self._on_items_changed)
+
+    def disconnect(self) -> None:
+        """Stop following the base model, e.g. when its window is closed."""
+        if self._handler is not None:
+            self.base_model.disconnect(self._handler)
+            self._handler = None
+
+    def build_index(self) -> None:
+        """Index the search terms of every item, if not done yet."""
+        if self._index is None:
+            self._index = SearchIndex()
+            for item in self.base_model:
+                self._index.add(item.name, self._get_terms(item.name))
+
+    def set_query(self, query: str) -> None:
+        """Show only the items matching query, all of them if it is empty."""
+        self._query = query
+        self.build_index()
+        previous = self._matches
+        self._matches = self._index.search(query)
+
+        if previous is None and self._matches is None:
+            return
+        if self._matches is None:
+            change = Gtk.FilterChange.LESS_STRICT
+        elif previous is None or self._matches <= previous:
+            change = Gtk.FilterChange.MORE_STRICT
+        elif self._matches >= previous:
+            change = Gtk.FilterChange.LESS_STRICT
+        else:
+            change = Gtk.FilterChange.DIFFERENT
+        self._filter.changed(change)
+
+    def get_n_matches(self) -> int:
+        """Return the number of items shown."""
+        return self.model.get_n_items()
+
+    def _match(self, item: CatalogItem) -> bool:
+        """Check if an item matches the current query."""
+        return self._matches is None or item.name in self._matches
+
+    def _on_items_changed(self, model, position, removed, added):
+        """Index the new content and apply the current query to it."""
+        self._index = None
+        if self._query:
+            self.build_index()
+            self._matches = self._index.search(self._query)
+            self._filter.changed(Gtk.FilterChange.DIFFERENT)
+
+
+def create_catalog_view(
+    cell_class: type, on_activate: Callable, model: Optional[Gio.ListModel] = None
+) -> Gtk.GridView:
+    """Create a grid view that builds cell_class widgets only for visible items.
+
+    on_activate is called with (grid_view, item) when an entry is clicked.
+    """
+    factory = Gtk.SignalListItemFactory()
+    factory.connect("setup", lambda f, list_item: list_item.set_child(cell_class()))
+    factory.connect(
+        "bind", lambda f, list_item: list_item.get_child().bind(list_item.get_item())
+    )
+    factory.connect("unbind", lambda f, list_item: list_item.get_child().unbind())
+
+    grid_view = Gtk.GridView(factory=factory)
+    grid_view.set_single_click_activate(True)
+    if model is not None:
+        set_catalog_model(grid_view, model)
+
+    def activated(view, position):
+        item = view.get_model().get_item(position)
+        if item is not None:
+            on_activate(view, item)
+
+    grid_view.connect("activate", activated)
+    return grid_view
+
+
+def set_catalog_model(grid_view: Gtk.GridView, model: Gio.ListModel) -> None:
+    """Show a model of CatalogItem objects in a catalog grid view."""
+    # No selection model, the active entry is tracked by the items themselves
+    grid_view.set_model(Gtk.NoSelection(model=model))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3.13
+"""
+BigLinux Themes CLI
+Headless front end to list, query and apply themes and desktops.
+
+Built only on the toolkit-free core, it imports no GI module and works
+over SSH without a display. All results are printed as JSON on stdout;
+diagnostics from the apply tools go to stderr.
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+
+from core import ThemeCore, DesktopCore, ProfileCore, Profile, undo_last_change
+from snapshot import StaleSnapshot
+from tracing import setup_logging
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def _emit(data: dict, indent) -> None:
+    """Print a JSON document on stdout."""
+    json.dump(data, sys.stdout, indent=indent)
+    sys.stdout.write("\n")
+
+
+def _print_progress(progress) -> None:
+    """Print a progress step of an apply tool on stderr."""
+    print(f"[{progress.step}/{progress.total}] {progress.message}", file=sys.stderr)
+
+
+def cmd_list_themes(args) -> dict:
+    """List the available themes."""
+    themes = ThemeCore()
+    current = themes.get_current_theme()
+    return {
+        "themes": [
+            {
+                "name": name,
+                "label": themes.get_theme_label(name),
+                "current": name == current,
+            }
+            for name in themes.get_theme_list()
+        ]
+    }
+
+
+def cmd_list_desktops(args) -> dict:
+    """List the available desktop configurations."""
+    desktops = DesktopCore()
+    current = desktops.get_current_desktop()
+    return {
+        "desktops": [
+            {
+                "name": name,
+                "label": desktops.get_desktop_label(name),
+                "current": name == current,
+                "saved": desktops.is_desktop_used(name),
+            }
+            for name in desktops.get_desktop_list()
+        ]
+    }
+
+
+def cmd_current(args) -> dict:
+    """Show the current theme and desktop configuration."""
+    return {
+        "theme": ThemeCore().get_current_theme(),
+        "desktop": DesktopCore().get_current_desktop(),
+    }
+
+
+def cmd_apply_theme(args) -> dict:
+    """Apply a theme."""
+    themes = ThemeCore()
+    if not themes.has_theme(args.name) and not args.force:
+        raise UsageError(f"Unknown theme: {args.name}")
+    themes.set_theme(args.name, on_progress=_print_progress)
+    return {"applied": "theme", "theme": args.name}
+
+
+def cmd_apply_desktop(args) -> dict:
+    """Apply a desktop configuration."""
+    desktops = DesktopCore()
+    if not desktops.has_desktop(args.name) and not args.force:
+        raise UsageError(f"Unknown desktop: {args.name}")
+    desktops.set_desktop(
+        args.name, "clean" if args.clean else "", on_progress=_print_progress
+    )
+    return {"applied": "desktop", "desktop": args.name, "clean": args.clean}
+
+
+def cmd_apply_profile(args) -> dict:
+    """Apply a theme and a desktop configuration in one operation."""
+    themes = ThemeCore()
+    desktops = DesktopCore()
+    if not args.force:
+        if not themes.has_theme(args.theme):
+            raise UsageError(f"Unknown theme: {args.theme}")
+        if not desktops.has_desktop(args.desktop):
+            raise UsageError(f"Unknown desktop: {args.desktop}")
+    profile = Profile(args.theme, args.desktop, "clean" if args.clean else "")
+    ProfileCore(themes, desktops).set_profile(profile, on_progress=_print_progress)
+    return {
+        "applied": "profile",
+        "theme": args.theme,
+        "desktop": args.desktop,
+        "clean": args.clean,
+    }
+
+
+def cmd_undo(args) -> dict:
+    """Restore the configuration from before the last applied change."""
+    try:
+        info = undo_last_change()
+    except StaleSnapshot as e:
+        # Restoring it would also revert the changes made since
+        raise UsageError(f"Refusing to undo: {e}")
+    if info is None:
+        raise UsageError("Nothing to undo")
+    return {
+        "undone": info.get("kind"),
+        "name": info.get("name"),
+        "restored": info.get("previous"),
+    }
+
+
+class UsageError(Exception):
+    """Raised for invalid command-line input."""
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="big-themes-cli",
+        description="List, query and apply BigLinux themes and desktops.",
+    )
+    parser.add_argument(
+        "--indent", type=int, default=None, help="indent the JSON output"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list-themes", help="list the available themes").set_defaults(
+        func=cmd_list_themes
+    )
+    commands.add_parser(
+        "list-desktops", help="list the available desktop configurations"
+    ).set_defaults(func=cmd_list_desktops)
+    commands.add_parser(
+        "current", help="show the current theme and desktop"
+    ).set_defaults(func=cmd_current)
+
+    apply_theme = commands.add_parser("apply-theme", help="apply a theme")
+    apply_theme.add_argument("name")
+    apply_theme.add_argument(
+        "--force", action="store_true", help="apply even if not in the catalog"
+    )
+    apply_theme.set_defaults(func=cmd_apply_theme)
+
+    apply_desktop = commands.add_parser(
+        "apply-desktop", help="apply a desktop configuration"
+    )
+    apply_desktop.add_argument("name")
+    apply_desktop.add_argument(
+        "--clean",
+        action="store_true",
+        help="use the original configuration instead of restoring a saved one",
+    )
+    apply_desktop.add_argument(
+        "--force", action="store_true", help="apply even if not in the catalog"
+    )
+    apply_desktop.set_defaults(func=cmd_apply_desktop)
+
+    apply_profile = commands.add_parser(
+        "apply-profile", help="apply a theme and a desktop configuration together"
+    )
+    apply_profile.add_argument("theme")
+    apply_profile.add_argument("desktop")
+    apply_profile.add_argument(
+        "--clean",
+        action="store_true",
+        help="use the original desktop configuration instead of a saved one",
+    )
+    apply_profile.add_argument(
+        "--force", action="store_true", help="apply even if not in the catalog"
+    )
+    apply_profile.set_defaults(func=cmd_apply_profile)
+
+    commands.add_parser(
+        "undo", help="restore the configuration from before the last change"
+    ).set_defaults(func=cmd_undo)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Run the command line front end."""
+    setup_logging()
+    args = build_parser().parse_args(argv)
+    try:
+        # Keep stdout for the JSON result, the helpers print progress there
+        with contextlib.redirect_stdout(sys.stderr):
+            result = args.func(args)
+    except UsageError as e:
+        _emit({"error": str(e)}, args.indent)
+        return EXIT_USAGE
+    except Exception as e:
+        _emit({"error": str(e)}, args.indent)
+        return EXIT_FAILED
+    _emit(result, args.indent)
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
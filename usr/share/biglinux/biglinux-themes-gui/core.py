@@ -0,0 +1,270 @@
+"""
+Core module for BigLinux Themes GUI.
+Toolkit-free theme and desktop operations shared by the GUI and the CLI.
+
+Nothing in this module, or in the modules it imports, may import gi, so
+the command-line front end starts without loading any GI library.
+"""
+
+from typing import List, NamedTuple, Optional
+
+from utils import (
+    state_provider,
+    get_current_theme,
+    apply_theme,
+    get_current_desktop,
+    check_desktop_used,
+    apply_desktop,
+    apply_profile,
+    saved_layouts,
+    SavedLayout,
+)
+from catalog import (
+    get_theme_list,
+    get_desktop_list,
+    get_label,
+    get_search_terms,
+    get_preview_path,
+    KIND_THEME,
+    KIND_DESKTOP,
+)
+from snapshot import snapshot_store, THEME_SNAPSHOT, DESKTOP_SNAPSHOT, PROFILE_SNAPSHOT
+
+
+class ThemeCore:
+    """Theme state and operations without any UI."""
+
+    def __init__(self):
+        """Initialize the theme state."""
+        self.current_theme = get_current_theme()
+        self.theme_list = get_theme_list()
+        self.theme_changed_callbacks = []
+
+    def get_current_theme(self) -> str:
+        """Get the currently active theme."""
+        self.current_theme = get_current_theme()
+        return self.current_theme
+
+    def get_theme_list(self) -> List[str]:
+        """Get the list of available themes."""
+        return self.theme_list
+
+    def has_theme(self, theme_name: str) -> bool:
+        """Check if a theme is part of the catalog."""
+        return theme_name in self.theme_list
+
+    def set_theme(self, theme_name: str, cancellable=None, on_progress=None) -> None:
+        """Set a theme as active, blocking until the apply tool finishes."""
+        self.run_theme_apply(theme_name, cancellable=cancellable, on_progress=on_progress)
+        self.current_theme = theme_name
+        self._notify_theme_changed()
+
+    def run_theme_apply(self, theme_name: str, cancellable=None, on_progress=None) -> None:
+        """Run the apply tool, rolling the configuration back if it fails.
+
+        on_progress receives the Progress steps reported by the tool.
+        """
+        with snapshot_store.transaction(
+            THEME_SNAPSHOT,
+            kind=KIND_THEME,
+            name=theme_name,
+            previous=self.current_theme,
+        ):
+            apply_theme(theme_name, cancellable=cancellable, on_progress=on_progress)
+
+    def reload_current_theme(self) -> None:
+        """Re-read the current theme, e.g. after an undo."""
+        self.update_current_theme(get_current_theme())
+
+    def update_current_theme(self, theme_name: str) -> None:
+        """Record a theme change made outside this manager, e.g. by another tool."""
+        if theme_name != self.current_theme:
+            self.current_theme = theme_name
+            self._notify_theme_changed()
+
+    def _notify_theme_changed(self) -> None:
+        """Notify all registered callbacks about a theme change."""
+        for callback in self.theme_changed_callbacks:
+            callback(self.current_theme)
+
+    def get_theme_label(self, theme_name: str) -> str:
+        """Get the display name of a theme."""
+        return get_label(KIND_THEME, theme_name)
+
+    def get_theme_search_terms(self, theme_name: str) -> List[str]:
+        """Get the names, labels and keywords a theme can be found by."""
+        return get_search_terms(KIND_THEME, theme_name)
+
+    def get_theme_image_path(self, theme_name: str) -> str:
+        """Get the path to a theme's preview image."""
+        return get_preview_path(KIND_THEME, theme_name)
+
+
+class DesktopCore:
+    """Desktop configuration state and operations without any UI."""
+
+    def __init__(self):
+        """Initialize the desktop state."""
+        self.current_desktop = get_current_desktop()
+        self.desktop_list = get_desktop_list()
+        # One scan up front, later lookups are answered from the index
+        saved_layouts.scan()
+        self.selected_desktop = None
+        self.desktop_changed_callbacks = []
+
+    def get_current_desktop(self) -> str:
+        """Get the currently active desktop configuration."""
+        self.current_desktop = get_current_desktop()
+        return self.current_desktop
+
+    def get_desktop_list(self) -> List[str]:
+        """Get the list of available desktop configurations."""
+        return self.desktop_list
+
+    def has_desktop(self, desktop_name: str) -> bool:
+        """Check if a desktop configuration is part of the catalog."""
+        return desktop_name in self.desktop_list
+
+    def set_desktop(
+        self, desktop_name: str, clean: str = "", cancellable=None, on_progress=None
+    ) -> None:
+        """Set a desktop configuration as active, blocking until it is applied."""
+        self.run_desktop_apply(
+            desktop_name, clean, cancellable=cancellable, on_progress=on_progress
+        )
+        self.current_desktop = desktop_name
+        self._notify_desktop_changed()
+
+    def run_desktop_apply(
+        self, desktop_name: str, clean: str = "", cancellable=None, on_progress=None
+    ) -> None:
+        """Run the apply tool, rolling the configuration back if it fails.
+
+        on_progress receives the Progress steps reported by the tool.
+        """
+        with snapshot_store.transaction(
+            DESKTOP_SNAPSHOT,
+            kind=KIND_DESKTOP,
+            name=desktop_name,
+            previous=self.current_desktop,
+        ):
+            apply_desktop(
+                desktop_name, clean, cancellable=cancellable, on_progress=on_progress
+            )
+
+    def reload_current_desktop(self) -> None:
+        """Re-read the current desktop configuration, e.g. after an undo."""
+        self.update_current_desktop(get_current_desktop())
+
+    def is_desktop_used(self, desktop_name: str) -> bool:
+        """Check if a desktop configuration has been used before."""
+        return check_desktop_used(desktop_name)
+
+    def get_saved_layout(self, desktop_name: str) -> Optional[SavedLayout]:
+        """Get metadata of the saved configuration of a desktop, if any."""
+        return saved_layouts.get(desktop_name)
+
+    def update_current_desktop(self, desktop_name: str) -> None:
+        """Record a desktop change made outside this manager, e.g. by another tool."""
+        if desktop_name != self.current_desktop:
+            self.current_desktop = desktop_name
+            self._notify_desktop_changed()
+
+    def _notify_desktop_changed(self) -> None:
+        """Notify all registered callbacks about a desktop change."""
+        for callback in self.desktop_changed_callbacks:
+            callback(self.current_desktop)
+
+    def get_desktop_label(self, desktop_name: str) -> str:
+        """Get the display name of a desktop configuration."""
+        return get_label(KIND_DESKTOP, desktop_name)
+
+    def get_desktop_search_terms(self, desktop_name: str) -> List[str]:
+        """Get the names, labels and keywords a desktop can be found by."""
+        return get_search_terms(KIND_DESKTOP, desktop_name)
+
+    def get_desktop_image_path(self, desktop_name: str) -> str:
+        """Get the path to a desktop configuration's preview image."""
+        return get_preview_path(KIND_DESKTOP, desktop_name)
+
+
+# Undo info kind of a combined theme and desktop change
+KIND_PROFILE = "profile"
+
+
+class Profile(NamedTuple):
+    """A theme and desktop configuration applied together."""
+
+    theme: str
+    desktop: str
+    clean: str = ""
+
+
+class ProfileCore:
+    """Applies a theme and a desktop configuration as one operation.
+
+    Both apply tools run from one script inside one snapshot transaction,
+    so a failure rolls back both and a single undo reverts both.
+    """
+
+    def __init__(self, theme_core: ThemeCore, desktop_core: DesktopCore):
+        """Initialize with the theme and desktop state to update."""
+        self.theme_core = theme_core
+        self.desktop_core = desktop_core
+
+    def set_profile(self, profile: Profile, cancellable=None, on_progress=None) -> None:
+        """Apply a profile, blocking until both apply tools finish."""
+        self.run_profile_apply(profile, cancellable=cancellable, on_progress=on_progress)
+        self.update_current(profile)
+
+    def run_profile_apply(self, profile: Profile, cancellable=None, on_progress=None) -> None:
+        """Run the apply tools, rolling the configuration back if they fail.
+
+        on_progress receives the Progress steps reported by the tools.
+        """
+        with snapshot_store.transaction(
+            PROFILE_SNAPSHOT,
+            kind=KIND_PROFILE,
+            name=f"{profile.theme}+{profile.desktop}",
+            previous={
+                "theme": self.theme_core.current_theme,
+                "desktop": self.desktop_core.current_desktop,
+            },
+        ):
+            apply_profile(
+                profile.theme,
+                profile.desktop,
+                profile.clean,
+                cancellable=cancellable,
+                on_progress=on_progress,
+            )
+
+    def update_current(self, profile: Profile) -> None:
+        """Record an applied profile and notify both cores' callbacks."""
+        self.theme_core.current_theme = profile.theme
+        self.desktop_core.current_desktop = profile.desktop
+        self.theme_core._notify_theme_changed()
+        self.desktop_core._notify_desktop_changed()
+
+
+def get_undo_info() -> Optional[dict]:
+    """Describe the last change that can be undone, or None."""
+    return snapshot_store.get_undo_info()
+
+
+def get_last_change() -> Optional[str]:
+    """Identify the last applied change, to undo exactly that one later."""
+    return snapshot_store.get_last_change()
+
+
+def undo_last_change(expected_change: str = None) -> Optional[dict]:
+    """Restore the configuration from before the last applied change.
+
+    Returns the info of the reverted change (kind, name, previous), or
+    None if there was nothing to undo. Raises StaleSnapshot if the saved
+    configuration predates the last change, or if the last change is not
+    expected_change, from get_last_change().
+    """
+    info = snapshot_store.undo(expected_change)
+    state_provider.invalidate()
+    return info
@@ -3,153 +3,125 @@ Desktop manager module for BigLinux Themes GUI.
 Handles desktop operations and provides desktop-related functionality.
 """
 
-from typing import List
-import os
 import gi
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-# Add Gdk to imports
-from gi.repository import Gtk, GdkPixbuf, GLib, Gdk
+from gi.repository import Gio
 
 # Import the translation function
 from i18n import _
-from utils import (
-    get_current_desktop,
-    get_desktop_list,
-    check_desktop_used,
-    apply_desktop,
-    get_current_dir,
-)
+from core import DesktopCore
+from apply_engine import ApplyJob
+from apply_scheduler import apply_scheduler
+from catalog import KIND_DESKTOP
+from session_reload import session_reloader
+from resources import get_uri
+from thumbnail_cache import thumbnail_cache
+from catalog_view import CatalogItem, DESKTOP_ICON_WIDTH, DESKTOP_ICON_HEIGHT
 
 
-class DesktopManager:
-    """Manager for desktop operations."""
+class DesktopManager(DesktopCore):
+    """Manager for desktop operations, adding the GTK side to DesktopCore."""
 
     def __init__(self):
         """Initialize the desktop manager."""
-        self.current_desktop = get_current_desktop()
-        self.desktop_list = get_desktop_list()
-        self.selected_desktop = None
-        self.desktop_changed_callbacks = []
-
-    def get_current_desktop(self) -> str:
-        """Get the currently active desktop configuration."""
-        self.current_desktop = get_current_desktop()
-        return self.current_desktop
-
-    def get_desktop_list(self) -> List[str]:
-        """Get the list of available desktop configurations."""
-        return self.desktop_list
-
-    def set_desktop(self, desktop_name: str, clean: str = "") -> None:
-        """Set a desktop configuration as active."""
-        apply_desktop(desktop_name, clean)
-        self.current_desktop = desktop_name
-        self._notify_desktop_changed()
-
-    def is_desktop_used(self, desktop_name: str) -> bool:
-        """Check if a desktop configuration has been used before."""
-        return check_desktop_used(desktop_name)
-
-    def _notify_desktop_changed(self) -> None:
-        """Notify all registered callbacks about a desktop change."""
-        for callback in self.desktop_changed_callbacks:
-            callback(self.current_desktop)
-
-    def get_desktop_image_path(self, desktop_name: str) -> str:
-        """Get the path to a desktop configuration's preview image."""
-        return os.path.join(get_current_dir(), "img", f"{desktop_name}.svg")
-
-    def create_desktop_widget(self, desktop_name: str) -> Gtk.Box:
-        """Create a widget for displaying a desktop configuration in the UI."""
-        # Image dimensions - fixed size for the desktop images
-        img_width = 40
-        img_height = 28
-        # Padding - exactly 5px on each side
-        padding = 5
-
-        # Create a fixed-size container
-        outer_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-
-        # Add CSS class for hover effect
-        outer_box.add_css_class("clickable-item")
-
-        # Set exact size of outer box (image + padding)
-        outer_box.set_size_request(
-            img_width + (padding * 2), img_height + (padding * 2)
+        super().__init__()
+        self._desktop_model = None
+
+    def set_desktop_async(
+        self,
+        desktop_name: str,
+        clean: str,
+        on_finished,
+        on_failed,
+        on_cancelled=None,
+        on_progress=None,
+    ) -> ApplyJob:
+        """Apply a desktop configuration on a worker thread and return the job.
+
+        The current desktop is only updated, and callbacks notified, once the
+        apply tool has finished successfully. A failed or cancelled apply is
+        rolled back to the previous configuration. After a successful apply
+        the running session is reloaded, and on_finished receives the desktop name
+        and the ReloadResult. on_progress receives the tool's Progress steps.
+        """
+
+        def apply_and_reload(cancellable=None, on_progress=None):
+            self.run_desktop_apply(
+                desktop_name, clean, cancellable=cancellable, on_progress=on_progress
+            )
+            return session_reloader.reload(KIND_DESKTOP)
+
+        def finished(reload_result):
+            self.current_desktop = desktop_name
+            self._notify_desktop_changed()
+            on_finished(desktop_name, reload_result)
+
+        job = ApplyJob(
+            apply_and_reload,
+            on_finished=finished,
+            on_failed=on_failed,
+            on_cancelled=on_cancelled,
+            on_progress=on_progress,
+        )
+        return job.start()
+
+    def schedule_desktop(
+        self, desktop_name: str, clean: str, start, force: bool = False, owner=None
+    ) -> bool:
+        """Queue a desktop apply on the shared scheduler.
+
+        start() is called when the apply's turn comes and returns the job,
+        usually from set_desktop_async. Returns False if the request was
+        dropped, being already active, queued or running; force only
+        allows reapplying the active desktop.
+        """
+        return apply_scheduler.submit(
+            KIND_DESKTOP,
+            (desktop_name, clean),
+            start,
+            current=(self.current_desktop, clean),
+            force=force,
+            owner=owner,
         )
 
-        # Fix the box size and prevent expansion
-        outer_box.set_hexpand(False)
-        outer_box.set_vexpand(False)
-
-        # Center alignment
-        outer_box.set_halign(Gtk.Align.CENTER)
-        outer_box.set_valign(Gtk.Align.CENTER)
+    def get_target_desktop(self) -> str:
+        """Get the desktop that will be active once the queued applies finish."""
+        target = apply_scheduler.get_target(KIND_DESKTOP)
+        return target[0] if target is not None else self.get_current_desktop()
+
+    def create_desktop_item(self, desktop_name: str) -> CatalogItem:
+        """Create the catalog item displaying a desktop configuration in the UI."""
+        # Bundled previews are read from the resource bundle
+        image_path = get_uri(self.get_desktop_image_path(desktop_name))
+        display_name = self.get_desktop_label(desktop_name)
+        return CatalogItem(
+            name=desktop_name,
+            label=display_name,
+            tooltip=_("Click to switch to the {} desktop environment").format(
+                display_name
+            ),
+            load_texture=lambda scale: thumbnail_cache.get_texture(
+                image_path, DESKTOP_ICON_WIDTH, scale, DESKTOP_ICON_HEIGHT
+            ),
+            active=desktop_name == self.current_desktop,
+        )
 
-        # If this is the current desktop, add selected class
-        if desktop_name == self.current_desktop:
-            outer_box.add_css_class("selected-desktop")
+    def create_desktop_model(self) -> Gio.ListStore:
+        """Create a list model with one item per desktop configuration."""
+        model = Gio.ListStore(item_type=CatalogItem)
+        model.splice(
+            0, 0, [self.create_desktop_item(name) for name in self.get_desktop_list()]
+        )
+        return model
 
-        # Set pointer cursor
-        cursor = Gdk.Cursor.new_from_name("pointer", None)
-        outer_box.set_cursor(cursor)
+    def get_desktop_model(self) -> Gio.ListStore:
+        """Get the shared desktop model, creating it on first use."""
+        if self._desktop_model is None:
+            self._desktop_model = self.create_desktop_model()
+        return self._desktop_model
 
-        # Set tooltip
-        display_name = desktop_name.replace("-", " ")
-        tooltip = _("Click to switch to the {} desktop environment").format(
-            display_name
-        )
-        outer_box.set_tooltip_text(tooltip)
-
-        # Create inner container for the picture with exact padding
-        inner_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-        inner_box.set_size_request(img_width, img_height)
-        inner_box.set_halign(Gtk.Align.CENTER)
-        inner_box.set_valign(Gtk.Align.CENTER)
-
-        # Add padding to position the image inside the outer box
-        inner_box.set_margin_start(padding)
-        inner_box.set_margin_end(padding)
-        inner_box.set_margin_top(padding)
-        inner_box.set_margin_bottom(padding)
-
-        # Load and create the image
-        image_path = self.get_desktop_image_path(desktop_name)
-        try:
-            if image_path.lower().endswith(".svg"):
-                picture = Gtk.Picture.new_for_filename(image_path)
-                picture.set_size_request(img_width, img_height)
-                picture.set_hexpand(True)
-                picture.set_vexpand(True)
-                picture.set_halign(Gtk.Align.CENTER)
-                picture.set_valign(Gtk.Align.CENTER)
-            else:
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-                    image_path,
-                    img_width,
-                    img_height,
-                    True,
-                )
-                picture = Gtk.Picture.new_for_pixbuf(pixbuf)
-                picture.set_size_request(img_width, img_height)
-                picture.set_keep_aspect_ratio(True)
-                picture.set_halign(Gtk.Align.CENTER)
-                picture.set_valign(Gtk.Align.CENTER)
-                picture.set_hexpand(False)
-                picture.set_vexpand(False)
-        except GLib.Error as e:
-            print(f"Error loading image {image_path}: {e}")
-            picture = Gtk.Picture()
-            picture.set_size_request(img_width, img_height)
-            picture.set_halign(Gtk.Align.CENTER)
-            picture.set_valign(Gtk.Align.CENTER)
-            picture.set_hexpand(False)
-            picture.set_vexpand(False)
-
-        # Add picture to inner box, then add inner box to outer box
-        inner_box.append(picture)
-        outer_box.append(inner_box)
-
-        return outer_box
+    def release_model(self) -> None:
+        """Drop the shared model and the textures held by its items."""
+        self._desktop_model = None
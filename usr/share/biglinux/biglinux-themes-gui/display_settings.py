@@ -0,0 +1,170 @@
+"""
+Display settings module for BigLinux Themes GUI.
+Probes and applies the Enhanced Contrast ICC profile without blocking the UI.
+"""
+
+import logging
+import time
+from typing import Callable, Optional
+
+from apply_engine import ApplyJob
+from utils import run_shell_command
+
+logger = logging.getLogger(__name__)
+
+# Tool applying the ICC profile through kscreen-doctor
+ICC_TOOL = "icc_profile_apply"
+
+# Give up on a status probe after this long (s)
+STATUS_TIMEOUT = 5
+
+# Stop an enable or disable still running after this long (s)
+APPLY_TIMEOUT = 60
+
+# A probed status is reused for this long (s), e.g. by later windows
+STATUS_MAX_AGE = 60
+
+
+class DisplaySettings:
+    """Cached Enhanced Contrast state of the displays.
+
+    The status is probed on a worker thread and shared by every window.
+    Until the first probe returns, or if it fails or times out, the
+    status is unknown (None). Enabling or disabling the profile also runs in the
+    background. changed_callbacks are called on the main loop whenever
+    the status or the busy state changes.
+    """
+
+    def __init__(self):
+        """Initialize with an unknown status; call probe() to fetch it."""
+        self.changed_callbacks = []
+        self._status: Optional[bool] = None
+        self._probed_at = None
+        self._probe_job = None
+        self._apply_job = None
+        self._target: Optional[bool] = None
+
+    @property
+    def status(self) -> Optional[bool]:
+        """Whether the profile is active, None while unknown."""
+        return self._status
+
+    @property
+    def target(self) -> Optional[bool]:
+        """The status being applied, or the current status when idle."""
+        return self._target if self._apply_job is not None else self._status
+
+    def is_probing(self) -> bool:
+        """Check if a status probe is running."""
+        return self._probe_job is not None
+
+    def is_applying(self) -> bool:
+        """Check if the profile is being enabled or disabled."""
+        return self._apply_job is not None
+
+    def probe(self, force: bool = False) -> None:
+        """Fetch the status in the background, unless a recent one is cached."""
+        if self._probe_job is not None or self._apply_job is not None:
+            return
+        if (
+            not force
+            and self._probed_at is not None
+            and time.monotonic() - self._probed_at < STATUS_MAX_AGE
+        ):
+            return
+        job = ApplyJob(
+            self._run_probe,
+            on_finished=lambda active: self._on_probe_finished(job, active),
+            on_failed=lambda error: self._on_probe_failed(job, error),
+            on_cancelled=lambda _error: self._on_probe_failed(job, None),
+        )
+        self._probe_job = job.start()
+        self._notify()
+
+    def apply(
+        self,
+        enable: bool,
+        on_finished: Callable[[], None] = None,
+        on_failed: Callable[[Exception], None] = None,
+    ) -> None:
+        """Enable or disable the profile in the background."""
+        if self._apply_job is not None:
+            return
+        if self._probe_job is not None:
+            # The apply decides the status, a late probe result would be stale
+            self._probe_job.cancel()
+            self._probe_job = None
+
+        self._target = enable
+
+        def finished(result):
+            self._apply_job = None
+            self._set_status(enable)
+            if on_finished is not None:
+                on_finished()
+
+        def failed(error):
+            self._apply_job = None
+            logger.error("Error applying ICC profile: %s", error)
+            # The tool may have changed some displays, check what it left behind
+            self._probed_at = None
+            self.probe()
+            if on_failed is not None:
+                on_failed(error)
+
+        self._apply_job = ApplyJob(
+            self._run_apply, enable, on_finished=finished, on_failed=failed
+        ).start()
+        self._notify()
+
+    def _run_probe(self, cancellable=None) -> bool:
+        """Ask the tool whether the profile is active; runs on a worker thread."""
+        # A hung tool leaves the status unknown instead of the switch loading forever
+        result = run_shell_command(
+            f"{ICC_TOOL} status", cancellable=cancellable, timeout=STATUS_TIMEOUT
+        )
+        # Active if any display reports it
+        return "Status: ACTIVE" in result.stdout
+
+    def _run_apply(self, enable: bool, cancellable=None) -> None:
+        """Enable or disable the profile; runs on a worker thread."""
+        action = "enable" if enable else "disable"
+        run_shell_command(
+            f"{ICC_TOOL} {action}",
+            cancellable=cancellable,
+            check=True,
+            timeout=APPLY_TIMEOUT,
+            # Not a short query, no CPU time limit as for the other applies
+            rlimits=None,
+        )
+
+    def _on_probe_finished(self, job, active):
+        """Cache the probed status."""
+        if job is not self._probe_job:
+            return
+        self._probe_job = None
+        self._probed_at = time.monotonic()
+        self._set_status(active)
+
+    def _on_probe_failed(self, job, error):
+        """Keep the last known status when the probe failed or timed out."""
+        if job is not self._probe_job:
+            return
+        if error is not None:
+            logger.warning("Error checking ICC profile status: %s", error)
+        self._probe_job = None
+        self._notify()
+
+    def _set_status(self, status: Optional[bool]) -> None:
+        """Store the status and tell the listeners."""
+        self._status = status
+        self._notify()
+
+    def _notify(self) -> None:
+        """Call the changed callbacks."""
+        for callback in list(self.changed_callbacks):
+            callback()
+
+
+# Shared state used by every window
+display_settings = DisplaySettings()
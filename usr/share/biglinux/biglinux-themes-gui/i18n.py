@@ -8,3 +8,5 @@ import gettext
 gettext.textdomain("biglinux-themes-gui")
 # Export _ directly as the translation function
 _ = gettext.gettext
+# Plural forms, e.g. ngettext("{} change", "{} changes", n)
+ngettext = gettext.ngettext
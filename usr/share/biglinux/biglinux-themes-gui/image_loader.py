@@ -0,0 +1,158 @@
+"""
+Image loader module for BigLinux Themes GUI.
+Decodes preview images on worker threads and swaps them into the UI.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from typing import Callable, Optional
+
+import gi
+
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gtk, GLib, Gdk
+
+logger = logging.getLogger(__name__)
+
+# Priorities for queued images, lower values load first
+PRIORITY_VISIBLE = 0
+PRIORITY_NORMAL = 10
+
+
+class ImageLoader:
+    """Loads textures for Gtk.Picture widgets in the background.
+
+    Pictures are shown with a placeholder straight away. Load requests go
+    into a priority queue served by a small pool of worker threads, and a
+    picture that gets mapped on screen is moved to the front of the queue.
+    The finished texture is set on the picture from the main loop.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        """Initialize the loader; workers are started on first use."""
+        self.max_workers = max_workers
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._pending = {}
+
+    def load(
+        self,
+        picture: Gtk.Picture,
+        load_func: Callable[[], Gdk.Texture],
+        priority: int = PRIORITY_NORMAL,
+        on_loaded: Optional[Callable[[Optional[Gdk.Texture]], None]] = None,
+    ) -> None:
+        """Queue load_func to produce the texture shown by picture.
+
+        A newer request for the same picture, e.g. after it was recycled for
+        another item, supersedes the older one. on_loaded is called on the
+        main loop with the texture, or None if it could not be loaded, even
+        if the request was superseded.
+        """
+        request = {
+            "picture": picture,
+            "load": load_func,
+            "on_loaded": on_loaded,
+            "done": False,
+        }
+        with self._condition:
+            previous = self._pending.get(picture)
+            if previous is not None:
+                previous["done"] = True
+                # Keep the map handler of the previous request
+                request["mapped_handler"] = previous.get("mapped_handler")
+            self._pending[picture] = request
+            self._push(request, priority)
+            self._ensure_workers()
+            self._condition.notify()
+
+        if priority != PRIORITY_VISIBLE and request.get("mapped_handler") is None:
+            request["mapped_handler"] = picture.connect("map", self._on_picture_mapped)
+
+    def prefetch(
+        self,
+        load_func: Callable[[], Gdk.Texture],
+        on_loaded: Callable[[Optional[Gdk.Texture]], None],
+    ) -> None:
+        """Queue a load that is not shown by any picture yet."""
+        request = {
+            "picture": None,
+            "load": load_func,
+            "on_loaded": on_loaded,
+            "done": False,
+        }
+        with self._condition:
+            self._push(request, PRIORITY_NORMAL)
+            self._ensure_workers()
+            self._condition.notify()
+
+    def _push(self, request, priority) -> None:
+        """Add a request to the queue; caller holds the condition."""
+        heapq.heappush(self._queue, (priority, next(self._counter), request))
+
+    def _on_picture_mapped(self, picture):
+        """Move an on-screen picture to the front of the queue."""
+        with self._condition:
+            request = self._pending.get(picture)
+            if request is not None and not request["done"]:
+                # The old entry stays in the heap and is skipped once done
+                self._push(request, PRIORITY_VISIBLE)
+                self._condition.notify()
+
+    def _ensure_workers(self) -> None:
+        """Start worker threads up to max_workers; caller holds the condition."""
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker, daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _worker(self) -> None:
+        """Worker thread body."""
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                _priority, _seq, request = heapq.heappop(self._queue)
+                if request["done"]:
+                    continue
+                request["done"] = True
+
+            try:
+                texture = request["load"]()
+            except GLib.Error as e:
+                logger.warning("Error loading image: %s", e)
+                texture = None
+            except Exception:
+                # E.g. a corrupt cache entry; the worker must keep serving the queue
+                logger.exception("Unexpected error loading image")
+                texture = None
+            GLib.idle_add(self._deliver, request, texture)
+
+    def _deliver(self, request, texture):
+        """Set the loaded texture on the picture, on the main loop."""
+        picture = request["picture"]
+        with self._condition:
+            current = picture is not None and self._pending.get(picture) is request
+            if current:
+                del self._pending[picture]
+        if request["on_loaded"] is not None:
+            request["on_loaded"](texture)
+        # A failed load keeps the placeholder; a superseded one must not
+        # overwrite the newer image
+        if texture is not None and current:
+            picture.set_paintable(texture)
+        return GLib.SOURCE_REMOVE
+
+    def cancel_pending(self) -> None:
+        """Drop all queued requests that have not started yet."""
+        with self._condition:
+            self._queue.clear()
+            self._pending.clear()
+
+
+# Shared loader used by the catalog views
+image_loader = ImageLoader()
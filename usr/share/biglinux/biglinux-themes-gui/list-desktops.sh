@@ -1,18 +1,5 @@
 #!/bin/bash
 
-if [[ "$XDG_CURRENT_DESKTOP" == "GNOME" ]]; then
-
-echo "biggnome
-gnome-unity
-gnome-vanilla"
-
-else
-
-echo "classic
-new
-modern
-kunity
-nextg
-vanilla"
-
-fi
+# Desktops are declared by the manifests in catalog/, see catalog.py
+# catalog.py picks the GNOME or KDE entries from XDG_CURRENT_DESKTOP
+exec python3 "$(dirname "$(readlink -f "$0")")/catalog.py" desktops
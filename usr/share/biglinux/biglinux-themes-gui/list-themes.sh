@@ -1,17 +1,4 @@
 #!/bin/bash
 
-if [[ "$XDG_CURRENT_DESKTOP" == "GNOME" ]]; then
-
-echo "biglinux
-biglinux-dark
-breeze
-breeze-dark"
-
-else
-
-echo "biglinux
-biglinux-dark
-breeze
-breeze-dark"
-
-fi
+# Themes are declared by the manifests in catalog/, see catalog.py
+exec python3 "$(dirname "$(readlink -f "$0")")/catalog.py" themes
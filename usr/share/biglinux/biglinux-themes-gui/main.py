@@ -4,43 +4,80 @@ BigLinux Themes GUI
 A GTK4 application for managing BigLinux themes and desktop configurations.
 """
 
+import logging
 import sys
-import gi
-from gi.repository import GLib
-
+import time
 
-gi.require_version("Gtk", "4.0")
-gi.require_version("Adw", "1")
-from gi.repository import Gtk, Adw, Gio
+from startup_profiler import profiler, parse_profile_args
+from tracing import setup_logging
 
-# Import the translation function
-from i18n import _
-from window import ThemesWindow
+# Take the profiling origin before the expensive GI imports
+_import_start = time.perf_counter()
 
+import gi
+from gi.repository import GLib, Gio
 
-class BigLinuxThemesApplication(Adw.Application):
-    """Main application class for BigLinux Themes GUI."""
+# Must match APPLICATION_ID in application.py, kept here to avoid importing GTK
+APPLICATION_ID = "br.com.biglinux.big-themes-gui"
+APPLICATION_PATH = "/br/com/biglinux/big_themes_gui"
 
-    def __init__(self):
-        """Initialize the application."""
-        super().__init__(application_id="big-themes-gui")
-        self.connect("activate", self.on_activate)
 
-    def on_activate(self, app):
-        """Create and show the main window when the application is activated."""
-        # Set application icon
-        GLib.set_prgname("big-themes-gui")
+def activate_running_service() -> bool:
+    """Ask the resident service to show its window, starting it if needed.
 
-        # Create and show main window
-        window = ThemesWindow(application=app)
-        window.present()
+    Only Gio is needed for this, so relaunching while the service is
+    running skips importing GTK altogether. When it is not running, the
+    bus starts it from its D-Bus service file. Returns False when the
+    service cannot be reached or started, e.g. without a session bus.
+    """
+    try:
+        bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        bus.call_sync(
+            APPLICATION_ID,
+            APPLICATION_PATH,
+            "org.freedesktop.Application",
+            "Activate",
+            GLib.Variant("(a{sv})", ({},)),
+            None,
+            Gio.DBusCallFlags.NONE,
+            -1,
+            None,
+        )
+    except GLib.Error as e:
+        logging.getLogger(__name__).info("Could not activate the service: %s", e)
+        return False
+    return True
 
 
 def main():
     """Start the application."""
-    app = BigLinuxThemesApplication()
-    return app.run(sys.argv)
+    setup_logging()
+    argv, profile, profile_output, profile_exit = parse_profile_args(sys.argv)
+    service = "--gapplication-service" in argv
+
+    # Fast path: the resident service only needs to present a window
+    if not profile and not service and len(argv) == 1 and activate_running_service():
+        return 0
+
+    gi.require_version("Gtk", "4.0")
+    gi.require_version("Adw", "1")
+    # Imported here only so the profile separates GTK from our own modules
+    from gi.repository import Gtk, Adw  # noqa: F401
+
+    import_gi_end = time.perf_counter()
+
+    from application import BigLinuxThemesApplication
+
+    import_end = time.perf_counter()
+
+    if profile:
+        profiler.enable(profile_output)
+        profiler.add_phase("import_gi", _import_start, import_gi_end)
+        profiler.add_phase("import_modules", import_gi_end, import_end)
+
+    app = BigLinuxThemesApplication(exit_after_first_frame=profile and profile_exit)
+    return app.run_profiled(argv)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Profile manager module for BigLinux Themes GUI.
+Applies a theme and a desktop configuration together from the GUI.
+"""
+
+from catalog import KIND_THEME, KIND_DESKTOP
+from core import ProfileCore, Profile, KIND_PROFILE
+from apply_engine import ApplyJob
+from apply_scheduler import apply_scheduler
+from session_reload import session_reloader
+
+# A queued profile decides the theme and desktop the queue ends with
+apply_scheduler.add_part(KIND_PROFILE, KIND_THEME, lambda profile: profile.theme)
+apply_scheduler.add_part(
+    KIND_PROFILE, KIND_DESKTOP, lambda profile: (profile.desktop, profile.clean)
+)
+
+
+class ProfileManager(ProfileCore):
+    """Manager for combined applies, adding the GTK side to ProfileCore."""
+
+    def schedule_profile(
+        self, profile: Profile, start, force: bool = False, owner=None
+    ) -> bool:
+        """Queue a profile apply on the shared scheduler.
+
+        start() is called when the apply's turn comes and returns the job,
+        usually from set_profile_async. Returns False if the request was
+        dropped, being already active, queued or running.
+        """
+        # Queued theme and desktop applies run first, so compare with their targets
+        theme = apply_scheduler.get_target(KIND_THEME, self.theme_core.current_theme)
+        desktop, _clean = apply_scheduler.get_target(
+            KIND_DESKTOP, (self.desktop_core.current_desktop, profile.clean)
+        )
+        current = Profile(theme, desktop, profile.clean)
+        return apply_scheduler.submit(
+            KIND_PROFILE, profile, start, current=current, force=force, owner=owner
+        )
+
+    def set_profile_async(
+        self,
+        profile: Profile,
+        on_finished,
+        on_failed,
+        on_cancelled=None,
+        on_progress=None,
+    ) -> ApplyJob:
+        """Apply a profile on a worker thread and return the running job.
+
+        The current theme and desktop are only updated, and both managers'
+        callbacks notified, once the apply tools have finished successfully.
+        The running session is then reloaded once for both changes, and
+        on_finished receives the profile and ReloadResult. on_progress
+        receives the tools' Progress steps.
+        """
+
+        def apply_and_reload(cancellable=None, on_progress=None):
+            self.run_profile_apply(
+                profile, cancellable=cancellable, on_progress=on_progress
+            )
+            return session_reloader.reload(KIND_PROFILE)
+
+        def finished(reload_result):
+            self.update_current(profile)
+            on_finished(profile, reload_result)
+
+        job = ApplyJob(
+            apply_and_reload,
+            on_finished=finished,
+            on_failed=on_failed,
+            on_cancelled=on_cancelled,
+            on_progress=on_progress,
+        )
+        return job.start()
@@ -0,0 +1,94 @@
+"""
+Resources module for BigLinux Themes GUI.
+Loads the compiled resource bundle with the stylesheet and preview images.
+
+biglinux-themes-gui.gresource is compiled from biglinux-themes-gui.gresource.xml
+when the package is built. Gio.Resource.load memory-maps it, so the
+stylesheet and every bundled preview are read from one mapping instead of
+one small file each, which matters on squashfs live media. Paths below the
+application directory are turned into resource:// URIs when the bundle
+contains them; without a bundle, e.g. in a git checkout, the loose files
+are used as they are.
+"""
+
+import logging
+import os
+import threading
+from typing import Optional
+
+from gi.repository import Gio, GLib
+
+from utils import get_current_dir
+
+logger = logging.getLogger(__name__)
+
+# Compiled bundle installed next to main.py
+RESOURCE_FILE = os.path.join(get_current_dir(), "biglinux-themes-gui.gresource")
+
+# Prefix of the bundled files, matches the application's resource base path
+RESOURCE_PREFIX = "/br/com/biglinux/big-themes-gui"
+RESOURCE_URI_SCHEME = "resource://"
+
+# Stylesheet of the main window, relative to the application directory
+STYLESHEET = "window.css"
+
+# Set to 1 to use the loose files even when a bundle is installed
+LOOSE_FILES_ENV = "BIG_THEMES_GUI_LOOSE_FILES"
+
+_lock = threading.Lock()
+_resource: Optional[Gio.Resource] = None
+_loaded = False
+
+
+def load_resources() -> Optional[Gio.Resource]:
+    """Load and register the bundle once, returning None if it is not available."""
+    global _resource, _loaded
+    with _lock:
+        if _loaded:
+            return _resource
+        _loaded = True
+        if os.environ.get(LOOSE_FILES_ENV) == "1":
+            logger.debug("Resource bundle disabled, using loose files")
+            return None
+        try:
+            _resource = Gio.Resource.load(RESOURCE_FILE)
+        except GLib.Error as e:
+            logger.debug("No resource bundle, using loose files: %s", e.message)
+            return None
+        _resource._register()
+        logger.debug("Resource bundle loaded from %s", RESOURCE_FILE)
+        return _resource
+
+
+def get_bundle_stamp() -> str:
+    """Identify the installed bundle, changing whenever it is replaced."""
+    try:
+        st = os.stat(RESOURCE_FILE)
+    except OSError:
+        return ""
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def is_resource_uri(uri: str) -> bool:
+    """Check if a location is a resource:// URI rather than a file path."""
+    return uri.startswith(RESOURCE_URI_SCHEME)
+
+
+def get_resource_path(uri: str) -> str:
+    """Get the resource path of a resource:// URI."""
+    return uri[len(RESOURCE_URI_SCHEME):]
+
+
+def get_uri(path: str) -> str:
+    """Get the resource:// URI of a bundled file, or path if it is not bundled."""
+    relative = os.path.relpath(path, get_current_dir())
+    if relative.startswith(os.pardir) or os.path.isabs(relative):
+        return path
+    if load_resources() is None:
+        return path
+    resource_path = f"{RESOURCE_PREFIX}/{relative}"
+    try:
+        Gio.resources_get_info(resource_path, Gio.ResourceLookupFlags.NONE)
+    except GLib.Error:
+        return path
+    return RESOURCE_URI_SCHEME + resource_path
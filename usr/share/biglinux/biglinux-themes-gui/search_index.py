@@ -0,0 +1,124 @@
+"""
+Search index module for BigLinux Themes GUI.
+Matches typed queries against catalog names, labels and keywords.
+
+Search terms are split into normalized tokens (case and accents folded)
+and kept sorted, so candidate tokens for a query word are found with a
+binary search on their first letter. A query word matches a token that
+starts with the same letter and contains the rest of the word in order:
+"dark" matches "dark", "darker" and, fuzzily, "dkr" matches "darker".
+Every query is the AND of its words. Typing more only narrows the
+previous result, so each keystroke re-checks only the entries still
+shown. This module is toolkit-free.
+"""
+
+import bisect
+import re
+import unicodedata
+from typing import Dict, Hashable, Iterable, List, Optional, Set
+
+_SPLIT = re.compile(r"[^\w]+|_")
+
+
+def normalize(text: str) -> str:
+    """Fold case and strip accents."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized words."""
+    return [token for token in _SPLIT.split(normalize(text)) if token]
+
+
+def _matches_token(word: str, token: str) -> bool:
+    """Check if word is a prefix, or an in-order subsequence, of token."""
+    if token.startswith(word):
+        return True
+    if token[0] != word[0]:
+        return False
+    remaining = iter(token[1:])
+    return all(c in remaining for c in word[1:])
+
+
+class SearchIndex:
+    """Token index over the search terms of a set of keys."""
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._tokens_by_key: Dict[Hashable, Set[str]] = {}
+        self._keys_by_token: Dict[str, Set[Hashable]] = {}
+        self._sorted_tokens: Optional[List[str]] = None
+        self._last_words: Optional[List[str]] = None
+        self._last_result: Optional[Set[Hashable]] = None
+
+    def add(self, key: Hashable, terms: Iterable[str]) -> None:
+        """Index a key under its search terms."""
+        tokens = self._tokens_by_key.setdefault(key, set())
+        for term in terms:
+            words = tokenize(term)
+            # Also index the joined form, so "biglinuxd" finds "biglinux-dark"
+            if len(words) > 1:
+                words.append("".join(words))
+            for token in words:
+                tokens.add(token)
+                self._keys_by_token.setdefault(token, set()).add(key)
+        # Sorted again on the next search, not once per added key
+        self._sorted_tokens = None
+        self._last_words = None
+
+    def __len__(self) -> int:
+        """Number of indexed keys."""
+        return len(self._tokens_by_key)
+
+    def search(self, query: str) -> Optional[Set[Hashable]]:
+        """Return the keys matching every word of query, or None if it is empty."""
+        words = tokenize(query)
+        if not words:
+            self._last_words = None
+            return None
+
+        if self._narrows(words):
+            candidates = self._last_result
+            result = {
+                key
+                for key in candidates
+                if all(
+                    any(_matches_token(word, token) for token in self._tokens_by_key[key])
+                    for word in words
+                )
+            }
+        else:
+            result = None
+            for word in words:
+                keys = self._search_word(word)
+                result = keys if result is None else result & keys
+                if not result:
+                    break
+
+        self._last_words = words
+        self._last_result = result
+        return set(result)
+
+    def _narrows(self, words: List[str]) -> bool:
+        """Check if words can only match a subset of the previous result."""
+        last = self._last_words
+        if last is None or len(words) < len(last):
+            return False
+        # Earlier words unchanged, the last one only extended
+        return words[: len(last) - 1] == last[:-1] and words[len(last) - 1].startswith(
+            last[-1]
+        )
+
+    def _search_word(self, word: str) -> Set[Hashable]:
+        """Find the keys with a token matching one word."""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._keys_by_token)
+        first = word[0]
+        start = bisect.bisect_left(self._sorted_tokens, first)
+        end = bisect.bisect_left(self._sorted_tokens, chr(ord(first) + 1))
+        keys = set()
+        for token in self._sorted_tokens[start:end]:
+            if _matches_token(word, token):
+                keys |= self._keys_by_token[token]
+        return keys
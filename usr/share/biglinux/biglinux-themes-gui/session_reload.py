@@ -0,0 +1,219 @@
+"""
+Session reload module for BigLinux Themes GUI.
+Tells the running session about an applied change over D-Bus.
+
+After an apply the running components are asked to pick up the new
+configuration: KDE applications through the KGlobalSettings and KConfig
+change notifications (which also update GTK settings through kded's
+gtkconfig module), KWin through reconfigure(), and plasmashell through
+refreshCurrentShell(). On GNOME the tools write dconf keys, and GTK and
+GNOME Shell follow them through the notifications of the dconf writer
+service, so that service is checked to be running. A component that
+cannot be reached is reported, so the UI only asks for a new login when
+something could not reload.
+
+The session bus is found through DBUS_SESSION_BUS_ADDRESS, so the
+reloader can be exercised under dbus-run-session with mock services.
+"""
+
+import logging
+from typing import List, NamedTuple
+
+from gi.repository import Gio, GLib
+
+from utils import is_gnome_session
+from catalog import KIND_THEME, KIND_DESKTOP
+from core import KIND_PROFILE
+from tracing import tracer, STATUS_OK, STATUS_ERROR
+
+logger = logging.getLogger(__name__)
+
+# Names of the components reported in a ReloadResult
+COMPONENT_KDE_SETTINGS = "kde-settings"
+COMPONENT_KWIN = "kwin"
+COMPONENT_PLASMASHELL = "plasmashell"
+COMPONENT_DCONF = "dconf"
+COMPONENT_GNOME_SHELL = "gnome-shell"
+COMPONENT_SESSION_BUS = "session-bus"
+
+# KGlobalSettings::ChangeType values
+KDE_PALETTE_CHANGED = 0
+KDE_STYLE_CHANGED = 2
+KDE_SETTINGS_CHANGED = 3
+KDE_ICON_CHANGED = 4
+KDE_CURSOR_CHANGED = 5
+
+# kdeglobals keys written by the theme tools, announced to KConfigWatcher
+KDEGLOBALS_CHANGED_KEYS = {
+    "General": ["ColorScheme", "font"],
+    "KDE": ["widgetStyle", "LookAndFeelPackage"],
+    "Icons": ["Theme"],
+}
+
+# dconf writer service, which tells GTK and GNOME Shell about written keys
+DCONF_SERVICE = "ca.desrt.dconf"
+DCONF_WRITER_PATH = "/ca/desrt/dconf/Writer/user"
+
+# Timeout of each D-Bus call (ms)
+DBUS_TIMEOUT = 5000
+
+
+class ReloadResult(NamedTuple):
+    """Components that picked up a change, and those that could not."""
+
+    reloaded: List[str]
+    failed: List[str]
+
+    @property
+    def needs_logout(self) -> bool:
+        """Check if a new login is still needed to see the whole change."""
+        return bool(self.failed)
+
+
+class SessionReloader:
+    """Notifies the running session of theme and desktop changes."""
+
+    def __init__(self, connection: Gio.DBusConnection = None):
+        """Initialize the reloader; the session bus is used by default."""
+        self._connection = connection
+
+    def reload(self, kind: str) -> ReloadResult:
+        """Reload the components affected by a theme, desktop or profile change.
+
+        Blocking, meant to run on the apply worker thread.
+        """
+        with tracer.span("reload", kind=kind) as span:
+            result = self._reload(kind)
+            span.finish(
+                STATUS_ERROR if result.failed else STATUS_OK,
+                reloaded=result.reloaded,
+                failed=result.failed,
+            )
+        if result.failed:
+            logger.info("Could not reload: %s", ", ".join(result.failed))
+        return result
+
+    def _reload(self, kind: str) -> ReloadResult:
+        """Run the reload steps for a change."""
+        theme = kind in (KIND_THEME, KIND_PROFILE)
+        desktop = kind in (KIND_DESKTOP, KIND_PROFILE)
+        reloaded = []
+        failed = []
+
+        connection = self._get_connection()
+        if connection is None:
+            return ReloadResult(reloaded, [COMPONENT_SESSION_BUS])
+
+        steps = []
+        if is_gnome_session():
+            # GNOME Shell and GTK follow the dconf keys written by the tools
+            if theme:
+                steps.append((COMPONENT_DCONF, self._check_dconf))
+            if desktop:
+                # Extensions and panels only change with a new shell
+                failed.append(COMPONENT_GNOME_SHELL)
+        else:
+            if theme:
+                steps.append((COMPONENT_KDE_SETTINGS, self._notify_kde_settings))
+            steps.append((COMPONENT_KWIN, self._reconfigure_kwin))
+            if desktop:
+                steps.append((COMPONENT_PLASMASHELL, self._refresh_plasmashell))
+
+        for component, step in steps:
+            try:
+                step(connection)
+            except GLib.Error as e:
+                logger.warning("Error reloading %s: %s", component, e.message)
+                failed.append(component)
+            else:
+                reloaded.append(component)
+        return ReloadResult(reloaded, failed)
+
+    def _get_connection(self):
+        """Return the bus connection, or None if there is no session bus."""
+        if self._connection is None:
+            try:
+                self._connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+            except GLib.Error as e:
+                logger.warning("No session bus: %s", e.message)
+                return None
+        return self._connection
+
+    def _notify_kde_settings(self, connection) -> None:
+        """Announce the new colors, style, icons and kdeglobals keys."""
+        for change in (
+            KDE_PALETTE_CHANGED,
+            KDE_STYLE_CHANGED,
+            KDE_SETTINGS_CHANGED,
+            KDE_ICON_CHANGED,
+            KDE_CURSOR_CHANGED,
+        ):
+            connection.emit_signal(
+                None,
+                "/KGlobalSettings",
+                "org.kde.KGlobalSettings",
+                "notifyChange",
+                GLib.Variant("(ii)", (change, 0)),
+            )
+        connection.emit_signal(
+            None,
+            "/KIconLoader",
+            "org.kde.KIconLoader",
+            "iconChanged",
+            GLib.Variant("(i)", (0,)),
+        )
+        changed_keys = {
+            group: [key.encode() for key in keys]
+            for group, keys in KDEGLOBALS_CHANGED_KEYS.items()
+        }
+        connection.emit_signal(
+            None,
+            "/kdeglobals",
+            "org.kde.kconfig.notify",
+            "ConfigChanged",
+            GLib.Variant("(a{saay})", (changed_keys,)),
+        )
+        connection.flush_sync(None)
+
+    def _check_dconf(self, connection) -> None:
+        """Check that the dconf writer that notifies GTK and GNOME Shell is running."""
+        self._call(
+            connection,
+            DCONF_SERVICE,
+            DCONF_WRITER_PATH,
+            "org.freedesktop.DBus.Peer",
+            "Ping",
+        )
+
+    def _reconfigure_kwin(self, connection) -> None:
+        """Make KWin reload kwinrc, window decorations and effects."""
+        self._call(connection, "org.kde.KWin", "/KWin", "org.kde.KWin", "reconfigure")
+
+    def _refresh_plasmashell(self, connection) -> None:
+        """Make plasmashell reload panels and widgets from the new layout."""
+        self._call(
+            connection,
+            "org.kde.plasmashell",
+            "/PlasmaShell",
+            "org.kde.PlasmaShell",
+            "refreshCurrentShell",
+        )
+
+    def _call(self, connection, name, path, interface, method) -> None:
+        """Call a method without arguments on a running service."""
+        connection.call_sync(
+            name,
+            path,
+            interface,
+            method,
+            None,
+            None,
+            # Never start a component that is not already running
+            Gio.DBusCallFlags.NO_AUTO_START,
+            DBUS_TIMEOUT,
+            None,
+        )
+
+
+# Shared reloader used after every apply
+session_reloader = SessionReloader()
@@ -0,0 +1,607 @@
+"""
+Snapshot module for BigLinux Themes GUI.
+Saves and restores the configuration files touched by an apply.
+
+Every apply runs inside a transaction: the affected files are copied to
+the cache directory first, and copied back if the apply tool fails or is
+cancelled. The snapshot of the last successful change is kept so it can
+be undone without running another apply. This module is toolkit-free.
+
+Files shared with unrelated settings are not copied whole. Only the
+kdeglobals keys and the dconf keys the apply tools write are saved and
+put back, so a restore leaves the user's other settings alone; the dconf
+database itself belongs to dconf-service and is only used through dconf.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import shlex
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils import get_cache_dir, run_shell_command, CommandFailed
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# ioctl that makes a copy-on-write clone of a file (btrfs, xfs)
+FICLONE = 0x40049409
+
+_CONFIG_HOME = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+
+# Outcome of the rollback of a failed or cancelled transaction, see get_rollback()
+ROLLBACK_NONE = "none"
+ROLLBACK_RESTORED = "restored"
+ROLLBACK_FAILED = "failed"
+
+
+def _config(*names: str) -> List[str]:
+    """Return paths inside the user's configuration directory."""
+    return [os.path.join(_CONFIG_HOME, name) for name in names]
+
+
+# Files written by big-theme-apps when a theme is applied
+THEME_CONFIG_PATHS = _config(
+    "kcminputrc",
+    "ksplashrc",
+    "plasmarc",
+    "breezerc",
+    "Trolltech.conf",
+    "Kvantum",
+    "gtk-3.0/settings.ini",
+    "gtk-4.0/settings.ini",
+    "xsettingsd",
+) + [
+    os.path.expanduser("~/.gtkrc-2.0"),
+    os.path.expanduser("~/.big_desktop_theme"),
+]
+
+# Files written by big-theme-plasma when a desktop configuration is applied
+DESKTOP_CONFIG_PATHS = _config(
+    "plasma-org.kde.plasma.desktop-appletsrc",
+    "plasmashellrc",
+    "kwinrc",
+    "kglobalshortcutsrc",
+    "latte",
+    "lattedockrc",
+) + [
+    os.path.expanduser("~/.kdebiglinux/lastused"),
+]
+
+KDEGLOBALS = _config("kdeglobals")[0]
+
+# kdeglobals groups and keys written by big-theme-apps, None for a whole group
+THEME_KDEGLOBALS_KEYS = {
+    "General": ("ColorScheme", "font"),
+    "KDE": ("widgetStyle", "LookAndFeelPackage"),
+    "Icons": ("Theme",),
+    "Colors:Button": None,
+    "Colors:Complementary": None,
+    "Colors:Header": None,
+    "Colors:Header][Inactive": None,
+    "Colors:Selection": None,
+    "Colors:Tooltip": None,
+    "Colors:View": None,
+    "Colors:Window": None,
+    "WM": None,
+}
+
+# kdeglobals keys written by big-theme-plasma with a desktop layout
+DESKTOP_KDEGLOBALS_KEYS = {
+    "KDE": ("SingleClick",),
+}
+
+# dconf keys written by big-theme-apps, mostly on GNOME
+THEME_DCONF_KEYS = (
+    "/org/gnome/desktop/interface/gtk-theme",
+    "/org/gnome/desktop/interface/icon-theme",
+    "/org/gnome/desktop/interface/cursor-theme",
+    "/org/gnome/desktop/interface/color-scheme",
+    "/org/gnome/desktop/wm/preferences/theme",
+    "/org/gnome/shell/extensions/user-theme/name",
+)
+
+# dconf keys, and directories ending with /, written by big-theme-plasma on GNOME
+DESKTOP_DCONF_KEYS = (
+    "/org/gnome/desktop/wm/preferences/button-layout",
+    "/org/gnome/shell/enabled-extensions",
+    "/org/gnome/shell/disabled-extensions",
+    "/org/gnome/shell/extensions/dash-to-dock/",
+    "/org/gnome/shell/extensions/dash-to-panel/",
+    "/org/gnome/shell/extensions/arcmenu/",
+)
+
+
+class SnapshotSpec(NamedTuple):
+    """What an apply may change, and so what its snapshot saves."""
+
+    # Files and directories saved whole
+    paths: Tuple[str, ...] = ()
+    # KConfig file -> group -> keys, None for the whole group
+    kconfig: Dict[str, Dict[str, Optional[Tuple[str, ...]]]] = {}
+    # dconf keys, and directories ending with /
+    dconf: Tuple[str, ...] = ()
+
+
+def merge_specs(*specs: SnapshotSpec) -> SnapshotSpec:
+    """Combine the snapshot specs of applies run together."""
+    kconfig = {}
+    for spec in specs:
+        for path, groups in spec.kconfig.items():
+            merged = kconfig.setdefault(path, {})
+            for group, keys in groups.items():
+                if keys is None or merged.get(group, ()) is None:
+                    merged[group] = None
+                else:
+                    merged[group] = tuple(dict.fromkeys(merged.get(group, ()) + keys))
+    return SnapshotSpec(
+        tuple(dict.fromkeys(p for spec in specs for p in spec.paths)),
+        kconfig,
+        tuple(dict.fromkeys(k for spec in specs for k in spec.dconf)),
+    )
+
+
+THEME_SNAPSHOT = SnapshotSpec(
+    tuple(THEME_CONFIG_PATHS), {KDEGLOBALS: THEME_KDEGLOBALS_KEYS}, THEME_DCONF_KEYS
+)
+DESKTOP_SNAPSHOT = SnapshotSpec(
+    tuple(DESKTOP_CONFIG_PATHS),
+    {KDEGLOBALS: DESKTOP_KDEGLOBALS_KEYS},
+    DESKTOP_DCONF_KEYS,
+)
+PROFILE_SNAPSHOT = merge_specs(THEME_SNAPSHOT, DESKTOP_SNAPSHOT)
+
+_MANIFEST = "snapshot.json"
+
+# Identifies the last change made through this tool, see SnapshotStore.undo
+_LAST_CHANGE = "last-change"
+
+# Modifiers of a KConfig key, e.g. the [$e] of "Theme[$e]=..."
+_KCONFIG_MODIFIERS = re.compile(r"\[\$[^\]]*\]")
+
+
+class StaleSnapshot(Exception):
+    """The undo snapshot predates the last change made through this tool."""
+
+
+def get_rollback(error: BaseException) -> str:
+    """Tell whether a failed change was rolled back, as a ROLLBACK_* value.
+
+    Errors raised before a transaction started changed nothing; they are
+    reported as ROLLBACK_RESTORED since the configuration is as it was.
+    """
+    return getattr(error, "rollback", ROLLBACK_RESTORED)
+
+
+def clone_file(source: str, destination: str) -> bool:
+    """Copy a file, as a reflink when the filesystem supports it.
+
+    Returns True when the copy shares its blocks with the source. Hard
+    links are not used: tools that rewrite a file in place would change
+    the snapshot along with it.
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            cloned = True
+        except OSError:
+            shutil.copyfileobj(src, dst)
+            cloned = False
+    shutil.copystat(source, destination)
+    return cloned
+
+
+class KConfigFile:
+    """Line-based editor of a KConfig file such as kdeglobals.
+
+    Only the groups and entries that are set change, every other line is
+    written back as it was read.
+    """
+
+    def __init__(self, path: str):
+        """Read the file; a missing file reads as empty."""
+        self.path = path
+        # Group name -> lines, "" holds the lines before the first group
+        self.groups: "OrderedDict[str, List[str]]" = OrderedDict([("", [])])
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        group = ""
+        for line in lines:
+            stripped = line.strip()
+            if stripped.startswith("[") and stripped.endswith("]"):
+                group = stripped[1:-1]
+                self.groups.setdefault(group, [])
+            else:
+                self.groups[group].append(line)
+
+    @staticmethod
+    def _entry_key(line: str) -> Optional[str]:
+        """Key of an entry line without its modifiers, None for other lines."""
+        if "=" not in line or line.lstrip().startswith("#"):
+            return None
+        return _KCONFIG_MODIFIERS.sub("", line.split("=", 1)[0]).strip()
+
+    def get_group(self, group: str) -> Optional[List[str]]:
+        """Entry lines of a group, None if there is no such group."""
+        if group not in self.groups:
+            return None
+        return [line for line in self.groups[group] if self._entry_key(line)]
+
+    def set_group(self, group: str, entries: Optional[List[str]]) -> None:
+        """Replace the entries of a group, removing it for None."""
+        if entries is None:
+            self.groups.pop(group, None)
+        else:
+            self.groups[group] = list(entries)
+
+    def get_entry(self, group: str, key: str) -> Optional[str]:
+        """Line of an entry, None if it is not set."""
+        for line in self.groups.get(group, ()):
+            if self._entry_key(line) == key:
+                return line
+        return None
+
+    def set_entry(self, group: str, key: str, line: Optional[str]) -> None:
+        """Set an entry to a saved line, removing it for None."""
+        lines = self.groups.get(group)
+        if lines is None:
+            if line is not None:
+                self.groups[group] = [line]
+            return
+        index = next(
+            (i for i, old in enumerate(lines) if self._entry_key(old) == key), None
+        )
+        if index is None:
+            if line is not None:
+                # Before the blank lines separating the group from the next one
+                while index is None or (index > 0 and not lines[index - 1].strip()):
+                    index = len(lines) if index is None else index - 1
+                lines.insert(index, line)
+        elif line is None:
+            del lines[index]
+        else:
+            lines[index] = line
+
+    def save(self) -> None:
+        """Write the file back atomically."""
+        output = []
+        for group, lines in self.groups.items():
+            if group:
+                if output and output[-1].strip():
+                    output.append("")
+                output.append(f"[{group}]")
+            output.extend(lines)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.restore"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(output) + "\n" if output else "")
+        if os.path.exists(self.path):
+            shutil.copymode(self.path, temp_path)
+        os.replace(temp_path, self.path)
+
+
+def _dconf(arguments: str, stdin: str = None) -> str:
+    """Run dconf and return its output, feeding it stdin if given."""
+    command = f"dconf {arguments}"
+    if stdin is not None:
+        command = f"printf '%s' {shlex.quote(stdin)} | {command}"
+    return run_shell_command(command, check=True).stdout
+
+
+def _span_attributes(info: dict) -> dict:
+    """Trace attributes describing a change."""
+    return {"kind": info.get("kind"), "target": info.get("name")}
+
+
+class Snapshot:
+    """Copies of a set of files and directories, stored in one directory.
+
+    A path that did not exist when the snapshot was taken is removed on
+    restore, and a directory is restored to exactly its saved contents.
+    KConfig entries and dconf keys are put back one by one.
+    """
+
+    def __init__(self, directory: str):
+        """Open a snapshot directory; take() fills a new one."""
+        self.directory = directory
+        self.entries = []
+        self.info = {}
+        self.change = None
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["Snapshot"]:
+        """Open a snapshot written before, or return None."""
+        snapshot = cls(directory)
+        try:
+            with open(os.path.join(directory, _MANIFEST), encoding="utf-8") as f:
+                data = json.load(f)
+            snapshot.entries = data["entries"]
+            snapshot.info = data["info"]
+            snapshot.change = data.get("change")
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning("Ignoring snapshot %s: %s", directory, e)
+            return None
+        return snapshot
+
+    def take(self, spec: SnapshotSpec, change: str = None, **info) -> None:
+        """Save what the spec lists into the snapshot directory.
+
+        change identifies the change the snapshot is taken for.
+        """
+        os.makedirs(self.directory)
+        self.info = info
+        self.change = change
+        self.entries = []
+        cloned = 0
+        for path in dict.fromkeys(spec.paths):
+            if os.path.islink(path) or os.path.isfile(path):
+                cloned += self._save(path)
+            elif os.path.isdir(path):
+                self.entries.append({"path": path, "type": "tree"})
+                for root, dirs, files in os.walk(path):
+                    for name in dirs:
+                        subdir = os.path.join(root, name)
+                        if os.path.islink(subdir):
+                            cloned += self._save(subdir)
+                        else:
+                            self.entries.append({"path": subdir, "type": "dir"})
+                    for name in files:
+                        cloned += self._save(os.path.join(root, name))
+            else:
+                self.entries.append({"path": path, "type": "missing"})
+        for path, groups in spec.kconfig.items():
+            self._save_kconfig(path, groups)
+        if spec.dconf and shutil.which("dconf"):
+            for key in spec.dconf:
+                self._save_dconf(key)
+        with open(os.path.join(self.directory, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(
+                {"info": self.info, "change": self.change, "entries": self.entries}, f
+            )
+        logger.debug(
+            "Snapshot of %d entries taken, %d reflinked", len(self.entries), cloned
+        )
+
+    def restore(self) -> None:
+        """Put every saved path back the way it was."""
+        saved = {entry["path"] for entry in self.entries}
+        for entry in self.entries:
+            path = entry["path"]
+            kind = entry["type"]
+            if kind == "missing":
+                self._remove(path)
+            elif kind in ("tree", "dir"):
+                if not os.path.isdir(path) or os.path.islink(path):
+                    self._remove(path)
+                    os.makedirs(path, exist_ok=True)
+                if kind == "tree":
+                    self._remove_unsaved(path, saved)
+            elif kind == "link":
+                self._remove(path)
+                os.symlink(entry["target"], path)
+            elif kind == "kconfig":
+                self._restore_kconfig(entry)
+            elif kind == "dconf":
+                self._restore_dconf(entry)
+            else:
+                self._restore_file(entry)
+
+    def delete(self) -> None:
+        """Remove the snapshot directory."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _save(self, path: str) -> bool:
+        """Save one file or symlink; returns True if it was reflinked."""
+        if os.path.islink(path):
+            self.entries.append(
+                {"path": path, "type": "link", "target": os.readlink(path)}
+            )
+            return False
+        data = str(len(self.entries))
+        self.entries.append({"path": path, "type": "file", "data": data})
+        return clone_file(path, os.path.join(self.directory, data))
+
+    def _save_kconfig(self, path: str, groups: dict) -> None:
+        """Save some groups and entries of a KConfig file."""
+        config = KConfigFile(path)
+        saved = []
+        for group, keys in groups.items():
+            if keys is None:
+                saved.append({"group": group, "entries": config.get_group(group)})
+            else:
+                for key in keys:
+                    saved.append(
+                        {"group": group, "key": key, "line": config.get_entry(group, key)}
+                    )
+        self.entries.append({"path": path, "type": "kconfig", "saved": saved})
+
+    def _restore_kconfig(self, entry: dict) -> None:
+        """Put the saved groups and entries back, leaving the rest of the file."""
+        config = KConfigFile(entry["path"])
+        for item in entry["saved"]:
+            if "key" in item:
+                config.set_entry(item["group"], item["key"], item["line"])
+            else:
+                config.set_group(item["group"], item["entries"])
+        config.save()
+
+    def _save_dconf(self, key: str) -> None:
+        """Save a dconf key, or every key below a directory."""
+        if key.endswith("/"):
+            value = _dconf(f"dump {shlex.quote(key)}")
+        else:
+            value = _dconf(f"read {shlex.quote(key)}")
+        self.entries.append({"path": key, "type": "dconf", "value": value or None})
+
+    def _restore_dconf(self, entry: dict) -> None:
+        """Put a saved dconf key or directory back through dconf-service."""
+        key = entry["path"]
+        value = entry["value"]
+        if key.endswith("/"):
+            _dconf(f"reset -f {shlex.quote(key)}")
+            if value is not None:
+                _dconf(f"load {shlex.quote(key)}", stdin=value + "\n")
+        elif value is None:
+            _dconf(f"reset {shlex.quote(key)}")
+        else:
+            _dconf(f"write {shlex.quote(key)} {shlex.quote(value)}")
+
+    def _restore_file(self, entry: dict) -> None:
+        """Replace a file atomically with its saved copy."""
+        path = entry["path"]
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.restore"
+        clone_file(os.path.join(self.directory, entry["data"]), temp_path)
+        os.replace(temp_path, path)
+
+    def _remove_unsaved(self, tree: str, saved: set) -> None:
+        """Remove what was created inside a saved directory after the snapshot."""
+        for root, dirs, files in os.walk(tree, topdown=False):
+            for name in files + dirs:
+                path = os.path.join(root, name)
+                if path not in saved:
+                    self._remove(path)
+
+    def _remove(self, path: str) -> None:
+        """Remove a file, symlink or directory if it exists."""
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+
+class SnapshotStore:
+    """Runs applies as transactions and keeps the snapshot for undo."""
+
+    def __init__(self, directory: str = None):
+        """Initialize the store; nothing is written until the first apply."""
+        self.directory = directory or os.path.join(get_cache_dir(), "snapshots")
+        self._lock = threading.Lock()
+
+    @property
+    def _undo_path(self) -> str:
+        """Directory of the snapshot of the last successful change."""
+        return os.path.join(self.directory, "undo")
+
+    def _read_last_change(self) -> Optional[str]:
+        """Identifier of the last change made through this tool, or None."""
+        try:
+            with open(os.path.join(self.directory, _LAST_CHANGE), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _write_last_change(self, change: str) -> None:
+        """Record the identifier of a finished change."""
+        path = os.path.join(self.directory, _LAST_CHANGE)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{path}.{os.getpid()}", "w", encoding="utf-8") as f:
+            f.write(change)
+        os.replace(f"{path}.{os.getpid()}", path)
+
+    @contextmanager
+    def transaction(self, spec: SnapshotSpec, **info):
+        """Snapshot what spec lists, run the block, and roll back if it raises.
+
+        info describes the change, e.g. kind, name and previous value, and
+        is returned by undo(). On success the snapshot replaces the
+        previous undo snapshot. If the snapshot cannot be taken, e.g. for
+        an unreadable file or a full cache, the block still runs but
+        without rollback, and None is yielded instead of the snapshot.
+        The exception re-raised from the block records the rollback
+        outcome, see get_rollback().
+        """
+        change = uuid.uuid4().hex
+        snapshot = Snapshot(os.path.join(self.directory, f"pending-{os.getpid()}"))
+        try:
+            with tracer.span("snapshot", **_span_attributes(info)):
+                snapshot.delete()
+                snapshot.take(spec, change=change, **info)
+        except (OSError, CommandFailed) as e:
+            logger.error(
+                "Could not save the current configuration, applying without rollback: %s",
+                e,
+            )
+            snapshot.delete()
+            snapshot = None
+        try:
+            yield snapshot
+        except BaseException as error:
+            if snapshot is None:
+                error.rollback = ROLLBACK_NONE
+                raise
+            with tracer.span("rollback", **_span_attributes(info)):
+                logger.warning("Apply failed, restoring the previous configuration")
+                try:
+                    snapshot.restore()
+                except (OSError, CommandFailed) as e:
+                    logger.error("Error restoring the previous configuration: %s", e)
+                    error.rollback = ROLLBACK_FAILED
+                else:
+                    error.rollback = ROLLBACK_RESTORED
+                snapshot.delete()
+            raise
+        with self._lock:
+            try:
+                # Without a snapshot the older undo snapshot is kept, but refused
+                if snapshot is not None:
+                    shutil.rmtree(self._undo_path, ignore_errors=True)
+                    os.replace(snapshot.directory, self._undo_path)
+                self._write_last_change(change)
+            except OSError as e:
+                # The change itself was applied, only undo is unavailable
+                logger.error("Could not keep the snapshot for undo: %s", e)
+                shutil.rmtree(self._undo_path, ignore_errors=True)
+
+    def get_last_change(self) -> Optional[str]:
+        """Identify the last change made through this tool, see undo()."""
+        return self._read_last_change()
+
+    def get_undo_info(self) -> Optional[dict]:
+        """Describe the change undo() would revert, or None."""
+        snapshot = Snapshot.load(self._undo_path)
+        return snapshot.info if snapshot is not None else None
+
+    def undo(self, expected_change: str = None) -> Optional[dict]:
+        """Restore the configuration from before the last change.
+
+        Returns the info of the reverted change, or None if there is
+        nothing to undo. A change can only be undone once. Raises
+        StaleSnapshot if another change was made through this tool since
+        the snapshot, restoring it would silently revert that change too,
+        or if the last change is not expected_change, from get_last_change().
+        """
+        with self._lock:
+            snapshot = Snapshot.load(self._undo_path)
+            if snapshot is None:
+                return None
+            last_change = self._read_last_change()
+            if (
+                snapshot.change is None
+                or snapshot.change != last_change
+                or expected_change not in (None, last_change)
+            ):
+                raise StaleSnapshot(
+                    "The saved configuration is older than the last change"
+                )
+            with tracer.span("undo", **_span_attributes(snapshot.info)):
+                snapshot.restore()
+                snapshot.delete()
+        return snapshot.info
+
+
+# Shared store used by the theme and desktop cores
+snapshot_store = SnapshotStore()
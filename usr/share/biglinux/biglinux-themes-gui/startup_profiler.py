@@ -0,0 +1,135 @@
+"""
+Startup profiler module for BigLinux Themes GUI.
+Times the startup phases and writes them as a JSON report.
+"""
+
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Collects named startup phases relative to the process start.
+
+    The profiler is disabled by default, in which case phase() and mark()
+    only cost a boolean check.
+    """
+
+    def __init__(self):
+        """Initialize a disabled profiler."""
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.output_path = None
+        self.phases = []
+        self.marks = {}
+        self._written = False
+
+    def enable(self, output_path: Optional[str] = None, origin: Optional[float] = None):
+        """Enable profiling, writing to output_path or stdout."""
+        self.enabled = True
+        self.output_path = output_path
+        if origin is not None:
+            self.origin = origin
+
+    def _now_ms(self) -> float:
+        """Milliseconds since the profiling origin."""
+        return (time.perf_counter() - self.origin) * 1000.0
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as a named phase."""
+        if not self.enabled:
+            yield
+            return
+        start = self._now_ms()
+        try:
+            yield
+        finally:
+            end = self._now_ms()
+            self.phases.append(
+                {
+                    "name": name,
+                    "start_ms": round(start, 3),
+                    "end_ms": round(end, 3),
+                    "duration_ms": round(end - start, 3),
+                }
+            )
+
+    def add_phase(self, name: str, start: float, end: float) -> None:
+        """Record a phase from two perf_counter() timestamps."""
+        if not self.enabled:
+            return
+        start_ms = (start - self.origin) * 1000.0
+        end_ms = (end - self.origin) * 1000.0
+        self.phases.append(
+            {
+                "name": name,
+                "start_ms": round(start_ms, 3),
+                "end_ms": round(end_ms, 3),
+                "duration_ms": round(end_ms - start_ms, 3),
+            }
+        )
+
+    def mark(self, name: str) -> None:
+        """Record a point in time, e.g. the first presented frame."""
+        if self.enabled and name not in self.marks:
+            self.marks[name] = round(self._now_ms(), 3)
+
+    def report(self) -> dict:
+        """Build the report dictionary."""
+        return {
+            "version": 1,
+            "python": sys.version.split()[0],
+            "phases": self.phases,
+            "marks": self.marks,
+            "total_ms": round(self._now_ms(), 3),
+        }
+
+    def write_report(self) -> None:
+        """Write the report once, to the output file or stdout."""
+        if not self.enabled or self._written:
+            return
+        self._written = True
+        data = json.dumps(self.report(), indent=2)
+        if self.output_path:
+            try:
+                with open(self.output_path, "w", encoding="utf-8") as f:
+                    f.write(data + "\n")
+                logger.info("Startup profile written to %s", self.output_path)
+            except OSError as e:
+                logger.error("Error writing startup profile: %s", e)
+        else:
+            sys.stdout.write(data + "\n")
+            sys.stdout.flush()
+
+
+# Shared profiler instance used by main.py and the window
+profiler = StartupProfiler()
+
+
+def parse_profile_args(argv):
+    """Remove the profiling options from argv and return them.
+
+    Recognizes --profile-startup, --profile-startup=FILE and --profile-exit.
+    Returns (argv, enabled, output_path, exit_after_first_frame).
+    """
+    remaining = []
+    enabled = False
+    output_path = None
+    exit_after = False
+    for arg in argv:
+        if arg == "--profile-startup":
+            enabled = True
+        elif arg.startswith("--profile-startup="):
+            enabled = True
+            output_path = arg.split("=", 1)[1] or None
+        elif arg == "--profile-exit":
+            exit_after = True
+        else:
+            remaining.append(arg)
+    return remaining, enabled, output_path, exit_after
@@ -0,0 +1,103 @@
+"""
+State watcher module for BigLinux Themes GUI.
+Follows changes to the theme and desktop state files made by any tool.
+"""
+
+import logging
+import os
+
+from gi.repository import Gio
+
+from utils import (
+    state_provider,
+    saved_layouts,
+    THEME_STATE_FILE,
+    DESKTOP_STATE_FILE,
+    SAVED_LAYOUTS_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+# Events after which a state file has its final content
+_RELOAD_EVENTS = (
+    Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+    Gio.FileMonitorEvent.CREATED,
+    Gio.FileMonitorEvent.DELETED,
+    Gio.FileMonitorEvent.MOVED_IN,
+    Gio.FileMonitorEvent.MOVED_OUT,
+    Gio.FileMonitorEvent.RENAMED,
+)
+
+
+class StateWatcher:
+    """Watches the state files and pushes changes to the managers.
+
+    ~/.big_desktop_theme and ~/.kdebiglinux/lastused are followed with
+    Gio.FileMonitor. On a change the cached value in the state provider is
+    dropped, the file is read once, and the manager notifies its
+    theme_changed_callbacks / desktop_changed_callbacks if the value
+    differs from what it already knows. ~/.kdebiglinux itself is monitored
+    too, keeping the saved layouts index current.
+    """
+
+    def __init__(self, theme_manager, desktop_manager):
+        """Initialize the watcher; call start() to begin monitoring."""
+        self.theme_manager = theme_manager
+        self.desktop_manager = desktop_manager
+        self._monitors = []
+
+    def start(self) -> None:
+        """Start monitoring the state files and the saved layouts."""
+        if self._monitors:
+            return
+        self._watch(THEME_STATE_FILE, self._on_theme_file_changed)
+        self._watch(DESKTOP_STATE_FILE, self._on_desktop_file_changed)
+        self._watch(SAVED_LAYOUTS_DIR, self._on_layouts_dir_changed, directory=True)
+
+    def stop(self) -> None:
+        """Stop monitoring."""
+        for monitor in self._monitors:
+            monitor.cancel()
+        self._monitors = []
+
+    def _watch(self, path: str, handler, directory: bool = False) -> None:
+        """Create a monitor for one file or directory."""
+        try:
+            gfile = Gio.File.new_for_path(path)
+            if directory:
+                monitor = gfile.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            else:
+                monitor = gfile.monitor_file(Gio.FileMonitorFlags.WATCH_MOVES, None)
+        except Exception as e:
+            logger.warning("Error monitoring %s: %s", path, e)
+            return
+        monitor.connect("changed", handler)
+        self._monitors.append(monitor)
+
+    def _on_theme_file_changed(self, monitor, file, other_file, event_type):
+        """Reload the current theme after the file was rewritten."""
+        if event_type not in _RELOAD_EVENTS:
+            return
+        state_provider.invalidate(THEME_STATE_FILE)
+        self.theme_manager.update_current_theme(state_provider.current_theme())
+
+    def _on_desktop_file_changed(self, monitor, file, other_file, event_type):
+        """Reload the current desktop after the file was rewritten."""
+        if event_type not in _RELOAD_EVENTS:
+            return
+        state_provider.invalidate(DESKTOP_STATE_FILE)
+        self.desktop_manager.update_current_desktop(state_provider.current_desktop())
+
+    def _on_layouts_dir_changed(self, monitor, file, other_file, event_type):
+        """Update the saved layouts index for the entry that changed."""
+        if event_type not in _RELOAD_EVENTS:
+            return
+        if file.get_path() == SAVED_LAYOUTS_DIR:
+            # The directory itself was created, removed or moved
+            saved_layouts.scan()
+            return
+        for changed in (file, other_file):
+            if changed is None:
+                continue
+            if os.path.dirname(changed.get_path()) == SAVED_LAYOUTS_DIR:
+                saved_layouts.refresh(changed.get_basename())
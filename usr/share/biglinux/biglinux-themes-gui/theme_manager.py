@@ -3,107 +3,121 @@ Theme manager module for BigLinux Themes GUI.
 Handles theme operations and provides theme-related functionality.
 """
 
-from typing import List
-import os
 import gi
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-# Add Gdk to imports
-from gi.repository import Gtk, GdkPixbuf, GLib, Gdk
+from gi.repository import Gio
 
 # Import the translation function
 from i18n import _
-from utils import get_current_theme, get_theme_list, apply_theme, get_current_dir
+from core import ThemeCore
+from apply_engine import ApplyJob
+from apply_scheduler import apply_scheduler
+from catalog import KIND_THEME
+from session_reload import session_reloader
+from resources import get_uri
+from thumbnail_cache import thumbnail_cache, THEME_PREVIEW_WIDTH
+from catalog_view import CatalogItem
 
 
-class ThemeManager:
-    """Manager for theme operations."""
+class ThemeManager(ThemeCore):
+    """Manager for theme operations, adding the GTK side to ThemeCore."""
 
     def __init__(self):
         """Initialize the theme manager."""
-        self.current_theme = get_current_theme()
-        self.theme_list = get_theme_list()
-        self.theme_changed_callbacks = []
-
-    def get_current_theme(self) -> str:
-        """Get the currently active theme."""
-        self.current_theme = get_current_theme()
-        return self.current_theme
-
-    def get_theme_list(self) -> List[str]:
-        """Get the list of available themes."""
-        return self.theme_list
-
-    def set_theme(self, theme_name: str) -> None:
-        """Set a theme as active."""
-        apply_theme(theme_name)
-        self.current_theme = theme_name
-        self._notify_theme_changed()
-
-    def _notify_theme_changed(self) -> None:
-        """Notify all registered callbacks about a theme change."""
-        for callback in self.theme_changed_callbacks:
-            callback(self.current_theme)
-
-    def get_theme_image_path(self, theme_name: str) -> str:
-        """Get the path to a theme's preview image."""
-        return os.path.join(get_current_dir(), "img", f"{theme_name}.png")
-
-    def create_theme_widget(self, theme_name: str) -> Gtk.Box:
-        """Create a widget for displaying a theme in the UI."""
-        # Create main container
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
-        box.set_margin_start(8)
-        box.set_margin_end(8)
-        box.set_margin_top(0)
-        box.set_margin_bottom(0)
-        box.set_hexpand(True)
-        box.set_vexpand(True)
-        box.set_homogeneous(False)
-
-        # Create an outer box to handle the hover effect without affecting content size
-        outer_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-        outer_box.set_hexpand(True)
-        outer_box.set_vexpand(True)
-        outer_box.add_css_class("clickable-item")  # Custom CSS class for hover effects
-        outer_box.append(box)
-
-        # Set cursor to pointer using GTK4 method
-        cursor = Gdk.Cursor.new_from_name("pointer", None)
-        outer_box.set_cursor(cursor)
-
-        # Create tooltip
-        display_name = theme_name.replace("-", " ")
-        tooltip = _("Click to apply the {} theme").format(display_name)
-        box.set_tooltip_text(tooltip)
-
-        # Create image widget
-        image_path = self.get_theme_image_path(theme_name)
-        try:
-            # Don't set fixed scale, let it adapt to container
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(image_path)
-
-            # Create picture that can scale with the container
-            picture = Gtk.Picture.new_for_pixbuf(pixbuf)
-            picture.set_keep_aspect_ratio(True)
-            picture.set_hexpand(True)
-            picture.set_vexpand(True)
-            picture.set_can_shrink(True)
-        except GLib.Error:
-            # Fallback if image cannot be loaded
-            picture = Gtk.Picture()
-            picture.set_hexpand(True)
-            picture.set_vexpand(True)
-
-        # Create label for theme name
-        label = Gtk.Label(label=theme_name.replace("-", " "))
-        label.set_margin_top(0)
-        label.set_ellipsize(True)
-        label.set_max_width_chars(25)
-
-        # Add widgets to container
-        box.append(picture)
-        box.append(label)
-
-        return box
+        super().__init__()
+        self._theme_model = None
+
+    def set_theme_async(
+        self,
+        theme_name: str,
+        on_finished,
+        on_failed,
+        on_cancelled=None,
+        on_progress=None,
+    ) -> ApplyJob:
+        """Apply a theme on a worker thread and return the running job.
+
+        The current theme is only updated, and callbacks notified, once the
+        apply tool has finished successfully. A failed or cancelled apply is
+        rolled back to the previous configuration. After a successful apply
+        the running session is reloaded, and on_finished receives the theme name
+        and the ReloadResult. on_progress receives the tool's Progress steps.
+        """
+
+        def apply_and_reload(cancellable=None, on_progress=None):
+            self.run_theme_apply(
+                theme_name, cancellable=cancellable, on_progress=on_progress
+            )
+            return session_reloader.reload(KIND_THEME)
+
+        def finished(reload_result):
+            self.current_theme = theme_name
+            self._notify_theme_changed()
+            on_finished(theme_name, reload_result)
+
+        job = ApplyJob(
+            apply_and_reload,
+            on_finished=finished,
+            on_failed=on_failed,
+            on_cancelled=on_cancelled,
+            on_progress=on_progress,
+        )
+        return job.start()
+
+    def schedule_theme(
+        self, theme_name: str, start, force: bool = False, owner=None
+    ) -> bool:
+        """Queue a theme apply on the shared scheduler.
+
+        start() is called when the apply's turn comes and returns the job,
+        usually from set_theme_async. Returns False if the request was
+        dropped, being already active, queued or running; force only
+        allows reapplying the active theme.
+        """
+        return apply_scheduler.submit(
+            KIND_THEME,
+            theme_name,
+            start,
+            current=self.current_theme,
+            force=force,
+            owner=owner,
+        )
+
+    def get_target_theme(self) -> str:
+        """Get the theme that will be active once the queued applies finish."""
+        return apply_scheduler.get_target(KIND_THEME, self.get_current_theme())
+
+    def create_theme_item(self, theme_name: str) -> CatalogItem:
+        """Create the catalog item displaying a theme in the UI."""
+        # Bundled previews are read from the resource bundle
+        image_path = get_uri(self.get_theme_image_path(theme_name))
+        display_name = self.get_theme_label(theme_name)
+        return CatalogItem(
+            name=theme_name,
+            label=display_name,
+            tooltip=_("Click to apply the {} theme").format(display_name),
+            load_texture=lambda scale: thumbnail_cache.get_texture(
+                image_path, THEME_PREVIEW_WIDTH, scale
+            ),
+            active=theme_name == self.current_theme,
+        )
+
+    def create_theme_model(self) -> Gio.ListStore:
+        """Create a list model with one item per available theme."""
+        model = Gio.ListStore(item_type=CatalogItem)
+        model.splice(
+            0, 0, [self.create_theme_item(name) for name in self.get_theme_list()]
+        )
+        return model
+
+    def get_theme_model(self) -> Gio.ListStore:
+        """Get the shared theme model, creating it on first use."""
+        if self._theme_model is None:
+            self._theme_model = self.create_theme_model()
+        return self._theme_model
+
+    def release_model(self) -> None:
+        """Drop the shared model and the textures held by its items."""
+        self._theme_model = None
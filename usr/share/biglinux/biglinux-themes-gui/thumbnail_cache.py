@@ -0,0 +1,237 @@
+"""
+Thumbnail cache module for BigLinux Themes GUI.
+Keeps pre-scaled previews and rasterized layout SVGs on disk and in memory.
+"""
+
+import hashlib
+import logging
+import os
+import struct
+import threading
+
+import gi
+
+gi.require_version("Gtk", "4.0")
+from gi.repository import GdkPixbuf, GLib, Gdk
+
+from utils import get_cache_dir
+from resources import get_bundle_stamp, get_resource_path, is_resource_uri
+
+logger = logging.getLogger(__name__)
+
+# Logical width of the theme previews in the sidebar
+THEME_PREVIEW_WIDTH = 256
+
+# Width / height ratio of the theme preview images in img/
+THEME_PREVIEW_ASPECT = 530 / 359
+
+# Upper bound for the whole cache directory
+DEFAULT_MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+# Header of a cache entry: magic, version, width, height, rowstride, has_alpha
+_HEADER = struct.Struct("<4sHIIIB")
+_MAGIC = b"BLTC"
+_VERSION = 1
+_SUFFIX = ".thumb"
+
+
+def get_display_scale() -> int:
+    """Get the highest scale factor among the connected monitors."""
+    display = Gdk.Display.get_default()
+    if display is None:
+        return 1
+    scale = 1
+    monitors = display.get_monitors()
+    for i in range(monitors.get_n_items()):
+        scale = max(scale, monitors.get_item(i).get_scale_factor())
+    return scale
+
+
+class ThumbnailCache:
+    """Disk and memory cache of scaled images stored as raw pixel data.
+
+    Entries are keyed by source path, mtime, size, target size and scale
+    factor, so an updated image gets a new entry automatically. Sources
+    may also be resource:// URIs, keyed by the bundle they come from. Raw pixels
+    load with a single read and no decoding, and SVG sources are only
+    rendered by librsvg on a miss. Loaded textures are also kept in memory
+    and shared by every widget showing the same image. The oldest disk
+    entries are evicted once the directory grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        """Initialize the cache; the directory is created on first write."""
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir(), "thumbnails")
+        self.max_bytes = max_bytes
+        self._textures = {}
+        self._lock = threading.Lock()
+
+    def get_texture(
+        self, source_path: str, width: int, scale: int = 1, height: int = -1
+    ) -> Gdk.Texture:
+        """Return a texture of source_path fitted into width x height, times scale.
+
+        source_path is a file path or a resource:// URI.
+        A height of -1 keeps the aspect ratio for the given width. Raises
+        GLib.Error when the source image cannot be loaded.
+        """
+        entry_path = self._entry_path(source_path, width, height, scale)
+        if entry_path is not None:
+            with self._lock:
+                texture = self._textures.get(entry_path)
+            if texture is not None:
+                return texture
+            texture = self._read_entry(entry_path)
+            if texture is not None:
+                return self._remember(entry_path, texture)
+
+        pixbuf = self._load_pixbuf(
+            source_path, width * scale, height * scale if height > 0 else -1
+        )
+        texture = self._pixbuf_to_texture(pixbuf)
+        if entry_path is not None:
+            self._write_entry(entry_path, pixbuf)
+            self._remember(entry_path, texture)
+        return texture
+
+    @staticmethod
+    def _load_pixbuf(source_path: str, width: int, height: int) -> GdkPixbuf.Pixbuf:
+        """Decode and scale a source image from a file or the resource bundle."""
+        if is_resource_uri(source_path):
+            return GdkPixbuf.Pixbuf.new_from_resource_at_scale(
+                get_resource_path(source_path), width, height, True
+            )
+        return GdkPixbuf.Pixbuf.new_from_file_at_scale(source_path, width, height, True)
+
+    def _remember(self, entry_path: str, texture: Gdk.Texture) -> Gdk.Texture:
+        """Keep a texture in the shared in-memory store."""
+        with self._lock:
+            # Another thread may have loaded the same entry meanwhile
+            return self._textures.setdefault(entry_path, texture)
+
+    def release_memory(self) -> None:
+        """Drop the in-memory textures, keeping the disk entries."""
+        with self._lock:
+            self._textures.clear()
+
+    def _entry_path(self, source_path: str, width: int, height: int, scale: int):
+        """Build the cache file path for a source image, or None if missing."""
+        if is_resource_uri(source_path):
+            # Bundled images change only with the bundle itself
+            stamp = get_bundle_stamp()
+            if not stamp:
+                return None
+            source_key = f"{source_path}:{stamp}"
+        else:
+            try:
+                st = os.stat(source_path)
+            except OSError:
+                return None
+            source_key = f"{os.path.abspath(source_path)}:{st.st_mtime_ns}:{st.st_size}"
+        key = f"{source_key}:{width}x{height}@{scale}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + _SUFFIX)
+
+    def _read_entry(self, entry_path: str):
+        """Load a cache entry as a texture, or None on a miss."""
+        try:
+            with open(entry_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, width, height, rowstride, has_alpha = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            return None
+        pixels = data[_HEADER.size:]
+        # The last row of a pixbuf is not padded to the rowstride
+        bytes_per_pixel = 4 if has_alpha else 3
+        if len(pixels) < (height - 1) * rowstride + width * bytes_per_pixel:
+            return None
+
+        # Touch the entry so eviction drops the least recently used first
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+        memory_format = (
+            Gdk.MemoryFormat.R8G8B8A8 if has_alpha else Gdk.MemoryFormat.R8G8B8
+        )
+        return Gdk.MemoryTexture.new(
+            width, height, memory_format, GLib.Bytes.new(pixels), rowstride
+        )
+
+    def _write_entry(self, entry_path: str, pixbuf: GdkPixbuf.Pixbuf) -> None:
+        """Store a scaled pixbuf as a cache entry."""
+        header = _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            pixbuf.get_width(),
+            pixbuf.get_height(),
+            pixbuf.get_rowstride(),
+            1 if pixbuf.get_has_alpha() else 0,
+        )
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                f.write(pixbuf.get_pixels())
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning("Error writing thumbnail cache entry %s: %s", entry_path, e)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries above the size limit."""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(_SUFFIX):
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError:
+            return
+
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """Remove all cache entries."""
+        self.release_memory()
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(_SUFFIX):
+                        os.unlink(entry.path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _pixbuf_to_texture(pixbuf: GdkPixbuf.Pixbuf) -> Gdk.Texture:
+        """Convert a pixbuf into a texture."""
+        return Gdk.Texture.new_for_pixbuf(pixbuf)
+
+
+# Shared cache used by the managers
+thumbnail_cache = ThumbnailCache()
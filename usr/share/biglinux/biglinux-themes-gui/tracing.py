@@ -0,0 +1,167 @@
+"""
+Tracing module for BigLinux Themes GUI.
+Records spans of user actions and exports them as JSON lines.
+
+A user action is one trace: the click opens a root span, and the dialog,
+the apply, every subprocess, the UI refresh and the toast are child spans.
+Tracing is off unless BIG_THEMES_GUI_TRACE_FILE names the output file.
+This module is toolkit-free so the CLI can trace its applies too.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+# Environment variable naming the JSON lines file spans are appended to
+TRACE_FILE_ENV = "BIG_THEMES_GUI_TRACE_FILE"
+
+# Environment variable with the logging level, e.g. DEBUG, INFO, WARNING
+LOG_LEVEL_ENV = "BIG_THEMES_GUI_LOG_LEVEL"
+
+# Span outcomes
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_CANCELLED = "cancelled"
+
+logger = logging.getLogger(__name__)
+
+# Span that new spans are parented to, follows threads via copied contexts
+_current_span = contextvars.ContextVar("big_themes_current_span", default=None)
+
+
+def setup_logging() -> None:
+    """Configure logging from LOG_LEVEL_ENV, warnings only by default."""
+    level_name = os.environ.get(LOG_LEVEL_ENV, "WARNING").upper()
+    level = getattr(logging, level_name, logging.WARNING)
+    logging.basicConfig(
+        level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    def __init__(self, tracer, name: str, parent: Optional["Span"], attributes: dict):
+        """Start the span now."""
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self._start_monotonic = time.monotonic()
+        self.end = None
+        self.duration_ms = None
+        self.status = None
+
+    def set_attribute(self, key: str, value) -> None:
+        """Attach a value to the span."""
+        self.attributes[key] = value
+
+    def finish(self, status: str = STATUS_OK, **attributes) -> None:
+        """End the span with an outcome; later calls are ignored."""
+        if self.end is not None:
+            return
+        self.attributes.update(attributes)
+        self.end = time.time()
+        self.duration_ms = round((time.monotonic() - self._start_monotonic) * 1000, 3)
+        self.status = status
+        self.tracer.export(self)
+
+    def to_dict(self) -> dict:
+        """Serialize the span."""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Creates spans and appends finished ones to a JSON lines file."""
+
+    def __init__(self, output_path: Optional[str] = None):
+        """Initialize the tracer, disabled when output_path is empty."""
+        self.output_path = output_path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Check if spans are exported."""
+        return bool(self.output_path)
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """Start a span, by default as a child of the current span."""
+        if parent is None:
+            parent = _current_span.get()
+        return Span(self, name, parent, attributes)
+
+    def start_trace(self, name: str, **attributes) -> Span:
+        """Start the root span of a new trace."""
+        return Span(self, name, None, attributes)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes):
+        """Run the enclosed block as the current span."""
+        span = self.start_span(name, parent=parent, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.finish(STATUS_ERROR, error=str(e))
+            raise
+        else:
+            # No-op if the block already finished the span with its own outcome
+            span.finish()
+        finally:
+            _current_span.reset(token)
+
+    @contextmanager
+    def use_span(self, span: Optional[Span]):
+        """Make an already started span current without ending it."""
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+    def export(self, span: Span) -> None:
+        """Append a finished span to the output file."""
+        logger.debug(
+            "span %s %s %.1f ms %s",
+            span.name,
+            span.status,
+            span.duration_ms,
+            span.attributes,
+        )
+        if not self.enabled:
+            return
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            try:
+                with open(self.output_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.warning("Error writing trace to %s: %s", self.output_path, e)
+
+
+def current_span() -> Optional[Span]:
+    """Return the current span, or None."""
+    return _current_span.get()
+
+
+# Shared tracer, exporting to TRACE_FILE_ENV when set
+tracer = Tracer(os.environ.get(TRACE_FILE_ENV))
@@ -3,9 +3,54 @@ Utils module for BigLinux Themes GUI.
 Contains utility functions for running shell commands and processing data.
 """
 
+import atexit
+import codecs
+import collections
+import logging
+import re
+import selectors
+import shlex
 import subprocess
 import os
-from typing import List
+import signal
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from tracing import tracer, STATUS_OK, STATUS_ERROR, STATUS_CANCELLED
+
+logger = logging.getLogger(__name__)
+
+# Default time a command may run before its process group is stopped (s)
+COMMAND_TIMEOUT = 30
+
+# Apply tools restart session components and may legitimately take minutes
+APPLY_TIMEOUT = 600
+
+# Time between SIGTERM and SIGKILL when stopping a process group (s)
+TERMINATE_GRACE = 3
+
+# How often a running command is checked for a timeout or cancel (s)
+SUPERVISE_INTERVAL = 0.2
+
+# Characters kept of each output stream, the end being kept
+MAX_OUTPUT_CHARS = 64 * 1024
+
+# Bytes read from an output pipe at once
+READ_CHUNK_SIZE = 64 * 1024
+
+# Progress line of the apply scripts, e.g. "PROGRESS 1/2 Applying the theme"
+_PROGRESS_LINE = re.compile(r"^PROGRESS (\d+)/(\d+)(?:\s+(.*))?$")
+
+# ulimit options of query commands: no core dumps, 20 s of CPU time
+QUERY_RLIMITS = {"c": 0, "t": 20}
+
+# Apply tools get no rlimits, the session components they restart inherit them
+APPLY_LIMITS = {"timeout": APPLY_TIMEOUT, "rlimits": None}
+
+# Commands running right now, stopped at exit
+_running_processes = set()
+_running_lock = threading.Lock()
 
 
 def get_current_dir() -> str:
@@ -13,78 +58,621 @@ def get_current_dir() -> str:
     return os.path.dirname(os.path.abspath(__file__))
 
 
-def run_shell_command(command: str) -> str:
-    """Run a shell command and return its output as a string."""
-    print(f"Executing command: {command}")
-    result = subprocess.run(
-        command,
-        shell=True,
-        check=False,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+def get_cache_dir() -> str:
+    """Get the cache directory of the application."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "biglinux-themes-gui")
+
+
+class CommandCancelled(Exception):
+    """Raised when a running command was cancelled by the user."""
+
+
+class CommandFailed(Exception):
+    """Raised when a checked command exits with a non-zero status."""
+
+    def __init__(self, command: str, returncode: int, stderr: str):
+        """Store the failed command and its error output."""
+        super().__init__(f"{command} exited with status {returncode}")
+        self.command = command
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class CommandTimedOut(CommandFailed):
+    """Raised when a command ran longer than its timeout and was stopped."""
+
+    def __init__(self, result: "CommandResult", timeout: float):
+        """Store the result of the stopped command."""
+        super().__init__(result.command, result.returncode, result.stderr)
+        self.args = (f"{result.command} timed out after {timeout}s",)
+        self.result = result
+        self.timeout = timeout
+
+
+class Progress(NamedTuple):
+    """A step reported by an apply script as "PROGRESS <step>/<total> <message>".
+
+    step of total steps are done, message describes the one now running.
+    """
+
+    step: int
+    total: int
+    message: str
+
+    @property
+    def fraction(self) -> float:
+        """Completed part of the work, from 0 to 1."""
+        return self.step / self.total
+
+
+class CommandResult(NamedTuple):
+    """Outcome of a finished command."""
+
+    command: str
+    returncode: int
+    # Wall clock time in seconds
+    duration: float
+    stdout: str
+    stderr: str
+    # True if old lines of stdout or stderr were dropped
+    truncated: bool
+
+    @property
+    def ok(self) -> bool:
+        """Check if the command exited with status 0."""
+        return self.returncode == 0
+
+
+class Cancellable:
+    """Cancellation token shared between the UI and a running command."""
+
+    def __init__(self):
+        """Initialize the token in the not-cancelled state."""
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._process = None
+
+    def cancel(self) -> None:
+        """Request cancellation and stop the attached process, if any."""
+        with self._lock:
+            self._event.set()
+            process = self._process
+        if process is not None and process.poll() is None:
+            logger.info("Cancelling process group %s", process.pid)
+            try:
+                # The command runs in its own session, so its pid is the group id
+                os.killpg(process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def is_cancelled(self) -> bool:
+        """Check if cancellation was requested."""
+        return self._event.is_set()
+
+    def attach(self, process: subprocess.Popen) -> None:
+        """Attach the running process so cancel() can stop it."""
+        with self._lock:
+            self._process = process
+            cancelled = self._event.is_set()
+        if cancelled:
+            self.cancel()
+
+    def detach(self) -> None:
+        """Forget the attached process once it has finished."""
+        with self._lock:
+            self._process = None
+
+
+def _terminate_group(process: subprocess.Popen, grace: float) -> None:
+    """Stop a command's whole process group, SIGKILL if SIGTERM is ignored."""
+    try:
+        # The command runs in its own session, so its pid is the group id
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(grace)
+        return
+    except ProcessLookupError:
+        return
+    except subprocess.TimeoutExpired:
+        pass
+    logger.warning("Process group %s ignored SIGTERM, killing it", process.pid)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def terminate_running_commands() -> None:
+    """Stop every command still running, e.g. when the application exits."""
+    with _running_lock:
+        processes = list(_running_processes)
+    for process in processes:
+        if process.poll() is None:
+            logger.info("Stopping process group %s at exit", process.pid)
+            _terminate_group(process, TERMINATE_GRACE)
+
+
+# Daemon worker threads die with the interpreter, their commands must not outlive it
+atexit.register(terminate_running_commands)
+
+
+def parse_progress(line: str) -> Optional[Progress]:
+    """Parse a PROGRESS line written by an apply script, None for other lines."""
+    match = _PROGRESS_LINE.match(line)
+    if match is None:
+        return None
+    step, total = int(match.group(1)), int(match.group(2))
+    if total <= 0 or not 0 <= step <= total:
+        return None
+    return Progress(step, total, (match.group(3) or "").strip())
+
+
+class OutputReader:
+    """Collects one output stream of a command line by line.
+
+    Only the last MAX_OUTPUT_CHARS characters are kept, so memory stays
+    bounded however much a tool prints. Complete lines are passed to
+    on_line as soon as they are read.
+    """
+
+    def __init__(self, on_line: Optional[Callable[[str], bool]] = None):
+        """Initialize; on_line returns True for lines that should not be kept."""
+        self.on_line = on_line
+        self.truncated = False
+        self._lines = collections.deque()
+        self._size = 0
+        self._partial = ""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def feed(self, data: bytes) -> None:
+        """Add a chunk read from the stream; empty at end of stream."""
+        text = self._partial + self._decoder.decode(data, final=not data)
+        lines = text.split("\n")
+        self._partial = lines.pop()
+        if not data and self._partial:
+            lines.append(self._partial)
+            self._partial = ""
+        elif len(self._partial) > MAX_OUTPUT_CHARS:
+            # A single endless line, e.g. a progress bar drawn with \r
+            lines.append(self._partial)
+            self._partial = ""
+        for line in lines:
+            self._add_line(line.rstrip("\r"))
+
+    def _add_line(self, line: str) -> None:
+        """Keep a complete line, dropping the oldest beyond the limit."""
+        if self.on_line is not None and self.on_line(line):
+            return
+        self._lines.append(line)
+        self._size += len(line) + 1
+        while self._size > MAX_OUTPUT_CHARS and len(self._lines) > 1:
+            self._size -= len(self._lines.popleft()) + 1
+            self.truncated = True
 
-    if result.returncode != 0:
-        print(f"Command failed with return code: {result.returncode}")
-        print(f"Error output: {result.stderr}")
+    def get_text(self) -> str:
+        """Return the kept output."""
+        return "\n".join(self._lines)
 
-    output = result.stdout.strip()
-    if len(output) > 100:
-        print(f"Command output (truncated): {output[:100]}...")
-    else:
-        print(f"Command output: {output}")
 
-    return output
+def run_shell_command(
+    command: str,
+    cancellable: Optional[Cancellable] = None,
+    check: bool = False,
+    timeout: float = COMMAND_TIMEOUT,
+    rlimits: Optional[Dict[str, int]] = QUERY_RLIMITS,
+    on_progress: Optional[Callable[[Progress], None]] = None,
+) -> CommandResult:
+    """Run a shell command under supervision and return its result.
 
+    The command runs in its own process group with the given ulimit
+    values. Past timeout seconds, or after a cancel, the whole group gets
+    SIGTERM and, TERMINATE_GRACE seconds later, SIGKILL. A timeout raises
+    CommandTimedOut, a cancel CommandCancelled, and with check set a
+    non-zero exit status raises CommandFailed.
 
-def run_shell_script(script_name: str, *args) -> str:
-    """Run a shell script in the current directory with arguments."""
+    The output is read while the command runs. PROGRESS lines on stdout
+    are passed to on_progress, on the calling thread, instead of being
+    kept in the result.
+    """
+    with tracer.span("command", command=command) as span:
+        logger.debug("Executing command: %s", command)
+        limits = "".join(f"ulimit -{option} {value}; " for option, value in (rlimits or {}).items())
+
+        def on_stdout_line(line):
+            progress = parse_progress(line)
+            if progress is None:
+                return False
+            logger.debug("Progress %d/%d: %s", *progress)
+            if on_progress is not None:
+                on_progress(progress)
+            return True
+
+        readers = {}
+        start = time.monotonic()
+        process = subprocess.Popen(
+            limits + command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            # New session so a timeout or cancel also stops the children of the shell
+            start_new_session=True,
+        )
+        span.set_attribute("pid", process.pid)
+        with _running_lock:
+            _running_processes.add(process)
+        if cancellable is not None:
+            cancellable.attach(process)
+
+        readers[process.stdout] = OutputReader(on_stdout_line)
+        readers[process.stderr] = OutputReader()
+        selector = selectors.DefaultSelector()
+        for stream in readers:
+            selector.register(stream, selectors.EVENT_READ)
+
+        timed_out = False
+        cancelled_at = None
+        exited_at = None
+        try:
+            while selector.get_map():
+                # Wake up regularly to notice timeouts and cancels
+                for key, _events in selector.select(SUPERVISE_INTERVAL):
+                    data = os.read(key.fd, READ_CHUNK_SIZE)
+                    readers[key.fileobj].feed(data)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                if not selector.get_map():
+                    break
+
+                now = time.monotonic()
+                if process.poll() is not None:
+                    # The shell exited, but a child it left running holds the output
+                    # open; it was started on purpose, e.g. a restarted plasmashell
+                    if exited_at is None:
+                        exited_at = now
+                    elif now - exited_at > TERMINATE_GRACE:
+                        logger.info("Not waiting for the children of: %s", command)
+                        break
+                elif cancellable is not None and cancellable.is_cancelled():
+                    # cancel() sent SIGTERM, escalate if the group ignores it
+                    if cancelled_at is None:
+                        cancelled_at = now
+                    elif now - cancelled_at > TERMINATE_GRACE:
+                        _terminate_group(process, 0)
+                elif not timed_out and now - start > timeout:
+                    logger.warning("Command timed out after %ss: %s", timeout, command)
+                    timed_out = True
+                    _terminate_group(process, TERMINATE_GRACE)
+            process.wait()
+        finally:
+            selector.close()
+            process.stdout.close()
+            process.stderr.close()
+            if cancellable is not None:
+                cancellable.detach()
+            with _running_lock:
+                _running_processes.discard(process)
+
+        duration = time.monotonic() - start
+        stdout = readers[process.stdout].get_text()
+        stderr = readers[process.stderr].get_text()
+        result = CommandResult(
+            command,
+            process.returncode,
+            duration,
+            stdout.strip(),
+            stderr.strip(),
+            readers[process.stdout].truncated or readers[process.stderr].truncated,
+        )
+
+        # A cancel that came after the command had finished stops nothing
+        if (
+            cancellable is not None
+            and cancellable.is_cancelled()
+            and process.returncode != 0
+        ):
+            logger.info("Command cancelled: %s", command)
+            span.finish(STATUS_CANCELLED, exit_code=process.returncode)
+            raise CommandCancelled(command)
+
+        if timed_out:
+            span.finish(STATUS_ERROR, exit_code=process.returncode, timed_out=True)
+            raise CommandTimedOut(result, timeout)
+
+        if process.returncode != 0:
+            logger.warning(
+                "Command failed with return code %s: %s", process.returncode, command
+            )
+            logger.warning("Error output: %s", result.stderr)
+
+        if len(result.stdout) > 100:
+            logger.debug("Command output (truncated): %s...", result.stdout[:100])
+        else:
+            logger.debug("Command output: %s", result.stdout)
+
+        span.finish(
+            STATUS_OK if process.returncode == 0 else STATUS_ERROR,
+            exit_code=process.returncode,
+            duration_ms=round(duration * 1000, 3),
+            stdout_bytes=len(stdout),
+            stderr_bytes=len(stderr),
+            truncated=result.truncated,
+        )
+        if check and process.returncode != 0:
+            raise CommandFailed(command, process.returncode, result.stderr)
+        return result
+
+
+def run_shell_script(
+    script_name: str,
+    *args,
+    cancellable: Optional[Cancellable] = None,
+    check: bool = False,
+    timeout: float = COMMAND_TIMEOUT,
+    rlimits: Optional[Dict[str, int]] = QUERY_RLIMITS,
+    on_progress: Optional[Callable[[Progress], None]] = None,
+) -> CommandResult:
+    """Run a shell script in the current directory with arguments.
+
+    The arguments are quoted, names from manifests or the command line
+    reach the script as they are and are never run by the shell.
+    """
     script_path = os.path.join(get_current_dir(), script_name)
-    args_str = " ".join(str(arg) for arg in args)
-    command = f"{script_path} {args_str}"
-    print(f"Running script: {script_name} with args: {args_str}")
-    return run_shell_command(command)
+    args_str = " ".join(shlex.quote(str(arg)) for arg in args)
+    command = f"{shlex.quote(script_path)} {args_str}"
+    logger.debug("Running script: %s with args: %s", script_name, args_str)
+    return run_shell_command(command, cancellable, check, timeout, rlimits, on_progress)
 
 
 def get_list_from_script(script_name: str) -> List[str]:
     """Run a script and return its output as a list of strings."""
-    output = run_shell_script(script_name)
+    output = run_shell_script(script_name).stdout
     return [line for line in output.split("\n") if line.strip()]
 
 
+# Files written by big-theme-plasma / big-theme-apps with the active state
+THEME_STATE_FILE = os.path.expanduser("~/.big_desktop_theme")
+DESKTOP_STATE_FILE = os.path.expanduser("~/.kdebiglinux/lastused")
+
+# Directory where big-theme-plasma keeps the saved desktop layouts
+SAVED_LAYOUTS_DIR = os.path.expanduser("~/.kdebiglinux")
+
+
+class StateProvider:
+    """In-process provider for the current theme and desktop configuration.
+
+    State files are read directly instead of through bash. Each value is
+    cached together with the file's mtime and size, so repeated queries
+    cost a single stat() and still notice changes made by other tools.
+    The shell scripts are only used as a fallback when a state file cannot
+    be read. The catalog lists are provided by the catalog module.
+    """
+
+    def __init__(self, use_script_fallback: bool = True):
+        """Initialize an empty cache."""
+        self.use_script_fallback = use_script_fallback
+        self._lock = threading.Lock()
+        self._file_cache = {}
+
+    def current_theme(self) -> str:
+        """Get the current theme."""
+        return self._read_state(THEME_STATE_FILE, "actual-theme.sh")
+
+    def current_desktop(self) -> str:
+        """Get the current desktop configuration."""
+        return self._read_state(DESKTOP_STATE_FILE, "actual-desktop.sh")
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop cached state for one file, or everything."""
+        with self._lock:
+            if path is None:
+                self._file_cache.clear()
+            else:
+                self._file_cache.pop(path, None)
+
+    def _file_key(self, path: str):
+        """Return the (mtime, size) key of a file, or None if it is missing."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_state(self, path: str, script_name: str) -> str:
+        """Read a one-line state file, using the cache when it is fresh."""
+        key = self._file_key(path)
+        with self._lock:
+            cached = self._file_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = f.read().strip()
+        except FileNotFoundError:
+            value = ""
+        except (OSError, UnicodeDecodeError) as e:
+            if not self.use_script_fallback:
+                logger.warning("Error reading %s: %s", path, e)
+                value = ""
+            else:
+                logger.warning(
+                    "Error reading %s: %s, falling back to %s", path, e, script_name
+                )
+                value = run_shell_script(script_name).stdout
+
+        with self._lock:
+            self._file_cache[path] = (key, value)
+        return value
+
+
+def is_gnome_session() -> bool:
+    """Check if the current session is GNOME."""
+    return os.environ.get("XDG_CURRENT_DESKTOP", "") == "GNOME"
+
+
+# Shared state provider used by the module-level helpers below
+state_provider = StateProvider()
+
+
 def get_current_desktop() -> str:
     """Get the current desktop configuration."""
-    return run_shell_script("actual-desktop.sh")
+    return state_provider.current_desktop()
 
 
 def get_current_theme() -> str:
     """Get the current theme."""
-    return run_shell_script("actual-theme.sh")
+    return state_provider.current_theme()
+
+
+class SavedLayout(NamedTuple):
+    """A desktop layout saved by big-theme-plasma in SAVED_LAYOUTS_DIR."""
+
+    name: str
+    is_dir: bool
+    size: int
+    mtime: float
+
+
+class SavedLayoutIndex:
+    """Index of the saved desktop layouts, built from one directory scan.
+
+    Lookups are served from memory. The index is refreshed per entry by
+    the state watcher's directory monitor, or rescanned as a whole.
+    """
 
+    # Files in SAVED_LAYOUTS_DIR that are not saved layouts
+    IGNORED_NAMES = {"lastused"}
 
-def get_desktop_list() -> List[str]:
-    """Get list of available desktop configurations."""
-    return get_list_from_script("list-desktops.sh")
+    def __init__(self, directory: str = SAVED_LAYOUTS_DIR):
+        """Initialize an empty index; scan() fills it."""
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._layouts: Dict[str, SavedLayout] = {}
+        self._scanned = False
 
+    def scan(self) -> None:
+        """Rebuild the index with a single os.scandir of the directory."""
+        layouts = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    layout = self._entry_to_layout(entry)
+                    if layout is not None:
+                        layouts[layout.name] = layout
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Error scanning %s: %s", self.directory, e)
+        with self._lock:
+            self._layouts = layouts
+            self._scanned = True
 
-def get_theme_list() -> List[str]:
-    """Get list of available themes."""
-    return get_list_from_script("list-themes.sh")
+    def refresh(self, name: str) -> None:
+        """Update the index entry of one name after it changed on disk."""
+        if name in self.IGNORED_NAMES:
+            return
+        path = os.path.join(self.directory, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            layout = None
+        else:
+            layout = SavedLayout(
+                name, os.path.isdir(path), st.st_size, st.st_mtime
+            )
+        with self._lock:
+            if layout is None:
+                self._layouts.pop(name, None)
+            else:
+                self._layouts[name] = layout
+
+    def is_saved(self, name: str) -> bool:
+        """Check if a layout with this name was saved before."""
+        return self.get(name) is not None
+
+    def get(self, name: str) -> Optional[SavedLayout]:
+        """Return the saved layout metadata for name, or None."""
+        if not self._scanned:
+            self.scan()
+        with self._lock:
+            return self._layouts.get(name)
+
+    def _entry_to_layout(self, entry: os.DirEntry) -> Optional[SavedLayout]:
+        """Convert a directory entry into index metadata."""
+        if entry.name in self.IGNORED_NAMES:
+            return None
+        try:
+            st = entry.stat()
+            is_dir = entry.is_dir()
+        except OSError:
+            return None
+        return SavedLayout(entry.name, is_dir, st.st_size, st.st_mtime)
+
+
+# Shared index of the saved desktop layouts
+saved_layouts = SavedLayoutIndex()
 
 
 def check_desktop_used(desktop: str) -> bool:
     """Check if a desktop has been used before."""
-    # The correct way to call the script is to pass desktop as an argument, not with a question mark
-    result = run_shell_script("used-desktop.sh", desktop)
-    return result.strip() != "false"
+    return saved_layouts.is_saved(desktop)
+
 
+def apply_desktop(
+    desktop: str,
+    clean: str = "",
+    cancellable: Optional[Cancellable] = None,
+    on_progress: Optional[Callable[[Progress], None]] = None,
+) -> None:
+    """Apply a desktop configuration, optionally with clean flag.
+
+    Raises CommandFailed if the apply tool fails.
+    """
+    run_shell_script(
+        "apply-desktop.sh",
+        desktop,
+        clean,
+        cancellable=cancellable,
+        check=True,
+        on_progress=on_progress,
+        **APPLY_LIMITS,
+    )
+
+
+def apply_theme(
+    theme: str,
+    cancellable: Optional[Cancellable] = None,
+    on_progress: Optional[Callable[[Progress], None]] = None,
+) -> None:
+    """Apply a theme, raising CommandFailed if the apply tool fails."""
+    run_shell_script(
+        "apply-theme.sh",
+        theme,
+        cancellable=cancellable,
+        check=True,
+        on_progress=on_progress,
+        **APPLY_LIMITS,
+    )
 
-def apply_desktop(desktop: str, clean: str = "") -> None:
-    """Apply a desktop configuration, optionally with clean flag."""
-    run_shell_script("apply-desktop.sh", desktop, clean)
 
+def apply_profile(
+    theme: str,
+    desktop: str,
+    clean: str = "",
+    cancellable: Optional[Cancellable] = None,
+    on_progress: Optional[Callable[[Progress], None]] = None,
+) -> None:
+    """Apply a desktop configuration and a theme with a single script run.
 
-def apply_theme(theme: str) -> None:
-    """Apply a theme."""
-    run_shell_script("apply-theme.sh", theme)
+    Raises CommandFailed if either apply tool fails.
+    """
+    run_shell_script(
+        "apply-profile.sh",
+        theme,
+        desktop,
+        clean,
+        cancellable=cancellable,
+        check=True,
+        on_progress=on_progress,
+        **APPLY_LIMITS,
+    )
@@ -4,80 +4,110 @@ Implements the main application window and UI functionality.
 """
 
 import gi
+import logging
 import os
 import subprocess
+import time
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Gtk, Adw
+from gi.repository import Gtk, Adw, GObject
 
 # Import the translation function
-from i18n import _
+from i18n import _, ngettext
 from theme_manager import ThemeManager
 from desktop_manager import DesktopManager
+from startup_profiler import profiler
+from state_watcher import StateWatcher
+from profile_manager import ProfileManager
+from core import Profile, get_last_change, undo_last_change
+from snapshot import StaleSnapshot, get_rollback, ROLLBACK_RESTORED
+from apply_engine import ApplyJob
+from apply_scheduler import apply_scheduler, KIND_UNDO
+from session_reload import session_reloader
+from display_settings import display_settings
+from resources import get_uri, get_resource_path, is_resource_uri, STYLESHEET
+from utils import get_current_dir
+from tracing import tracer, STATUS_OK, STATUS_ERROR, STATUS_CANCELLED
+from catalog_view import (
+    ThemeCell,
+    DesktopCell,
+    CatalogFilter,
+    SelectionController,
+    create_catalog_view,
+    set_catalog_model,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class ThemesWindow(Adw.ApplicationWindow):
     """Main application window for BigLinux Themes."""
 
-    def __init__(self, **kwargs):
-        """Initialize the main window."""
+    # Style provider shared by all windows on the display
+    _css_provider = None
+
+    def __init__(self, theme_manager=None, desktop_manager=None, **kwargs):
+        """Initialize the main window, optionally with preloaded managers."""
         super().__init__(
             title=_("BigLinux Themes"), default_width=1000, default_height=620, **kwargs
         )
 
-        self.theme_manager = ThemeManager()
-        self.desktop_manager = DesktopManager()
+        with profiler.phase("theme_manager"):
+            self.theme_manager = theme_manager or ThemeManager()
+        with profiler.phase("desktop_manager"):
+            self.desktop_manager = desktop_manager or DesktopManager()
+        self.profile_manager = ProfileManager(self.theme_manager, self.desktop_manager)
 
         self.selected_theme = None
         self.selected_desktop = None
 
+        # Background apply job state
+        self._apply_job = None
+        self._apply_toast = None
+        self._busy_item = None
+
+        # Trace spans of the user action in progress
+        self._action_span = None
+        self._dialog_span = None
+        self._apply_span = None
+
         # Setup UI elements
-        self._setup_css()
-        self._setup_ui()
-        self._load_themes_and_desktops()
+        with profiler.phase("setup_css"):
+            self._setup_css()
+        with profiler.phase("setup_ui"):
+            self._setup_ui()
+        with profiler.phase("load_themes_and_desktops"):
+            self._load_themes_and_desktops()
+
+        # Keep the selection in sync with changes from this window and other tools
+        self.theme_manager.theme_changed_callbacks.append(self._on_theme_changed)
+        self.desktop_manager.desktop_changed_callbacks.append(self._on_desktop_changed)
+        self.state_watcher = StateWatcher(self.theme_manager, self.desktop_manager)
+        self.state_watcher.start()
+
+        # Show how many changes wait behind the running apply
+        apply_scheduler.changed_callbacks.append(self._on_scheduler_changed)
+
+        # Stop a running apply when the window goes away
+        self.connect("close-request", self._on_close_request)
 
     def _setup_css(self):
         """Set up custom CSS styling."""
+        # Parse the stylesheet once, later windows reuse the provider
+        if ThemesWindow._css_provider is not None:
+            return
         css_provider = Gtk.CssProvider()
-        css = """
-            /* Base style for interactive items */
-            .clickable-item {
-            transition: 500ms ease;
-            border-radius: 10px;
-            }
-            
-            /* Match keyboard navigation style with outline instead of border */
-            flowboxchild:hover {
-            outline: 2px solid alpha(@theme_selected_bg_color, 0.5);
-            outline-offset: -2px;
-            border-radius: 10px;
-            }
-
-            .active-bg { background-color: alpha(var(--accent-bg-color), 0.05); }
-            
-            /* Desktop section background */
-            .desktop-section {
-            background-color: var(--view-bg-color);
-            }
-
-            /* Change background of swith for change contrast option to ICC */
-            .boxed-list {
-            border-radius: 0;
-            box-shadow: none;
-            margin-left: -20px;
-            margin-right: -11px;
-            margin-bottom: -20px;
-            padding-left: 15px;
-            padding-right: 15px;
-            padding-bottom: 5px;
-            background-color: var(--secondary-sidebar-backdrop-color);
-            }
-        """
-        css_provider.load_from_data(css)
+        # From the memory-mapped resource bundle, or the loose file in a checkout
+        stylesheet = get_uri(os.path.join(get_current_dir(), STYLESHEET))
+        if is_resource_uri(stylesheet):
+            css_provider.load_from_resource(get_resource_path(stylesheet))
+        else:
+            css_provider.load_from_path(stylesheet)
         Gtk.StyleContext.add_provider_for_display(
             self.get_display(), css_provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
         )
+        ThemesWindow._css_provider = css_provider
 
     def _setup_ui(self):
         """Set up the user interface."""
@@ -113,13 +143,12 @@ class ThemesWindow(Adw.ApplicationWindow):
         theme_scroll.set_vexpand(True)
         theme_box.append(theme_scroll)
 
-        self.theme_flowbox = Gtk.FlowBox()
-        self.theme_flowbox.set_valign(Gtk.Align.START)
-        self.theme_flowbox.set_max_children_per_line(1)
-        # Start with NONE selection mode to prevent auto-selection
-        self.theme_flowbox.set_selection_mode(Gtk.SelectionMode.NONE)
-        self.theme_flowbox.connect("child-activated", self._on_theme_selected)
-        theme_scroll.set_child(self.theme_flowbox)
+        # Grid view only creates widgets for the visible themes
+        self.theme_grid = create_catalog_view(ThemeCell, self._on_theme_selected)
+        self.theme_grid.add_css_class("catalog")
+        self.theme_grid.set_min_columns(1)
+        self.theme_grid.set_max_columns(1)
+        theme_scroll.set_child(self.theme_grid)
 
         # Add Enhanced Contrast switch at the bottom of sidebar using Adwaita components
         # Only show if running on Wayland (ICC profile via kscreen-doctor requires Wayland)
@@ -127,7 +156,6 @@ class ThemesWindow(Adw.ApplicationWindow):
         self.contrast_switch_row = None
         self._contrast_handler_id = None
         self._pending_contrast_state = None
-        self._original_contrast_state = None
         
         if self._is_wayland_session():
             self.contrast_prefs_group = Adw.PreferencesGroup()
@@ -138,15 +166,17 @@ class ThemesWindow(Adw.ApplicationWindow):
 
             self.contrast_switch_row = Adw.SwitchRow()
             self.contrast_switch_row.set_title(_("Enhanced Contrast"))
-            # Get initial state before connecting the signal to prevent triggering the dialog
-            initial_icc_state = self._get_icc_profile_status()
-            self.contrast_switch_row.set_active(initial_icc_state)
             # Store handler ID to allow blocking/unblocking the signal
             self._contrast_handler_id = self.contrast_switch_row.connect("notify::active", self._on_contrast_switch_toggled)
 
             self.contrast_prefs_group.add(self.contrast_switch_row)
             theme_box.append(self.contrast_prefs_group)
 
+            # Shown in a loading state until the background probe returns
+            display_settings.changed_callbacks.append(self._sync_contrast_switch)
+            display_settings.probe()
+            self._sync_contrast_switch()
+
         theme_toolbar_view.set_content(theme_box)
         self.split_view.set_sidebar(theme_toolbar_view)
 
@@ -159,8 +189,37 @@ class ThemesWindow(Adw.ApplicationWindow):
         # Use Adw.WindowTitle for proper styling
         desktop_title = Adw.WindowTitle(title=_("Desktop"), subtitle="")
         desktop_header.set_title_widget(desktop_title)
+        profile_button = Gtk.Button(label=_("Apply Profile"))
+        profile_button.set_tooltip_text(_("Apply a theme and a desktop together"))
+        profile_button.connect("clicked", self._on_profile_clicked)
+        desktop_header.pack_start(profile_button)
+
+        # One search filters both the themes and the desktops
+        search_button = Gtk.ToggleButton(icon_name="system-search-symbolic")
+        search_button.set_tooltip_text(_("Search"))
+        desktop_header.pack_end(search_button)
         desktop_toolbar_view.add_top_bar(desktop_header)
 
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text(_("Search themes and desktops"))
+        self.search_entry.set_hexpand(True)
+        # The index answers within a frame, no need to wait for a typing pause
+        self.search_entry.set_search_delay(0)
+        self.search_entry.connect("search-changed", self._on_search_changed)
+        self.search_bar = Gtk.SearchBar()
+        self.search_bar.set_child(self.search_entry)
+        self.search_bar.connect_entry(self.search_entry)
+        # Typing anywhere in the window starts a search
+        self.search_bar.set_key_capture_widget(self)
+        self.search_bar.bind_property(
+            "search-mode-enabled",
+            search_button,
+            "active",
+            GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE,
+        )
+        self.search_bar.connect("notify::search-mode-enabled", self._on_search_mode_changed)
+        desktop_toolbar_view.add_top_bar(self.search_bar)
+
         # Desktop content area
         desktop_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         desktop_box.set_margin_start(12)
@@ -175,146 +234,99 @@ class ThemesWindow(Adw.ApplicationWindow):
         desktop_scroll.set_vexpand(True)  # Allow vertical expansion
         desktop_box.append(desktop_scroll)
 
-        self.desktop_flowbox = Gtk.FlowBox()
-        self.desktop_flowbox.set_valign(Gtk.Align.START)
-        # Start with NO selection mode to prevent auto-selection
-        self.desktop_flowbox.set_selection_mode(Gtk.SelectionMode.NONE)
-        # Align fill might conflict with valign start, let's stick to START for vertical alignment
-
-        # Allow children to have different sizes
-        self.desktop_flowbox.set_homogeneous(False)  # Changed from True
-        self.desktop_flowbox.set_row_spacing(12)
-        self.desktop_flowbox.set_column_spacing(12)
+        # Grid view only creates widgets for the visible desktops
+        self.desktop_grid = create_catalog_view(DesktopCell, self._on_desktop_selected)
+        self.desktop_grid.add_css_class("catalog")
+        self.desktop_grid.add_css_class("desktop-catalog")
 
         # Make the layout adaptive to screen size
-        self.desktop_flowbox.set_min_children_per_line(2)  # At least 1 column
-        self.desktop_flowbox.set_max_children_per_line(3)  # At most 3 columns
-
-        # Use resize notification for adaptive layout
-        self.desktop_flowbox.connect("child-activated", self._on_desktop_selected)
-        desktop_scroll.set_child(self.desktop_flowbox)
+        self.desktop_grid.set_min_columns(2)
+        self.desktop_grid.set_max_columns(3)
+        desktop_scroll.set_child(self.desktop_grid)
 
         # Set the content in the toolbar view
         desktop_toolbar_view.set_content(desktop_box)
 
+        # Progress reported by the apply scripts, shown while an apply runs
+        progress_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        progress_box.set_margin_start(12)
+        progress_box.set_margin_end(12)
+        progress_box.set_margin_top(6)
+        progress_box.set_margin_bottom(12)
+        self.apply_status_label = Gtk.Label(xalign=0)
+        self.apply_status_label.set_ellipsize(True)
+        self.apply_status_label.add_css_class("dim-label")
+        self.apply_progress_bar = Gtk.ProgressBar()
+        self.apply_queue_label = Gtk.Label(xalign=0, visible=False)
+        self.apply_queue_label.add_css_class("caption")
+        self.apply_queue_label.add_css_class("dim-label")
+        progress_box.append(self.apply_status_label)
+        progress_box.append(self.apply_progress_bar)
+        progress_box.append(self.apply_queue_label)
+        self.apply_progress_revealer = Gtk.Revealer(child=progress_box)
+        self.apply_progress_revealer.set_transition_type(
+            Gtk.RevealerTransitionType.SLIDE_UP
+        )
+        desktop_toolbar_view.add_bottom_bar(self.apply_progress_revealer)
+
         # Set desktop content area to split view
         self.split_view.set_content(desktop_toolbar_view)
 
     def _load_themes_and_desktops(self):
         """Load available themes and desktop configurations."""
-        # Load themes
-        current_theme = self.theme_manager.get_current_theme()
-        theme_list = self.theme_manager.get_theme_list()
-
-        for theme_name in theme_list:
-            theme_widget = self.theme_manager.create_theme_widget(theme_name)
-            theme_widget.set_margin_top(3)
-            theme_widget.set_margin_bottom(3)
-
-            flowbox_child = Gtk.FlowBoxChild()
-            flowbox_child.set_child(theme_widget)
-            flowbox_child.set_margin_top(0)
-            flowbox_child.set_margin_bottom(0)
-
-            # Add custom property to identify the theme
-            flowbox_child.set_name(theme_name)
-            #  margin top 0
-            flowbox_child.set_margin_top(0)
-            flowbox_child.set_margin_bottom(0)
-
-            # Highlight current theme with a checkmark
-            if theme_name == current_theme:
-                flowbox_child.add_css_class("frame")
-                flowbox_child.add_css_class("accent")
-                flowbox_child.add_css_class("active-bg")
-                check_icon = Gtk.Image.new_from_icon_name("object-select-symbolic")
-                check_icon.add_css_class("success")
-                check_icon.set_margin_top(10)
-                check_icon.set_margin_end(10)
-                check_icon.set_halign(Gtk.Align.END)
-                check_icon.set_valign(Gtk.Align.START)
-
-                # Get the theme widget and add the checkmark using an overlay container
-                theme_widget = flowbox_child.get_child()
-
-                if isinstance(theme_widget, Gtk.Box):
-                    # Create an overlay container
-                    overlay = Gtk.Overlay()
-
-                    # Remove the widget from the flowbox child first
-                    flowbox_child.set_child(None)
-
-                    # Add the theme widget to the overlay as the main content
-                    overlay.set_child(theme_widget)
-
-                    # Add the check icon as an overlay
-                    overlay.add_overlay(check_icon)
-
-                    # Set the overlay as the child of the flowbox child
-                    flowbox_child.set_child(overlay)
-
-            self.theme_flowbox.append(flowbox_child)
-
-        # Load desktop configurations
-        current_desktop = self.desktop_manager.get_current_desktop()
-        desktop_list = self.desktop_manager.get_desktop_list()
-
-        for desktop_name in desktop_list:
-            desktop_widget = self.desktop_manager.create_desktop_widget(desktop_name)
-            flowbox_child = Gtk.FlowBoxChild()
-            flowbox_child.set_halign(Gtk.Align.CENTER)
-            flowbox_child.set_valign(Gtk.Align.FILL)
-            flowbox_child.set_child(desktop_widget)
-
-            # Add custom property to identify the desktop
-            flowbox_child.set_name(desktop_name)
-
-            # Highlight current desktop
-            if desktop_name == current_desktop:
-                flowbox_child.add_css_class("frame")
-                flowbox_child.add_css_class("accent")
-                flowbox_child.add_css_class("active-bg")
-
-                # Create a checkmark icon for the current desktop
-                check_icon = Gtk.Image.new_from_icon_name("object-select-symbolic")
-                check_icon.add_css_class("success")
-                check_icon.set_halign(Gtk.Align.END)
-                check_icon.set_valign(Gtk.Align.START)
-                check_icon.set_margin_top(20)
-                check_icon.set_margin_end(20)
-
-                # Get the desktop widget and add the checkmark using an overlay
-                desktop_widget = flowbox_child.get_child()
-                if isinstance(desktop_widget, Gtk.Box):
-                    # Create an overlay container
-                    overlay = Gtk.Overlay()
-
-                    # Remove the widget from the flowbox child first
-                    flowbox_child.set_child(None)
-
-                    # Add the desktop widget to the overlay as the main content
-                    overlay.set_child(desktop_widget)
-
-                    # Add the check icon as an overlay
-                    overlay.add_overlay(check_icon)
-
-                    # Set the overlay as the child of the flowbox child
-                    flowbox_child.set_child(overlay)
-
-            self.desktop_flowbox.append(flowbox_child)
-
-    def _on_theme_selected(self, flowbox, child):
-        """Handle theme selection in the FlowBox."""
-        theme_name = child.get_name()
+        # Models hold one item per entry, widgets are only built for visible ones
+        self.theme_model = self.theme_manager.get_theme_model()
+        self.theme_selection = SelectionController(self.theme_model)
+        self.theme_filter = CatalogFilter(
+            self.theme_model, self.theme_manager.get_theme_search_terms
+        )
+        set_catalog_model(self.theme_grid, self.theme_filter.model)
+
+        self.desktop_model = self.desktop_manager.get_desktop_model()
+        self.desktop_selection = SelectionController(self.desktop_model)
+        self.desktop_filter = CatalogFilter(
+            self.desktop_model, self.desktop_manager.get_desktop_search_terms
+        )
+        set_catalog_model(self.desktop_grid, self.desktop_filter.model)
+
+        # Shared models may come from an earlier window, refresh the active entries
+        self.theme_selection.set_active(self.theme_manager.get_current_theme())
+        self.desktop_selection.set_active(self.desktop_manager.get_current_desktop())
+
+    def _on_search_mode_changed(self, search_bar, pspec):
+        """Index the catalogs when the search opens, clear it when closed."""
+        if search_bar.get_search_mode():
+            self.theme_filter.build_index()
+            self.desktop_filter.build_index()
+        else:
+            self.search_entry.set_text("")
+
+    def _on_search_changed(self, entry):
+        """Filter the themes and desktops by the typed text."""
+        query = entry.get_text()
+        self.theme_filter.set_query(query)
+        self.desktop_filter.set_query(query)
+        logger.debug(
+            "Search %r: %d themes, %d desktops",
+            query,
+            self.theme_filter.get_n_matches(),
+            self.desktop_filter.get_n_matches(),
+        )
+
+    def _on_theme_selected(self, grid_view, item):
+        """Handle theme selection in the grid."""
+        theme_name = item.name
         self.selected_theme = theme_name
+        self._start_action("select_theme", theme=theme_name)
 
-        # Explicitly refresh current theme to ensure we have the latest value
-        current_theme = self.theme_manager.get_current_theme()
-        print(f"Selected theme: {theme_name}, Current theme: {current_theme}")
+        # Compare with the queued theme, or the refreshed current one when idle
+        current_theme = self.theme_manager.get_target_theme()
+        logger.info("Selected theme: %s, current theme: %s", theme_name, current_theme)
 
         # Check if same theme is selected
         if theme_name.strip() == current_theme.strip():
-            print("Showing theme confirmation dialog for reapplication")
+            logger.debug("Showing theme confirmation dialog for reapplication")
+            self._start_dialog_span("theme_reapply")
             # Create and show confirmation dialog for reapplying the same theme
             dialog = Adw.MessageDialog(
                 transient_for=self,
@@ -325,16 +337,17 @@ class ThemesWindow(Adw.ApplicationWindow):
             dialog.add_response("apply", _("Apply"))
             dialog.set_default_response("cancel")
             dialog.set_response_appearance("apply", Adw.ResponseAppearance.SUGGESTED)
-            dialog.connect("response", self._on_theme_confirm_response)
+            dialog.connect("response", self._on_theme_confirm_response, True)
             dialog.present()
         else:
-            print("Showing theme confirmation dialog for new theme")
+            logger.debug("Showing theme confirmation dialog for new theme")
+            self._start_dialog_span("theme_change")
             # Create and show confirmation dialog for applying a different theme
             dialog = Adw.MessageDialog(
                 transient_for=self,
                 heading=_("Confirm Theme Change"),
                 body=_("Do you want to change the theme to {}?").format(
-                    theme_name.replace("-", " ")
+                    self.theme_manager.get_theme_label(theme_name)
                 ),
             )
             dialog.add_response("cancel", _("Cancel"))
@@ -344,16 +357,20 @@ class ThemesWindow(Adw.ApplicationWindow):
             dialog.connect("response", self._on_theme_confirm_response)
             dialog.present()
 
-    def _on_desktop_selected(self, flowbox, child):
-        """Handle desktop selection in the FlowBox."""
-        desktop_name = child.get_name()
+    def _on_desktop_selected(self, grid_view, item):
+        """Handle desktop selection in the grid."""
+        desktop_name = item.name
         self.selected_desktop = desktop_name
-        current_desktop = self.desktop_manager.get_current_desktop()
+        self._start_action("select_desktop", desktop=desktop_name)
+        current_desktop = self.desktop_manager.get_target_desktop()
 
-        print(f"Selected desktop: {desktop_name}, Current desktop: {current_desktop}")
+        logger.info(
+            "Selected desktop: %s, current desktop: %s", desktop_name, current_desktop
+        )
 
         if desktop_name == current_desktop:
-            print("Showing desktop confirmation dialog")
+            logger.debug("Showing desktop confirmation dialog")
+            self._start_dialog_span("desktop_reapply")
             # Create and show confirmation dialog for reapplying the same desktop
             dialog = Adw.MessageDialog(
                 transient_for=self,
@@ -369,17 +386,23 @@ class ThemesWindow(Adw.ApplicationWindow):
         else:
             # Check if desktop has been used before
             is_used = self.desktop_manager.is_desktop_used(desktop_name)
-            print(f"Desktop used before: {is_used}")
+            logger.debug("Desktop used before: %s", is_used)
 
             if is_used:
-                print("Showing desktop restore dialog")
+                logger.debug("Showing desktop restore dialog")
+                self._start_dialog_span("desktop_restore")
                 # Create and show dialog for restore/clean choice
+                body = _(
+                    "You've used this desktop before, do you want to restore your customization or use the original configuration?"
+                )
+                saved_layout = self.desktop_manager.get_saved_layout(desktop_name)
+                if saved_layout is not None:
+                    saved_on = time.strftime("%x %X", time.localtime(saved_layout.mtime))
+                    body += "\n\n" + _("Customization saved on {}").format(saved_on)
                 dialog = Adw.MessageDialog(
                     transient_for=self,
                     heading=_("Configuration"),
-                    body=_(
-                        "You've used this desktop before, do you want to restore your customization or use the original configuration?"
-                    ),
+                    body=body,
                 )
                 dialog.add_response("cancel", _("Cancel"))
                 dialog.add_response("clean", _("Original"))
@@ -394,236 +417,631 @@ class ThemesWindow(Adw.ApplicationWindow):
                 dialog.connect("response", self._on_desktop_restore_response)
                 dialog.present()
             else:
-                print("Applying new desktop directly")
+                logger.debug("Applying new desktop directly")
                 # Apply new desktop with default configuration
                 self._apply_desktop(desktop_name)
 
-    def _on_theme_confirm_response(self, dialog, response):
+    def _on_profile_clicked(self, button):
+        """Ask for a theme and a desktop to apply together."""
+        self._start_action("select_profile")
+        self._start_dialog_span("profile")
+
+        theme_names = self.theme_manager.get_theme_list()
+        desktop_names = self.desktop_manager.get_desktop_list()
+        theme_row = Adw.ComboRow(title=_("Theme"))
+        theme_row.set_model(
+            Gtk.StringList.new(
+                [self.theme_manager.get_theme_label(name) for name in theme_names]
+            )
+        )
+        desktop_row = Adw.ComboRow(title=_("Desktop"))
+        desktop_row.set_model(
+            Gtk.StringList.new(
+                [self.desktop_manager.get_desktop_label(name) for name in desktop_names]
+            )
+        )
+        current_theme = self.theme_manager.get_target_theme()
+        if current_theme in theme_names:
+            theme_row.set_selected(theme_names.index(current_theme))
+        current_desktop = self.desktop_manager.get_target_desktop()
+        if current_desktop in desktop_names:
+            desktop_row.set_selected(desktop_names.index(current_desktop))
+        clean_row = Adw.SwitchRow(title=_("Use the original desktop configuration"))
+
+        group = Adw.PreferencesGroup()
+        group.add(theme_row)
+        group.add(desktop_row)
+        group.add(clean_row)
+
+        dialog = Adw.MessageDialog(
+            transient_for=self,
+            heading=_("Apply Profile"),
+            body=_("The theme and the desktop are applied in a single step."),
+        )
+        dialog.set_extra_child(group)
+        dialog.add_response("cancel", _("Cancel"))
+        dialog.add_response("apply", _("Apply"))
+        dialog.set_default_response("cancel")
+        dialog.set_response_appearance("apply", Adw.ResponseAppearance.SUGGESTED)
+
+        def update_apply(*_args):
+            # Empty lists, or an unknown current theme or desktop, leave no selection
+            dialog.set_response_enabled(
+                "apply",
+                theme_row.get_selected() != Gtk.INVALID_LIST_POSITION
+                and desktop_row.get_selected() != Gtk.INVALID_LIST_POSITION,
+            )
+
+        theme_row.connect("notify::selected", update_apply)
+        desktop_row.connect("notify::selected", update_apply)
+        update_apply()
+
+        def on_response(dialog, response):
+            self._finish_dialog_span(response)
+            dialog.set_visible(False)
+            if response != "apply" or not dialog.get_response_enabled("apply"):
+                self._finish_action(STATUS_CANCELLED)
+                return
+            self._apply_profile(
+                Profile(
+                    theme_names[theme_row.get_selected()],
+                    desktop_names[desktop_row.get_selected()],
+                    "clean" if clean_row.get_active() else "",
+                )
+            )
+
+        dialog.connect("response", on_response)
+        dialog.present()
+
+    def _on_theme_confirm_response(self, dialog, response, reapply=False):
         """Handle response from theme confirmation dialog."""
-        print(f"Theme confirm dialog response: {response}")
+        logger.debug("Theme confirm dialog response: %s", response)
+        self._finish_dialog_span(response)
         # Always dismiss the dialog first
         dialog.set_visible(False)
 
         # Then handle the response
         if response == "apply":
-            print("Reapplying the same theme")
-            self._apply_theme(self.selected_theme)
+            logger.debug("Applying the selected theme")
+            self._apply_theme(self.selected_theme, force=reapply)
         elif response == "cancel":
-            print("Theme reapplication cancelled")
+            logger.debug("Theme change cancelled")
+            self._finish_action(STATUS_CANCELLED)
 
     def _on_desktop_confirm_response(self, dialog, response):
         """Handle response from desktop confirmation dialog."""
-        print(f"Desktop confirm dialog response: {response}")
+        logger.debug("Desktop confirm dialog response: %s", response)
+        self._finish_dialog_span(response)
         # Always dismiss the dialog first
         dialog.set_visible(False)
 
         # Then handle the response
         if response == "apply":
-            print("Reapplying the desktop with clean option")
-            self._apply_desktop(self.selected_desktop, "clean")
+            logger.debug("Reapplying the desktop with clean option")
+            self._apply_desktop(self.selected_desktop, "clean", force=True)
         elif response == "cancel":
-            print("Desktop reapplication cancelled")
+            logger.debug("Desktop reapplication cancelled")
+            self._finish_action(STATUS_CANCELLED)
 
     def _on_desktop_restore_response(self, dialog, response):
         """Handle response from desktop restore/clean dialog."""
-        print(f"Desktop restore dialog response: {response}")
+        logger.debug("Desktop restore dialog response: %s", response)
+        self._finish_dialog_span(response)
         # Always dismiss the dialog first
         dialog.set_visible(False)
 
         # Then handle the response
         if response == "clean":
-            print("Applying desktop with clean option")
+            logger.debug("Applying desktop with clean option")
             self._apply_desktop(self.selected_desktop, "clean")
         elif response == "restore":
-            print("Applying desktop with restore option")
+            logger.debug("Applying desktop with restore option")
             self._apply_desktop(self.selected_desktop)
         elif response == "cancel":
-            print("Desktop restore operation cancelled")
-
-    def _add_checkmark_to_widget(self, flowbox_child):
-        """Add a checkmark icon to a flowbox child item."""
-        # Create a checkmark icon
-        check_icon = Gtk.Image.new_from_icon_name("object-select-symbolic")
-        check_icon.add_css_class("success")
-        check_icon.set_halign(Gtk.Align.END)
-        check_icon.set_valign(Gtk.Align.START)
-        check_icon.set_margin_top(10)
-        check_icon.set_margin_end(10)
-
-        # Get the widget and add the checkmark using an overlay
-        widget = flowbox_child.get_child()
-        if isinstance(widget, Gtk.Box):
-            # Create an overlay container
-            overlay = Gtk.Overlay()
-
-            # Remove the widget from the flowbox child first
-            flowbox_child.set_child(None)
-
-            # Add the widget to the overlay as the main content
-            overlay.set_child(widget)
-
-            # Add the check icon as an overlay
-            overlay.add_overlay(check_icon)
-
-            # Set the overlay as the child of the flowbox child
-            flowbox_child.set_child(overlay)
-        elif isinstance(widget, Gtk.Overlay):
-            # The item already has an overlay, we just need to add another check icon
-            widget.add_overlay(check_icon)
-
-    def _apply_theme(self, theme_name):
-        """Apply a theme and show notification."""
-        try:
-            print(f"Applying theme: {theme_name}")
-            self.theme_manager.set_theme(theme_name)
-            print("Theme application successful")
-
-            # Update selected theme in UI
-            i = 0
-            child = self.theme_flowbox.get_child_at_index(i)
-            updated_items = 0
-
-            while child:
-                if child.get_name() == theme_name:
-                    # Add visual indicators
-                    child.add_css_class("accent")
-                    child.add_css_class("active-bg")
-                    child.add_css_class("frame")
-                    child.set_halign(Gtk.Align.END)
-                    child.set_valign(Gtk.Align.START)
-
-                    # Add checkmark to the selected item
-                    self._add_checkmark_to_widget(child)
-
-                    updated_items += 1
-                else:
-                    # Remove visual indicators
-                    child.remove_css_class("accent")
-                    child.remove_css_class("active-bg")
-                    child.remove_css_class("frame")
-                    child.set_halign(Gtk.Align.END)
-                    child.set_valign(Gtk.Align.START)
-
-                    # Remove any existing checkmark by recreating the child's content
-                    widget = child.get_child()
-                    if isinstance(widget, Gtk.Overlay):
-                        # Extract the original content box from the overlay
-                        content = widget.get_child()
-                        if content:
-                            # Remove from overlay and set directly as child
-                            widget.set_child(None)
-                            child.set_child(content)
-
-                i += 1
-                child = self.theme_flowbox.get_child_at_index(i)
-
-            # Show toast notification
-            self._show_change_toast()
-        except Exception as e:
-            print(f"ERROR applying theme: {e}")
-            # Show error toast notification
-            self._show_error_toast(f"Error applying theme: {str(e)}")
-
-    def _apply_desktop(self, desktop_name, clean=""):
-        """Apply a desktop configuration and show notification."""
-        try:
-            print(f"Applying desktop: {desktop_name}, clean option: '{clean}'")
-            self.desktop_manager.set_desktop(desktop_name, clean)
-            print("Desktop application successful")
-
-            # Update selected desktop in UI
-            i = 0
-            child = self.desktop_flowbox.get_child_at_index(i)
-            updated_items = 0
-
-            while child:
-                if child.get_name() == desktop_name:
-                    # Add visual indicators
-                    child.add_css_class("accent")
-                    child.add_css_class("active-bg")
-                    child.set_halign(Gtk.Align.CENTER)
-                    child.set_valign(Gtk.Align.FILL)
-                    child.add_css_class("frame")
-
-                    # Add checkmark to the selected item
-                    self._add_checkmark_to_widget(child)
-
-                    print(f"Highlighted desktop: {child.get_name()}")
-                    updated_items += 1
-                else:
-                    # Remove visual indicators
-                    child.remove_css_class("accent")
-                    child.remove_css_class("active-bg")
-                    child.set_halign(Gtk.Align.CENTER)
-                    child.set_valign(Gtk.Align.FILL)
-                    child.remove_css_class("frame")
-
-                    # Remove any existing checkmark by recreating the child's content
-                    widget = child.get_child()
-                    if isinstance(widget, Gtk.Overlay):
-                        # Extract the original content box from the overlay
-                        content = widget.get_child()
-                        if content:
-                            # Remove from overlay and set directly as child
-                            widget.set_child(None)
-                            child.set_child(content)
-
-                i += 1
-                child = self.desktop_flowbox.get_child_at_index(i)
-
-            print(f"Updated {updated_items} desktop items in UI")
-
-            # Show toast notification
-            self._show_change_toast()
-        except Exception as e:
-            print(f"ERROR applying desktop: {e}")
-            # Show error toast notification
-            self._show_error_toast(f"Error applying desktop: {str(e)}")
-
-    def _show_change_toast(self):
-        """Show toast notification for theme/desktop changes."""
+            logger.debug("Desktop restore operation cancelled")
+            self._finish_action(STATUS_CANCELLED)
+
+    def _apply_theme(self, theme_name, force=False):
+        """Queue a theme apply, it starts once the earlier applies are done."""
+        action_span = self._take_action_span()
+        if not self.theme_manager.schedule_theme(
+            theme_name,
+            lambda: self._start_theme_apply(theme_name, action_span),
+            force=force,
+            owner=self,
+        ):
+            self._on_apply_skipped(action_span)
+
+    def _start_theme_apply(self, theme_name, action_span):
+        """Apply a theme in the background and show notification when done."""
+        logger.info("Applying theme: %s", theme_name)
+        self._apply_span = tracer.start_span(
+            "apply_theme", parent=action_span, theme=theme_name
+        )
+        self._set_item_busy(self.theme_selection.get(theme_name))
+        self._show_apply_progress_toast(
+            _("Applying the {} theme...").format(
+                self.theme_manager.get_theme_label(theme_name)
+            )
+        )
+        # The worker thread inherits the apply span for its command spans
+        with tracer.use_span(self._apply_span):
+            self._apply_job = self.theme_manager.set_theme_async(
+                theme_name,
+                on_finished=self._in_action(action_span, self._on_theme_applied),
+                on_failed=self._in_action(action_span, self._on_theme_apply_failed),
+                on_cancelled=self._in_action(action_span, self._on_apply_cancelled),
+                on_progress=self._on_apply_progress,
+            )
+        return self._apply_job
+
+    def _on_theme_applied(self, theme_name, reload_result):
+        """Update the UI once a theme has been applied."""
+        logger.info("Theme application successful")
+        self._finish_apply(STATUS_OK)
+        # Show toast notification
+        self._show_change_toast(reload_result)
+
+    def _on_theme_apply_failed(self, error):
+        """Report a failed theme apply."""
+        logger.error("Error applying theme: %s", error)
+        self._finish_apply(STATUS_ERROR, error=str(error))
+        # Show error toast notification
+        self._show_error_toast(
+            self._rollback_message(
+                error,
+                _("Could not apply the theme. Your previous settings were restored."),
+                _(
+                    "Could not apply the theme or restore your previous settings. Apply them again, or log off and log in again."
+                ),
+            )
+        )
+
+    def _on_theme_changed(self, theme_name):
+        """Follow a theme change reported by the theme manager."""
+        # The selection only moves once a running apply has finished
+        if not self._is_apply_running():
+            self._update_theme_selection(theme_name)
+
+    def _update_theme_selection(self, theme_name):
+        """Move the selection indicators to the given theme."""
+        with tracer.span("ui_refresh", parent=self._action_span, theme=theme_name):
+            self.theme_selection.set_active(theme_name)
+
+    def _apply_desktop(self, desktop_name, clean="", force=False):
+        """Queue a desktop apply, it starts once the earlier applies are done."""
+        action_span = self._take_action_span()
+        if not self.desktop_manager.schedule_desktop(
+            desktop_name,
+            clean,
+            lambda: self._start_desktop_apply(desktop_name, clean, action_span),
+            force=force,
+            owner=self,
+        ):
+            self._on_apply_skipped(action_span)
+
+    def _start_desktop_apply(self, desktop_name, clean, action_span):
+        """Apply a desktop configuration in the background and show notification."""
+        logger.info("Applying desktop: %s, clean option: '%s'", desktop_name, clean)
+        self._apply_span = tracer.start_span(
+            "apply_desktop", parent=action_span, desktop=desktop_name, clean=clean
+        )
+        self._set_item_busy(self.desktop_selection.get(desktop_name))
+        self._show_apply_progress_toast(
+            _("Applying the {} desktop...").format(
+                self.desktop_manager.get_desktop_label(desktop_name)
+            )
+        )
+        # The worker thread inherits the apply span for its command spans
+        with tracer.use_span(self._apply_span):
+            self._apply_job = self.desktop_manager.set_desktop_async(
+                desktop_name,
+                clean,
+                on_finished=self._in_action(action_span, self._on_desktop_applied),
+                on_failed=self._in_action(action_span, self._on_desktop_apply_failed),
+                on_cancelled=self._in_action(action_span, self._on_apply_cancelled),
+                on_progress=self._on_apply_progress,
+            )
+        return self._apply_job
+
+    def _on_desktop_applied(self, desktop_name, reload_result):
+        """Update the UI once a desktop configuration has been applied."""
+        logger.info("Desktop application successful")
+        self._finish_apply(STATUS_OK)
+        # Show toast notification
+        self._show_change_toast(reload_result)
+
+    def _on_desktop_apply_failed(self, error):
+        """Report a failed desktop apply."""
+        logger.error("Error applying desktop: %s", error)
+        self._finish_apply(STATUS_ERROR, error=str(error))
+        # Show error toast notification
+        self._show_error_toast(
+            self._rollback_message(
+                error,
+                _("Could not apply the desktop. Your previous settings were restored."),
+                _(
+                    "Could not apply the desktop or restore your previous settings. Apply them again, or log off and log in again."
+                ),
+            )
+        )
+
+    def _apply_profile(self, profile):
+        """Queue a profile apply, it starts once the earlier applies are done."""
+        action_span = self._take_action_span()
+        if not self.profile_manager.schedule_profile(
+            profile,
+            lambda: self._start_profile_apply(profile, action_span),
+            owner=self,
+        ):
+            self._on_apply_skipped(action_span)
+
+    def _start_profile_apply(self, profile, action_span):
+        """Apply a theme and a desktop together in the background."""
+        logger.info(
+            "Applying profile: theme %s, desktop %s, clean option: '%s'",
+            profile.theme,
+            profile.desktop,
+            profile.clean,
+        )
+        self._apply_span = tracer.start_span(
+            "apply_profile",
+            parent=action_span,
+            theme=profile.theme,
+            desktop=profile.desktop,
+            clean=profile.clean,
+        )
+        self._set_item_busy(self.desktop_selection.get(profile.desktop))
+        self._show_apply_progress_toast(
+            _("Applying the {} theme and the {} desktop...").format(
+                self.theme_manager.get_theme_label(profile.theme),
+                self.desktop_manager.get_desktop_label(profile.desktop),
+            )
+        )
+        # The worker thread inherits the apply span for its command spans
+        with tracer.use_span(self._apply_span):
+            self._apply_job = self.profile_manager.set_profile_async(
+                profile,
+                on_finished=self._in_action(action_span, self._on_profile_applied),
+                on_failed=self._in_action(action_span, self._on_profile_apply_failed),
+                on_cancelled=self._in_action(action_span, self._on_apply_cancelled),
+                on_progress=self._on_apply_progress,
+            )
+        return self._apply_job
+
+    def _on_profile_applied(self, profile, reload_result):
+        """Finish a successful profile apply."""
+        logger.info("Profile application successful")
+        self._finish_apply(STATUS_OK)
+        # One toast for both changes
+        self._show_change_toast(reload_result)
+
+    def _on_profile_apply_failed(self, error):
+        """Report a failed profile apply."""
+        logger.error("Error applying profile: %s", error)
+        self._finish_apply(STATUS_ERROR, error=str(error))
+        self._show_error_toast(
+            self._rollback_message(
+                error,
+                _("Could not apply the profile. Your previous settings were restored."),
+                _(
+                    "Could not apply the profile or restore your previous settings. Apply them again, or log off and log in again."
+                ),
+            )
+        )
+
+    def _on_desktop_changed(self, desktop_name):
+        """Follow a desktop change reported by the desktop manager."""
+        # The selection only moves once a running apply has finished
+        if not self._is_apply_running():
+            self._update_desktop_selection(desktop_name)
+
+    def _update_desktop_selection(self, desktop_name):
+        """Move the selection indicators to the given desktop."""
+        with tracer.span("ui_refresh", parent=self._action_span, desktop=desktop_name):
+            self.desktop_selection.set_active(desktop_name)
+        logger.debug("Highlighted desktop: %s", desktop_name)
+
+    def _is_apply_running(self):
+        """Check if a theme or desktop apply is still in progress."""
+        return self._apply_job is not None and self._apply_job.is_running()
+
+    def _on_apply_skipped(self, action_span):
+        """Tell the user a change was dropped as already applied or queued."""
+        toast = Adw.Toast.new(_("This change is already applied or queued."))
+        toast.set_timeout(3)
+        self.toast_overlay.add_toast(toast)
+        tracer.start_span("toast", parent=action_span, kind="skipped").finish()
+        if action_span is not None:
+            action_span.finish(STATUS_CANCELLED, reason="duplicate")
+
+    def _on_scheduler_changed(self):
+        """Show the number of changes waiting behind the running apply."""
+        depth = apply_scheduler.queue_depth
+        self.apply_queue_label.set_visible(depth > 0)
+        if depth > 0:
+            self.apply_queue_label.set_label(
+                ngettext(
+                    "{} more change queued", "{} more changes queued", depth
+                ).format(depth)
+            )
+
+    def _set_item_busy(self, item):
+        """Show the progress spinner on an item, or clear it with None."""
+        if self._busy_item is not None:
+            self._busy_item.busy = False
+        self._busy_item = item
+        if item is not None:
+            item.busy = True
+
+    def _show_apply_progress_toast(self, message):
+        """Show a persistent toast with a cancel button while applying."""
+        toast = Adw.Toast.new(message)
+        toast.set_timeout(0)
+        toast.set_button_label(_("Cancel"))
+        toast.connect("button-clicked", self._on_cancel_apply_clicked)
+        self._apply_toast = toast
+        self.toast_overlay.add_toast(toast)
+
+        # Filled in by the progress steps of the apply script
+        self.apply_status_label.set_label(message)
+        self.apply_progress_bar.set_fraction(0)
+        self.apply_progress_revealer.set_reveal_child(True)
+
+    def _on_apply_progress(self, progress):
+        """Show a progress step reported by the running apply script."""
+        self.apply_progress_bar.set_fraction(progress.fraction)
+        if progress.message:
+            self.apply_status_label.set_label(progress.message)
+        if self._apply_span is not None:
+            self._apply_span.set_attribute("step", f"{progress.step}/{progress.total}")
+
+    def _on_cancel_apply_clicked(self, toast):
+        """Cancel the running apply job and drop the queued ones of this window."""
+        logger.info("Cancelling apply jobs")
+        apply_scheduler.cancel_all(owner=self)
+
+    def _on_apply_cancelled(self, error):
+        """Restore the UI after an apply was cancelled."""
+        logger.info("Apply cancelled")
+        self._finish_apply(STATUS_CANCELLED)
         toast = Adw.Toast.new(
-            _(
-                "The settings have been changed. To apply them throughout the system, log off and log in again."
+            self._rollback_message(
+                error,
+                _("The change was cancelled and your previous settings were restored."),
+                _(
+                    "The change was cancelled, but your previous settings could not be restored. Apply them again, or log off and log in again."
+                ),
             )
         )
         toast.set_timeout(5)
         self.toast_overlay.add_toast(toast)
+        self._trace_toast("cancelled")
+        self._finish_action(STATUS_CANCELLED)
+
+    def _finish_apply(self, status, **attributes):
+        """Clear the progress indicators of the finished apply job."""
+        if self._apply_span is not None:
+            self._apply_span.finish(status, **attributes)
+            self._apply_span = None
+        self._set_item_busy(None)
+        if self._apply_toast is not None:
+            self._apply_toast.dismiss()
+            self._apply_toast = None
+        self.apply_progress_revealer.set_reveal_child(False)
+        self._apply_job = None
+
+    def _on_close_request(self, window):
+        """Cancel the applies and stop watching before the window closes."""
+        # Queued applies would start on a closed window; other windows keep theirs
+        apply_scheduler.cancel_all(owner=self)
+        self.state_watcher.stop()
+
+        # The managers may outlive this window in service mode
+        self.theme_manager.theme_changed_callbacks.remove(self._on_theme_changed)
+        self.desktop_manager.desktop_changed_callbacks.remove(self._on_desktop_changed)
+        self.theme_selection.disconnect()
+        self.desktop_selection.disconnect()
+        self.theme_filter.disconnect()
+        self.desktop_filter.disconnect()
+        if self._sync_contrast_switch in display_settings.changed_callbacks:
+            display_settings.changed_callbacks.remove(self._sync_contrast_switch)
+        if self._on_scheduler_changed in apply_scheduler.changed_callbacks:
+            apply_scheduler.changed_callbacks.remove(self._on_scheduler_changed)
+        return False
+
+    def _show_change_toast(self, reload_result):
+        """Show toast notification for theme/desktop changes."""
+        if reload_result.needs_logout:
+            message = _(
+                "The settings have been changed. To apply them throughout the system, log off and log in again."
+            )
+        else:
+            message = _("The new settings are now active.")
+        toast = Adw.Toast.new(message)
+        toast.set_timeout(5)
+        toast.set_button_label(_("Undo"))
+        toast.connect("button-clicked", self._on_undo_clicked)
+        self.toast_overlay.add_toast(toast)
+        self._trace_toast("change")
+        self._finish_action(STATUS_OK)
+
+    def _on_undo_clicked(self, toast):
+        """Restore the configuration from before the last change."""
+        self._start_action("undo")
+        action_span = self._take_action_span()
+        # The change this toast is about; it is not undone if another one finishes first
+        change = get_last_change()
+        busy = apply_scheduler.is_busy()
+        if not apply_scheduler.submit(
+            KIND_UNDO, None, lambda: self._start_undo(change, action_span), owner=self
+        ):
+            self._on_apply_skipped(action_span)
+        elif busy:
+            waiting_toast = Adw.Toast.new(
+                _("The undo will run once the current change has finished.")
+            )
+            waiting_toast.set_timeout(3)
+            self.toast_overlay.add_toast(waiting_toast)
+            tracer.start_span("toast", parent=action_span, kind="queued").finish()
+
+    def _start_undo(self, change, action_span):
+        """Undo the last change in the background."""
+        with tracer.use_span(action_span):
+            self._apply_job = ApplyJob(
+                self._run_undo,
+                change,
+                on_finished=self._in_action(action_span, self._on_undo_finished),
+                on_failed=self._in_action(action_span, self._on_undo_failed),
+            ).start()
+        return self._apply_job
+
+    def _run_undo(self, change, cancellable=None):
+        """Restore the last snapshot and reload the session, on a worker thread."""
+        info = undo_last_change(change)
+        if info is None:
+            return None, None
+        return info, session_reloader.reload(info["kind"])
+
+    def _on_undo_finished(self, result):
+        """Update the UI once the last change was undone."""
+        info, reload_result = result
+        self._finish_apply(STATUS_OK)
+        if info is None:
+            self._finish_action(STATUS_CANCELLED)
+            return
+        logger.info("Undid %s change to %s", info.get("kind"), info.get("name"))
+        self.theme_manager.reload_current_theme()
+        self.desktop_manager.reload_current_desktop()
+        if reload_result.needs_logout:
+            message = _(
+                "The previous settings were restored. To apply them throughout the system, log off and log in again."
+            )
+        else:
+            message = _("The previous settings were restored.")
+        toast = Adw.Toast.new(message)
+        toast.set_timeout(5)
+        self.toast_overlay.add_toast(toast)
+        self._trace_toast("undo")
+        self._finish_action(STATUS_OK)
+
+    def _on_undo_failed(self, error):
+        """Report a failed undo."""
+        logger.error("Error undoing the last change: %s", error)
+        self._finish_apply(STATUS_ERROR, error=str(error))
+        if isinstance(error, StaleSnapshot):
+            self._show_error_toast(
+                _("Could not undo, another change was applied in the meantime")
+            )
+        else:
+            self._show_error_toast(_("Could not undo the last change"))
 
     def _show_error_toast(self, message):
         """Show error toast notification."""
-        toast = Adw.Toast.new(_(message))
+        toast = Adw.Toast.new(message)
         toast.set_timeout(5)
-        toast.add_css_class("error")
         self.toast_overlay.add_toast(toast)
+        self._trace_toast("error")
+        self._finish_action(STATUS_ERROR)
+
+    def _start_action(self, name, **attributes):
+        """Start the trace of a new user action."""
+        # An action left without an outcome was abandoned
+        self._finish_action(STATUS_CANCELLED)
+        self._action_span = tracer.start_trace(name, **attributes)
+
+    def _finish_action(self, status, **attributes):
+        """End the trace of the current user action."""
+        if self._dialog_span is not None:
+            self._dialog_span.finish(STATUS_CANCELLED)
+            self._dialog_span = None
+        if self._action_span is not None:
+            self._action_span.finish(status, **attributes)
+            self._action_span = None
+
+    def _take_action_span(self):
+        """Detach the current action, it now belongs to the apply it requested.
+
+        Applies may wait in the queue, new actions can start meanwhile.
+        """
+        action_span = self._action_span
+        self._action_span = None
+        return action_span
+
+    def _rollback_message(self, error, restored, not_restored):
+        """Pick the message that matches whether the previous settings came back."""
+        if get_rollback(error) == ROLLBACK_RESTORED:
+            return restored
+        return not_restored
+
+    def _in_action(self, action_span, callback):
+        """Wrap an apply callback to report to the action that requested it."""
+
+        def wrapper(*args):
+            # Set aside the action the user may have started since
+            saved = (self._action_span, self._dialog_span)
+            self._action_span, self._dialog_span = action_span, None
+            try:
+                callback(*args)
+            finally:
+                self._action_span, self._dialog_span = saved
+
+        return wrapper
+
+    def _start_dialog_span(self, kind):
+        """Time a confirmation dialog of the current action."""
+        self._dialog_span = tracer.start_span(
+            "dialog", parent=self._action_span, kind=kind
+        )
+
+    def _finish_dialog_span(self, response):
+        """End the dialog span with the user's response."""
+        if self._dialog_span is not None:
+            self._dialog_span.finish(STATUS_OK, response=response)
+            self._dialog_span = None
+
+    def _trace_toast(self, kind):
+        """Record the toast shown at the end of the current action."""
+        tracer.start_span("toast", parent=self._action_span, kind=kind).finish()
 
     def _is_wayland_session(self):
         """Check if the current session is running on Wayland."""
         session_type = os.environ.get("XDG_SESSION_TYPE", "").lower()
         return session_type == "wayland"
 
-    def _get_icc_profile_status(self):
-        """Check if ICC profile is currently active."""
-        try:
-            result = subprocess.run(
-                ["icc_profile_apply", "status"],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            # Check if any display has ACTIVE status
-            return "Status: ACTIVE" in result.stdout
-        except Exception as e:
-            print(f"Error checking ICC profile status: {e}")
-            return False
+    def _set_contrast_switch(self, active):
+        """Move the contrast switch without asking for confirmation."""
+        self.contrast_switch_row.handler_block(self._contrast_handler_id)
+        self.contrast_switch_row.set_active(active)
+        self.contrast_switch_row.handler_unblock(self._contrast_handler_id)
+
+    def _sync_contrast_switch(self):
+        """Show the cached Enhanced Contrast status on the switch."""
+        if self._pending_contrast_state is not None:
+            # Keep the user's choice while the dialog is open
+            return
+        status = display_settings.status
+        if display_settings.is_applying():
+            subtitle = _("Applying…")
+        elif status is None and display_settings.is_probing():
+            subtitle = _("Checking…")
+        elif status is None:
+            subtitle = _("Status unknown")
+        else:
+            subtitle = ""
+        self.contrast_switch_row.set_subtitle(subtitle)
+        self.contrast_switch_row.set_sensitive(
+            not display_settings.is_applying()
+            and not (status is None and display_settings.is_probing())
+        )
+        self._set_contrast_switch(bool(display_settings.target))
 
     def _on_contrast_switch_toggled(self, switch, pspec):
         """Handle enhanced contrast switch toggle."""
-        # Store the pending state (get actual boolean value from switch)
-        # and the current real state from the system
+        # Store the pending state (get actual boolean value from switch),
+        # the real state stays cached in display_settings
         new_state = switch.get_active()
         self._pending_contrast_state = new_state
-        self._original_contrast_state = self._get_icc_profile_status()
 
         # Show confirmation dialog
         dialog = Adw.MessageDialog(
@@ -647,22 +1065,14 @@ class ThemesWindow(Adw.ApplicationWindow):
         # Close the dialog first
         dialog.set_visible(False)
 
+        pending_state = self._pending_contrast_state
+        self._pending_contrast_state = None
         if response == "apply":
-            # Apply the ICC profile change
-            self._apply_icc_profile(self._pending_contrast_state)
-            # Block signal handler to prevent dialog from reopening
-            self.contrast_switch_row.handler_block(self._contrast_handler_id)
-            # Update switch to the new state
-            self.contrast_switch_row.set_active(self._pending_contrast_state)
-            # Unblock signal handler
-            self.contrast_switch_row.handler_unblock(self._contrast_handler_id)
+            # Applied in the background, the switch shows the progress
+            self._apply_icc_profile(pending_state)
         elif response == "manual":
-            # Block signal handler to prevent dialog from reopening
-            self.contrast_switch_row.handler_block(self._contrast_handler_id)
-            # Restore switch to the original real state before opening settings
-            self.contrast_switch_row.set_active(self._original_contrast_state)
-            # Unblock signal handler
-            self.contrast_switch_row.handler_unblock(self._contrast_handler_id)
+            # Restore switch to the real state before opening settings
+            self._sync_contrast_switch()
             # Open KDE display configuration modules
             try:
                 subprocess.Popen(
@@ -670,37 +1080,22 @@ class ThemesWindow(Adw.ApplicationWindow):
                     start_new_session=True
                 )
             except Exception as e:
-                print(f"Error opening display settings: {e}")
+                logger.error("Error opening display settings: %s", e)
                 self._show_error_toast(_("Could not open display settings"))
         else:  # cancel
-            # Block signal handler to prevent dialog from reopening
-            self.contrast_switch_row.handler_block(self._contrast_handler_id)
-            # Restore switch to the original real state
-            self.contrast_switch_row.set_active(self._original_contrast_state)
-            # Unblock signal handler
-            self.contrast_switch_row.handler_unblock(self._contrast_handler_id)
-
-        self._pending_contrast_state = None
-        self._original_contrast_state = None
+            # Restore switch to the real state
+            self._sync_contrast_switch()
 
     def _apply_icc_profile(self, enable):
         """Apply or remove ICC profile for enhanced contrast."""
-        action = "enable" if enable else "disable"
-        try:
-            result = subprocess.run(
-                ["icc_profile_apply", action],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            if result.returncode == 0:
-                status = _("Enhanced contrast enabled") if enable else _("Enhanced contrast disabled")
-                toast = Adw.Toast.new(status)
-                toast.set_timeout(3)
-                self.toast_overlay.add_toast(toast)
-            else:
-                print(f"ICC profile apply error: {result.stderr}")
-                self._show_error_toast(_("Error applying display settings"))
-        except Exception as e:
-            print(f"Error applying ICC profile: {e}")
+
+        def finished():
+            status = _("Enhanced contrast enabled") if enable else _("Enhanced contrast disabled")
+            toast = Adw.Toast.new(status)
+            toast.set_timeout(3)
+            self.toast_overlay.add_toast(toast)
+
+        def failed(error):
             self._show_error_toast(_("Error applying display settings"))
+
+        display_settings.apply(enable, on_finished=finished, on_failed=failed)